@@ -38,6 +38,7 @@ import sys
 import os
 import time
 import inspect
+import multiprocessing
 
 from core import parameters
 from gui import title_screen, library_import
@@ -74,8 +75,12 @@ def startGUI(params_object):
     title_win.accepted.connect(window.show)
     sys.exit(app.exec_())
 
-nmrmix_directory = get_script_dir()
-os.chdir(nmrmix_directory)
-__VERSION__ = open('VERSION', 'rU').read()
-params = parameters.Parameters(nmrmix_directory)
-startGUI(params)
\ No newline at end of file
+# The guard keeps the annealing worker processes, which import this module when they are spawned, from starting
+# the GUI themselves.
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    nmrmix_directory = get_script_dir()
+    os.chdir(nmrmix_directory)
+    __VERSION__ = open('VERSION', 'rU').read()
+    params = parameters.Parameters(nmrmix_directory)
+    startGUI(params)
\ No newline at end of file
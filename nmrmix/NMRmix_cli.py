@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+NMRmix_cli.py
+
+Copyright (C) 2016 National Magnetic Resonance Facilty At Madison (NMRFAM)
+This program comes with ABSOLUTELY NO WARRANTY.
+This is free software, and you are welcome to
+redistribute it under certain conditions.
+See 'LICENSE.txt' for details.
+
+DESCRIPTION
+Command line version of NMRmix. Imports the peak lists of a
+library, optimizes the mixtures and writes the same results
+folder as the GUI, without Qt or a display, so that NMRmix
+can be run as a batch job.
+
+USAGE
+python NMRmix_cli.py library.csv [-p parameters.txt] [-i ignored.csv]
+                     [-w work_dir] [-l peaklist_dir] [-r]
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import sys
+import os
+import time
+import datetime
+import inspect
+import argparse
+import multiprocessing
+
+from core import parameters, library, compounds, mixtures, anneal, checkpoint
+
+
+def get_script_dir(follow_symlinks = True):
+    if getattr(sys, 'frozen', False):
+        path = os.path.abspath(sys.executable)
+    else:
+        path = inspect.getabsfile(get_script_dir)
+    if follow_symlinks:
+        path = os.path.realpath(path)
+    return os.path.dirname(path)
+
+
+def importPeakLists(params_object, library_object):
+    """Imports the peak list of each compound in the library file, as the peak list import window does."""
+    library_object.import_log = []
+    library_object.failed_import = []
+    failed_num = 0
+    for i, row in enumerate(library_object.library_csv):
+        try:
+            compound = compounds.Compound(params_object, row)
+            if compound.active:
+                if compound.importPeakList():
+                    library_object.addLibraryCompound(i, compound)
+                    logtext = "%s peaklist import from %s succeeded" % (row[1], row[6])
+                else:
+                    logtext = "%s peaklist import from %s failed" % (row[1], row[6])
+                    library_object.failed_import.append(row[1])
+                    row[0] = "NO"
+                    failed_num += 1
+            else:
+                library_object.addLibraryCompound(i, compound)
+                logtext = "%s peaklist import from %s ignored" % (row[1], row[6])
+        except Exception as e:
+            print(e)
+            logtext = "%s peaklist import from %s failed" % (row[1], row[6])
+            library_object.failed_import.append(row[1])
+            failed_num += 1
+        print(logtext)
+        library_object.import_log.append(logtext)
+    library_object.import_log.append("Number of Compounds Imported: %d" % len(library_object.library))
+    library_object.import_log.append("Number of Inactive Compounds: %d" % len(library_object.inactive_library))
+    library_object.import_log.append("Number of Compounds Failing Import: %d" % failed_num)
+    for fail in library_object.failed_import:
+        library_object.import_log.append("Failed: %s" % fail)
+    for line in library_object.import_log[-(3 + len(library_object.failed_import)):]:
+        print(line)
+
+
+def readIgnoredRegions(params_object, library_object, regions_path):
+    """Reads the ignored regions from a CSV file in the format exported by NMRmix. As in the library peak info
+    window, group specific regions restrict the mixtures by group."""
+    ignored_regions = {}
+    regions, message_log = library_object.importIgnoreRegions(regions_path)
+    for message in message_log:
+        print(message)
+    for name, lower, upper, group in regions:
+        ignored_regions[name] = (float(lower), float(upper), group)
+        if group != 'ALL':
+            params_object.useGroup()
+            params_object.group_specific_ignored_region = True
+    return(ignored_regions)
+
+
+def printProgress(signal, *args):
+    if signal == 'newIteration' or signal == 'startRefining':
+        text, group, i = args
+        if group == "":
+            group = "N/A"
+        print("Group %s: %s iteration %d" % (group, text, i+1))
+
+
+def saveResults(params_object, library_object, mixtures_object, results_time):
+    """Writes the results folder, as the mixtures window does."""
+    results_path = os.path.join(params_object.work_dir, results_time + "_Results")
+    if not os.path.exists(results_path):
+        os.mkdir(results_path)
+    mixtures_object.exportSimpleMixturesTXT(results_path)
+    mixtures_object.exportMixturesCSV(results_path)
+    mixtures_object.exportRoiCSV(results_path)
+    mixtures_object.exportFullRoiCSV(results_path)
+    mixtures_object.exportScores(results_path)
+    mixtures_object.exportPeakListCSV(results_path)
+    library_object.exportLibraryCSV(results_path)
+    library_object.exportImportLog(results_path)
+    library_object.exportIgnoreRegions(results_path)
+    library_object.exportPeaklistCSV(results_path)
+    params_object.exportScoringParams(results_path)
+    return(results_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generates optimal NMR mixtures without the graphical interface.")
+    parser.add_argument('library', help="library CSV file")
+    parser.add_argument('-p', '--parameters', help="parameters file in the format of ~/.nmrmix/parameters.txt")
+    parser.add_argument('-i', '--ignored', help="CSV file of the regions to ignore, as exported by NMRmix")
+    parser.add_argument('-w', '--work-dir', help="directory where the results folder is written")
+    parser.add_argument('-l', '--peaklist-dir', help="directory of the local peak list files")
+    parser.add_argument('-r', '--resume', action='store_true',
+                        help="resume the unfinished optimization checkpointed in the working directory")
+    args = parser.parse_args(argv)
+    library_path = os.path.abspath(args.library)
+    nmrmix_directory = get_script_dir()
+    params = parameters.Parameters(nmrmix_directory)
+    if args.parameters:
+        if not os.path.isfile(args.parameters):
+            print("Parameters file %s does not exist." % args.parameters)
+            return(1)
+        params.readPreferences(os.path.abspath(args.parameters))
+    if args.work_dir:
+        params.setWorkingDirectory(os.path.abspath(args.work_dir))
+    if args.peaklist_dir:
+        params.setPeakListDirectory(os.path.abspath(args.peaklist_dir))
+    if not os.path.isfile(library_path):
+        print("Library file %s does not exist." % library_path)
+        return(1)
+    params.setLibraryPath(library_path)
+    checkpoint_object = None
+    if args.resume:
+        checkpoint_object = checkpoint.Checkpoint(params)
+        if not checkpoint_object.exists():
+            print("No checkpoint was found in %s." % checkpoint_object.directory)
+            return(1)
+        success, message = checkpoint_object.restoreParams(params)
+        if not success:
+            print(message)
+            return(1)
+    elif params.use_checkpoints:
+        checkpoint_object = checkpoint.Checkpoint(params)
+    ignored_path = None
+    if args.ignored:
+        ignored_path = os.path.abspath(args.ignored)
+    os.chdir(nmrmix_directory)
+
+    library_object = library.Library(params)
+    success, message = library_object.readLibraryFile()
+    if not success:
+        print(message)
+        return(1)
+    importPeakLists(params, library_object)
+    if len(library_object.library) < 2:
+        print("At least two peak lists are needed to create mixtures.")
+        return(1)
+    ignored_regions = {}
+    if ignored_path:
+        ignored_regions = readIgnoredRegions(params, library_object, ignored_path)
+    library_object.calcStats(ignored_regions)
+
+    mixtures_object = mixtures.Mixtures(params, library_object)
+    mixtures_object.generateGroupLists()
+    if args.resume:
+        success, message = checkpoint_object.restoreMixtures(mixtures_object)
+        if not success:
+            print(message)
+            return(1)
+        print("Resuming the optimization checkpointed in %s" % checkpoint_object.directory)
+    else:
+        mixtures_object.generateInitialMixtures()
+    mixtures_object.resetScores()
+    start_score, start_overlaps = mixtures_object.calculateTotalScore(mixtures_object.mixtures)
+    print("Initial Score: %0.1f" % start_score)
+    start_time = time.time()
+    optimize_time = datetime.datetime.fromtimestamp(start_time).strftime('%Y%m%d_%H%M%S')
+    anneal.optimizeMixtures(params, library_object, mixtures_object, callback=printProgress,
+                            checkpoint=checkpoint_object)
+    m, s = divmod(time.time() - start_time, 60)
+    h, m = divmod(m, 60)
+    print("Optimization Time: %d hrs, %02d mins, %02d secs" % (h, m, s))
+    for group in sorted(mixtures_object.anneal_scores):
+        for i in sorted(mixtures_object.anneal_scores[group]):
+            print("Group %s: iteration %d stopped (%s)" % (group or "N/A", i+1,
+                                                           mixtures_object.anneal_scores[group][i].stop_reason))
+    # The optimizers only keep the score differences of their moves, so the final mixtures are scored from scratch
+    # to bring the compound scores and ROIs up to date for the exports.
+    mixtures_object.resetScores()
+    mixtures_object.total_score, mixtures_object.total_overlaps = mixtures_object.calculateTotalScore(
+        mixtures_object.mixtures)
+    mixtures_object.calcPeakStats()
+    print("Final Score: %0.1f" % mixtures_object.total_score)
+    results_path = saveResults(params, library_object, mixtures_object, optimize_time)
+    print("Mixture results output to: %s" % results_path)
+    return(0)
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,982 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+anneal.py
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import math
+import random
+import copy
+import itertools
+import collections
+import multiprocessing
+
+import numpy as np
+
+from core import library
+from core import mixtures
+from core import seeding
+from core.scoretrace import ScoreTrace
+from core.tabu import MoveTable
+from core.neighbourhood import NeighbourhoodSolver
+from core.batchmoves import BatchMoves
+from core.mixstate import MixtureState
+
+
+class ConvergenceMonitor(object):
+    """Detects when an annealing has converged, so that it can stop before the last step. The annealing has converged
+    when the best score has reached the lower bound of the score, when the best score has not improved for
+    stall_steps steps, or when fewer than min_acceptance of the last stall_steps steps were accepted."""
+    def __init__(self, params_object, curr_score):
+        self.params = params_object
+        self.best_score = curr_score
+        self.best_step = 0
+        self.window = collections.deque(maxlen=self.params.stall_steps)
+        self.accepted = 0
+
+    def __getstate__(self):
+        # The parameters are set again when an annealing is resumed from a checkpoint.
+        state = dict(self.__dict__)
+        state.pop('params', None)
+        return(state)
+
+    def addScore(self, step, score):
+        if score < self.best_score:
+            self.best_score = score
+            self.best_step = step
+
+    def addStep(self, step, score, accepted):
+        self.addScore(step, score)
+        if len(self.window) == self.window.maxlen:
+            self.accepted -= self.window[0]
+        self.window.append(accepted)
+        self.accepted += accepted
+
+    def stopReason(self, step):
+        """Returns the reason to stop the annealing after a step, or None if it has not converged."""
+        if self.best_score <= self.params.score_lower_bound + 0.0001:
+            return("Lower Bound")
+        if step - self.best_step >= self.params.stall_steps:
+            return("No Improvement")
+        if (len(self.window) == self.window.maxlen and
+                self.accepted < self.params.min_acceptance * self.window.maxlen):
+            return("Low Acceptance")
+        return(None)
+
+
+class AdaptiveCooling(object):
+    """A cooling schedule that follows a target acceptance rate instead of a fixed list of temperatures. The
+    acceptance rate is the mean chance of acceptance of the proposed moves that would raise the score, since the
+    moves that lower the score or leave it unchanged are always accepted, and the chance is used rather than whether
+    the moves were accepted so that low rates can be measured over a short window. The target falls geometrically
+    from the start acceptance at the first step to the final acceptance at the last step. After each step, the
+    temperature is raised or lowered by up to a factor of e per acceptance_window moves, in proportion to how far the
+    acceptance rate of the last acceptance_window moves that would raise the score is from the target. The start
+    temperature is calibrated from the changes in score of a sample of random moves, so that the first steps are
+    accepted at the start acceptance rate whatever the size and overlaps of the library."""
+    def __init__(self, params_object, max_score, refining=False):
+        self.params = params_object
+        self.max_score = max_score
+        self.refining = refining
+        if refining:
+            self.temp = float(self.params.refine_start_temp)
+            self.max_steps = self.params.refine_max_steps
+        else:
+            self.temp = float(self.params.start_temp)
+            self.max_steps = self.params.max_steps
+        self.window = collections.deque(maxlen=self.params.acceptance_window)
+        self.accepted = 0
+
+    def __getstate__(self):
+        # The parameters are set again when an annealing is resumed from a checkpoint.
+        state = dict(self.__dict__)
+        state.pop('params', None)
+        return(state)
+
+    def __iter__(self):
+        while True:
+            yield self.temp
+
+    def acceptanceRange(self):
+        if self.refining:
+            return(self.params.refine_start_acceptance, self.params.refine_final_acceptance)
+        return(self.params.start_acceptance, self.params.final_acceptance)
+
+    def targetAcceptance(self, step):
+        start_acceptance, final_acceptance = self.acceptanceRange()
+        progress = min(step, self.max_steps) / max(self.max_steps, 1)
+        return(start_acceptance * (final_acceptance / start_acceptance) ** progress)
+
+    def uphillEnergies(self, diff_scores):
+        """Returns the energies of the acceptance rule of Annealer.annealMixtures of the changes in score in
+        diff_scores that would raise the score."""
+        energies = np.asarray(diff_scores, dtype=float) / self.max_score * 25000
+        return(energies[energies > 0])
+
+    def calibrate(self, diff_scores):
+        """Sets the temperature at which the moves in diff_scores that would raise the score are accepted at the
+        start acceptance rate on average."""
+        energies = self.uphillEnergies(diff_scores)
+        if len(energies) == 0:
+            return
+        start_acceptance = self.acceptanceRange()[0]
+        low = energies.min() * 0.001
+        high = energies.max() * 1000
+        for i in range(100):
+            temp = math.sqrt(low * high)
+            if np.mean(np.exp(-energies / temp)) > start_acceptance:
+                high = temp
+            else:
+                low = temp
+        self.temp = math.sqrt(low * high)
+
+    def addStep(self, step, diff_scores):
+        """Adjusts the temperature after a step that proposed moves with the changes in score in diff_scores."""
+        for energy in self.uphillEnergies(diff_scores).tolist():
+            if len(self.window) == self.window.maxlen:
+                self.accepted -= self.window[0]
+            acceptance = math.exp(-min(energy / self.temp, 700))
+            self.window.append(acceptance)
+            self.accepted += acceptance
+        if not self.window:
+            return
+        acceptance = self.accepted / len(self.window)
+        target = self.targetAcceptance(step)
+        error = (target - acceptance) / max(target, acceptance)
+        self.temp *= math.exp(error / self.window.maxlen)
+
+
+class Annealer(object):
+    """Runs the simulated annealing of the mixtures of one group, without any dependence on Qt. The progress is
+    reported through the newIteration, startRefining and newStep callbacks, which take the same arguments as the
+    signals of the optimization window, and the annealing stops early when exiting is set. The segments of the
+    parallel tempering are run one after another, unless segment_runner is set to a function that runs them in
+    parallel. Every random choice is made with the random generator of the annealer, which is seeded from seeds at
+    the start of each iteration if they are given. When checkpoint is set, the state of each iteration is saved
+    every checkpoint_interval steps and when the annealing is stopped, and an iteration that was saved is resumed
+    from its state instead of started again."""
+    def __init__(self, params_object, mixtures_object, group, mixnum_list):
+        self.params = params_object
+        self.mixtures = mixtures_object
+        self.group = group
+        self.mixnum_list = list(mixnum_list)
+        self.anneal_scores = {}
+        self.refine_scores = {}
+        self.best_mixtures = {}
+        self.best_score = None
+        self.newIteration = None
+        self.startRefining = None
+        self.newStep = None
+        self.segment_runner = None
+        self.random = random.Random()
+        self.seeds = None
+        self.checkpoint = None
+        self.iteration = 0
+        self.exiting = False
+
+    def stop(self):
+        self.exiting = True
+
+    def emit(self, callback, *args):
+        if callback is not None:
+            callback(*args)
+
+    def run(self):
+        """Performs each iteration of the annealing, and keeps the mixtures of the best iteration in best_mixtures."""
+        i = 0
+        while not self.exiting and i < self.params.iterations:
+            self.emit(self.newIteration, "Optimizing", self.group, i)
+            if self.seeds is not None:
+                curr_score, mixtures_dict = self.runIteration(i, self.seeds[i])
+            else:
+                curr_score, mixtures_dict = self.runIteration(i)
+            self.addIteration(i, curr_score, mixtures_dict)
+            i += 1
+        return(self.best_score, self.best_mixtures)
+
+    def addIteration(self, i, curr_score, mixtures_dict):
+        """Keeps the mixtures of an iteration if they score as well as the best iteration so far. When iterations
+        have the same score, the latest one is kept, so the iterations must be added in order."""
+        if i == 0 or curr_score <= self.best_score:
+            self.best_mixtures = mixtures_dict
+            self.best_score = curr_score
+
+    def runIteration(self, i, seed=None):
+        self.iteration = i
+        if seed is not None:
+            self.random.seed(seed)
+        resume = None
+        if self.checkpoint is not None:
+            resume = self.checkpoint.loadIteration(self.group, i)
+        if resume is not None:
+            self.random.setstate(resume['random'])
+            if resume['phase'] == 'done':
+                self.anneal_scores[i] = resume['traces']['optimize']
+                if 'refine' in resume['traces']:
+                    self.refine_scores[i] = resume['traces']['refine']
+                return(resume['curr_score'], resume['mixtures'])
+        if resume is not None and resume['phase'] == 'refine':
+            self.anneal_scores[i] = resume['traces']['optimize']
+            curr_score = None
+            mixtures_dict = None
+        else:
+            if resume is not None:
+                init_mixtures = None
+            elif self.params.randomize_initial:
+                init_mixtures = self.randomizeMixtures()
+            else:
+                init_mixtures = {}
+                for mixnum in self.mixnum_list:
+                    init_mixtures[mixnum] = list(self.mixtures.mixtures[mixnum])
+            if self.params.optimizer == 'tempering':
+                curr_score, mixtures_dict, scores = self.temperMixtures(init_mixtures, resume=resume)
+            elif self.params.optimizer == 'tabu':
+                curr_score, mixtures_dict, scores = self.tabuMixtures(init_mixtures, resume=resume)
+            elif self.params.optimizer == 'neighbourhood':
+                curr_score, mixtures_dict, scores = self.neighbourhoodMixtures(init_mixtures, resume=resume)
+            else:
+                curr_score, mixtures_dict, scores = self.annealMixtures(init_mixtures, resume=resume)
+            self.anneal_scores[i] = scores
+            resume = None
+            if self.exiting:
+                return(curr_score, mixtures_dict)
+        if self.params.use_refine:
+            self.emit(self.startRefining, "Refining", self.group, i)
+            curr_score, mixtures_dict, refine_scores = self.annealMixtures(mixtures_dict, refining=True,
+                                                                           resume=resume)
+            self.refine_scores[i] = refine_scores
+            if self.exiting:
+                return(curr_score, mixtures_dict)
+        if self.checkpoint is not None:
+            traces = {'optimize': self.anneal_scores[i]}
+            if i in self.refine_scores:
+                traces['refine'] = self.refine_scores[i]
+            self.saveCheckpoint('done', {'curr_score': curr_score, 'mixtures': mixtures_dict}, traces)
+        return(curr_score, mixtures_dict)
+
+    def saveCheckpoint(self, phase, state, traces):
+        state['phase'] = phase
+        state['random'] = self.random.getstate()
+        self.checkpoint.saveIteration(self.group, self.iteration, state, traces)
+
+    def randomizeMixtures(self):
+        compound_list = []
+        mixtures_dict = {}
+        for mixnum in self.mixnum_list:
+            compounds = list(self.mixtures.mixtures[mixnum])
+            for compound in compounds:
+                compound_list.append(compound)
+        self.random.shuffle(compound_list)
+        if self.params.greedy_initial:
+            return(self.mixtures.greedyMixtures(compound_list, self.mixnum_list))
+        for mixnum in self.mixnum_list:
+            mixtures_dict[mixnum] = []
+            for mix_size in range(self.params.mix_size):
+                if len(compound_list) != 0:
+                    compound = compound_list.pop()
+                    mixtures_dict[mixnum].append(compound)
+            mixtures_dict[mixnum].sort()
+        return(mixtures_dict)
+
+    def temperatureLadder(self):
+        """Returns the temperatures of the replicas of the parallel tempering, spaced geometrically from the
+        starting temperature down to the final temperature."""
+        if self.params.replicas < 2:
+            return([float(self.params.final_temp)])
+        ratio = self.params.final_temp / self.params.start_temp
+        return([self.params.start_temp * (ratio ** (k / (self.params.replicas - 1)))
+                for k in range(self.params.replicas)])
+
+    def temperMixtures(self, mixtures_dict, resume=None):
+        """Optimizes the mixtures by parallel tempering. A replica of the mixtures is annealed at each temperature of
+        the ladder for exchange_interval steps, and then neighbouring replicas exchange their mixtures by the
+        Metropolis criterion, so that good mixtures found at high temperatures move down to the low temperatures.
+        Returns the best mixtures found by any replica, with the score trace of the coldest replica. With early
+        stopping, the convergence is checked on the coldest replica after each exchange. The state is checkpointed
+        after the exchanges, and if the segments are stopped before they finish, the state before them is checkpointed
+        instead, so that they are run again with the same seeds when the optimization is resumed."""
+        temperatures = self.temperatureLadder()
+        # The same scale as the acceptance probability of the optimizing steps in annealMixtures.
+        max_score = self.params.refine_mix_rate * self.params.score_scale
+        betas = [25000 / (max_score * temp) for temp in temperatures]
+        monitor = None
+        if resume is not None:
+            replicas = resume['replicas']
+            replica_scores = resume['replica_scores']
+            best_score = resume['best_score']
+            best_mixtures = resume['best_mixtures']
+            step = resume['step']
+            exchange = resume['exchange']
+            scores = resume['traces']['optimize']
+            scores.reserve(self.params.max_steps)
+            if resume['monitor'] is not None:
+                monitor = resume['monitor']
+                monitor.params = self.params
+        else:
+            replicas = [copy.deepcopy(mixtures_dict) for temp in temperatures]
+            best_score = self.mixtures.calculateTotalScore(mixtures_dict)[0]
+            best_mixtures = copy.deepcopy(mixtures_dict)
+            replica_scores = [best_score for temp in temperatures]
+            scores = ScoreTrace(max_score=max_score, size=self.params.max_steps)
+            step = 0
+            exchange = 0
+            if self.params.use_early_stop:
+                monitor = ConvergenceMonitor(self.params, best_score)
+        def saveState():
+            self.saveCheckpoint('temper', {'replicas': replicas, 'replica_scores': replica_scores,
+                                           'best_score': best_score, 'best_mixtures': best_mixtures, 'step': step,
+                                           'exchange': exchange, 'monitor': monitor}, {'optimize': scores})
+        while step < self.params.max_steps and not self.exiting:
+            num_steps = min(self.params.exchange_interval, self.params.max_steps - step)
+            random_state = self.random.getstate()
+            results = self.runSegments([(replicas[k], temperatures[k], num_steps, self.random.getrandbits(32))
+                                        for k in range(len(replicas))])
+            if results is None:
+                self.stop()
+                if self.checkpoint is not None:
+                    self.random.setstate(random_state)
+                    saveState()
+                break
+            for k, (curr_score, mixtures, segment_scores) in enumerate(results):
+                replicas[k] = mixtures
+                replica_scores[k] = curr_score
+                if curr_score <= best_score:
+                    best_score = curr_score
+                    best_mixtures = mixtures
+            coldest_scores = results[-1][2]
+            scores.extend(coldest_scores, step)
+            if monitor is not None:
+                for segment_step, score, accepted in zip(coldest_scores['step'], coldest_scores.scores(),
+                                                         coldest_scores['accepted']):
+                    monitor.addStep(segment_step + step, score, accepted)
+            step += num_steps
+            self.emit(self.newStep, self.group, step, best_score, False)
+            if best_score <= 0.0001:
+                scores.stop_reason = "Zero Score"
+                break
+            if monitor is not None:
+                monitor.addScore(step, best_score)
+                stop_reason = monitor.stopReason(step)
+                if stop_reason is not None:
+                    scores.stop_reason = stop_reason
+                    break
+            for k in range(exchange % 2, len(replicas) - 1, 2):
+                delta = (betas[k] - betas[k+1]) * (replica_scores[k] - replica_scores[k+1])
+                if delta >= 0 or self.random.random() < math.exp(delta):
+                    replicas[k], replicas[k+1] = replicas[k+1], replicas[k]
+                    replica_scores[k], replica_scores[k+1] = replica_scores[k+1], replica_scores[k]
+            exchange += 1
+            if self.checkpoint is not None and (self.exiting or
+                                                step // self.checkpoint.interval !=
+                                                (step - num_steps) // self.checkpoint.interval):
+                saveState()
+        if self.exiting:
+            scores.stop_reason = "Stopped"
+        scores.trim()
+        return(best_score, best_mixtures, scores)
+
+    def tabuMixtures(self, mixtures_dict, resume=None):
+        """Optimizes the mixtures by tabu search. Each step makes the best move of a compound between two mixtures,
+        either into a mixture that is not full or as a swap with a compound of the other mixture, even if it makes
+        the score worse. A compound may not go back to a mixture it left within the last tabu_tenure steps, unless
+        the move gives a better score than any found so far. The moves are chosen from a MoveTable of the changes in
+        score, and the tabu_candidates moves with the best estimates are scored exactly. The search has no random
+        choices. Returns the best mixtures found, with the score trace of the search."""
+        max_score = self.params.refine_mix_rate * self.params.score_scale
+        if resume is not None:
+            mixtures = copy.deepcopy(resume['mixtures'])
+            self.mixtures.calculateTotalScore(mixtures)
+            curr_score = resume['curr_score']
+            curr_overlap = resume['curr_overlap']
+            best_score = resume['best_score']
+            best_mixtures = resume['best_mixtures']
+            tabu_until = resume['tabu_until']
+            step = resume['step']
+            scores = resume['traces']['optimize']
+            scores.reserve(self.params.max_steps)
+            monitor = resume['monitor']
+            if monitor is not None:
+                monitor.params = self.params
+            self.emit(self.newStep, self.group, step - 1, curr_score, False)
+        else:
+            mixtures = copy.deepcopy(mixtures_dict)
+            curr_score, curr_overlap = self.mixtures.calculateTotalScore(mixtures)
+            best_score = curr_score
+            best_mixtures = copy.deepcopy(mixtures)
+            tabu_until = None
+            step = 1
+            num_peaks = 0
+            for mixture in mixtures:
+                for compound in mixtures[mixture]:
+                    num_peaks += self.mixtures.compound_scores[compound][2]
+            scores = ScoreTrace(num_peaks, max_score, size=self.params.max_steps)
+            monitor = None
+            if self.params.use_early_stop:
+                monitor = ConvergenceMonitor(self.params, curr_score)
+        unlocked_list = [mixnum for mixnum in mixtures if mixnum not in self.mixtures.mixtures_lock]
+        table = MoveTable(self.mixtures, mixtures, unlocked_list)
+        if tabu_until is None:
+            tabu_until = np.zeros((len(table.compound_list), len(unlocked_list)), dtype=np.int64)
+        while step <= self.params.max_steps:
+            if (step % self.params.print_step_size) == 0:
+                self.emit(self.newStep, self.group, step, curr_score, False)
+            candidates = table.candidateMoves(self.params.tabu_candidates, tabu_until, step, best_score - curr_score)
+            if not candidates:
+                # Every move is tabu, so the best move is made regardless.
+                candidates = table.candidateMoves(self.params.tabu_candidates)
+            if not candidates:
+                scores.stop_reason = "Locked Mixtures"
+                break
+            best_move = None
+            for estimate, i, j in candidates:
+                diff_score, diff_overlaps = table.moveDelta(i, j)
+                if best_move is None or diff_score < best_move[0]:
+                    best_move = (diff_score, diff_overlaps, i, j)
+            diff_score, diff_overlaps, i, j = best_move
+            new_score = curr_score + diff_score
+            new_overlap = curr_overlap + diff_overlaps
+            scores.append(step, 0.0, curr_score, new_score, curr_overlap, new_overlap, 1, True)
+            from_k, to_k = table.applyMove(i, j)
+            tabu_until[i, from_k] = step + self.params.tabu_tenure
+            if j >= 0:
+                tabu_until[j, to_k] = step + self.params.tabu_tenure
+            curr_score = new_score
+            curr_overlap = new_overlap
+            if curr_score < best_score:
+                best_score = curr_score
+                best_mixtures = copy.deepcopy(mixtures)
+            if curr_score <= 0.0001:
+                self.emit(self.newStep, self.group, step, abs(curr_score), False)
+                scores.stop_reason = "Zero Score"
+                break
+            if monitor is not None:
+                monitor.addStep(step, curr_score, True)
+                stop_reason = monitor.stopReason(step)
+                if stop_reason is not None:
+                    self.emit(self.newStep, self.group, step, curr_score, False)
+                    scores.stop_reason = stop_reason
+                    break
+            step += 1
+            if step > self.params.max_steps:
+                self.emit(self.newStep, self.group, step-1, curr_score, False)
+                break
+            if self.checkpoint is not None and (self.exiting or (step - 1) % self.checkpoint.interval == 0):
+                self.saveCheckpoint('tabu', {'mixtures': mixtures, 'curr_score': curr_score,
+                                             'curr_overlap': curr_overlap, 'best_score': best_score,
+                                             'best_mixtures': best_mixtures, 'tabu_until': tabu_until, 'step': step,
+                                             'monitor': monitor}, {'optimize': scores})
+            if self.exiting:
+                self.emit(self.newStep, self.group, step, curr_score, False)
+                scores.stop_reason = "Stopped"
+                break
+        scores.trim()
+        return(best_score, best_mixtures, scores)
+
+    def neighbourhoodMixtures(self, mixtures_dict, resume=None):
+        """Optimizes the mixtures by large neighbourhood search. Each step picks neighbourhood_mixtures mixtures,
+        the first at random with a chance in proportion to its score and the others uniformly, and re-partitions
+        their compounds with the lowest total score by the branch and bound of NeighbourhoodSolver. The new
+        mixtures are kept only if they score better. Returns the mixtures with the score trace of the search."""
+        max_score = self.params.refine_mix_rate * self.params.score_scale
+        if resume is not None:
+            mixtures = copy.deepcopy(resume['mixtures'])
+            self.mixtures.calculateTotalScore(mixtures)
+            curr_score = resume['curr_score']
+            curr_overlap = resume['curr_overlap']
+            step = resume['step']
+            scores = resume['traces']['optimize']
+            scores.reserve(self.params.max_steps)
+            monitor = resume['monitor']
+            if monitor is not None:
+                monitor.params = self.params
+            self.emit(self.newStep, self.group, step - 1, curr_score, False)
+        else:
+            mixtures = copy.deepcopy(mixtures_dict)
+            curr_score, curr_overlap = self.mixtures.calculateTotalScore(mixtures)
+            step = 1
+            num_peaks = 0
+            for mixture in mixtures:
+                for compound in mixtures[mixture]:
+                    num_peaks += self.mixtures.compound_scores[compound][2]
+            scores = ScoreTrace(num_peaks, max_score, size=self.params.max_steps)
+            monitor = None
+            if self.params.use_early_stop:
+                monitor = ConvergenceMonitor(self.params, curr_score)
+        unlocked_list = [mixnum for mixnum in sorted(mixtures) if mixnum not in self.mixtures.mixtures_lock]
+        num_mixtures = min(self.params.neighbourhood_mixtures, len(unlocked_list))
+        solver = NeighbourhoodSolver(self.mixtures, self.params.neighbourhood_nodes)
+        while step <= self.params.max_steps:
+            if (step % self.params.print_step_size) == 0:
+                self.emit(self.newStep, self.group, step, curr_score, False)
+            if num_mixtures < 2:
+                scores.stop_reason = "Locked Mixtures"
+                break
+            mixture_scores = [self.mixtures.calculateMixtureScore(mixtures[mixnum], temp_score=True)[0]
+                              for mixnum in unlocked_list]
+            pick = self.random.random() * sum(mixture_scores)
+            first = unlocked_list[-1]
+            for mixnum, mixture_score in zip(unlocked_list, mixture_scores):
+                if pick < mixture_score:
+                    first = mixnum
+                    break
+                pick -= mixture_score
+            neighbourhood = [first] + self.random.sample([mixnum for mixnum in unlocked_list if mixnum != first],
+                                                         num_mixtures - 1)
+            result = solver.solve([mixtures[mixnum] for mixnum in neighbourhood])
+            if result is not None:
+                partition, diff_score, diff_overlaps = result
+                new_score = curr_score + diff_score
+                new_overlap = curr_overlap + diff_overlaps
+                scores.append(step, 0.0, curr_score, new_score, curr_overlap, new_overlap, 1, True)
+                for mixnum, mixture_list in zip(neighbourhood, partition):
+                    mixtures[mixnum] = mixture_list
+                curr_score = new_score
+                curr_overlap = new_overlap
+                accepted = True
+            else:
+                scores.append(step, 0.0, curr_score, curr_score, curr_overlap, curr_overlap, 0, False)
+                accepted = False
+            if curr_score <= 0.0001:
+                self.emit(self.newStep, self.group, step, abs(curr_score), False)
+                scores.stop_reason = "Zero Score"
+                break
+            if monitor is not None:
+                monitor.addStep(step, curr_score, accepted)
+                stop_reason = monitor.stopReason(step)
+                if stop_reason is not None:
+                    self.emit(self.newStep, self.group, step, curr_score, False)
+                    scores.stop_reason = stop_reason
+                    break
+            step += 1
+            if step > self.params.max_steps:
+                self.emit(self.newStep, self.group, step-1, curr_score, False)
+                break
+            if self.checkpoint is not None and (self.exiting or (step - 1) % self.checkpoint.interval == 0):
+                self.saveCheckpoint('neighbourhood', {'mixtures': mixtures, 'curr_score': curr_score,
+                                                      'curr_overlap': curr_overlap, 'step': step, 'monitor': monitor},
+                                    {'optimize': scores})
+            if self.exiting:
+                self.emit(self.newStep, self.group, step, curr_score, False)
+                scores.stop_reason = "Stopped"
+                break
+        scores.trim()
+        return(curr_score, mixtures, scores)
+
+    def runSegments(self, segments):
+        """Anneals each replica of a list of (mixtures, temperature, steps, seed) segments at its constant
+        temperature, and returns the result of annealMixtures for each one, or None if the optimization was
+        stopped."""
+        if self.segment_runner is not None:
+            return(self.segment_runner(segments))
+        results = []
+        for mixtures_dict, temp, num_steps, seed in segments:
+            if self.exiting:
+                return(None)
+            segment = Annealer(self.params, self.mixtures, self.group, self.mixnum_list)
+            segment.random.seed(seed)
+            results.append(segment.annealMixtures(mixtures_dict, temperatures=[temp] * num_steps))
+        return(results)
+
+    def annealMixtures(self, mixtures_dict, refining=False, temperatures=None, resume=None):
+        """Anneals the mixtures along the cooling schedule from Parameters, or along a list of temperatures with one
+        temperature for each step. With early stopping, the annealing along the cooling schedule stops once it has
+        converged, and the reason that it stopped is kept in the stop_reason of the score trace. The annealing
+        continues from the checkpointed state in resume if it is given."""
+        if refining:
+            cooling = self.params.refine_cooling
+            max_steps = self.params.refine_max_steps
+            mix_rate = self.params.mix_rate
+            phase = 'refine'
+        else:
+            cooling = self.params.cooling
+            max_steps = self.params.max_steps
+            mix_rate = self.params.refine_mix_rate
+            phase = 'optimize'
+        max_score = mix_rate * self.params.score_scale
+        if resume is not None:
+            mixtures = copy.deepcopy(resume['mixtures'])
+            self.mixtures.calculateTotalScore(mixtures)
+            curr_score = resume['curr_score']
+            curr_overlap = resume['curr_overlap']
+        else:
+            mixtures = copy.deepcopy(mixtures_dict)
+            curr_score, curr_overlap = self.mixtures.calculateTotalScore(mixtures)
+        unlocked_list = list(mixtures.keys())
+        for mixture in self.mixtures.mixtures_lock:
+            if mixture in unlocked_list:
+                unlocked_list.remove(mixture)
+        num_peaks = 0
+        for mixture in mixtures:
+            for compound in mixtures[mixture]:
+                num_peaks += self.mixtures.compound_scores[compound][2]
+        state = MixtureState(self.mixtures, mixtures, unlocked_list)
+        step = 1
+        if temperatures is not None:
+            cooling_schedule = temperatures
+            max_steps = len(temperatures)
+        elif cooling == 'exponential':
+            cooling_schedule = self.mixtures.exponentialCooling(refining)
+        elif cooling == 'adaptive':
+            cooling_schedule = AdaptiveCooling(self.params, max_score, refining)
+        else:
+            cooling_schedule = self.mixtures.linearCooling(refining)
+        monitor = None
+        if resume is not None:
+            step = resume['step']
+            if resume.get('cooling') is not None:
+                cooling_schedule = resume['cooling']
+                cooling_schedule.params = self.params
+            else:
+                cooling_schedule = itertools.islice(cooling_schedule, step - 1, None)
+            scores = resume['traces'][phase]
+            scores.reserve(max_steps)
+            if resume['monitor'] is not None:
+                monitor = resume['monitor']
+                monitor.params = self.params
+            self.emit(self.newStep, self.group, step - 1, curr_score, refining)
+        else:
+            scores = ScoreTrace(num_peaks, max_score, size=max_steps)
+            if self.params.use_early_stop and temperatures is None:
+                monitor = ConvergenceMonitor(self.params, curr_score)
+        checkpoint = None
+        if temperatures is None:
+            checkpoint = self.checkpoint
+        adaptive = None
+        if isinstance(cooling_schedule, AdaptiveCooling):
+            adaptive = cooling_schedule
+            if resume is None and len(unlocked_list) >= 2:
+                diff_scores = []
+                for i in range(self.params.acceptance_window):
+                    mixture_rows, picks = state.proposeMove(self.random, refining)
+                    diff_scores.append(state.moveDelta(mixture_rows, picks)[0])
+                adaptive.calibrate(diff_scores)
+        batch = None
+        if self.params.batch_size > 1 and len(unlocked_list) >= 2:
+            # The random state of a resumed batch was drawn before the checkpoint, so it is not drawn again.
+            if resume is not None and resume.get('batch_random') is not None:
+                batch = BatchMoves(state, 0)
+                batch.rng.bit_generator.state = resume['batch_random']
+            else:
+                batch = BatchMoves(state, self.random.getrandbits(64))
+        for current_temp in cooling_schedule:
+            if (step % self.params.print_step_size) == 0:
+                self.emit(self.newStep, self.group, step, curr_score, refining)
+            if batch is not None:
+                mixture_rows, picks, diff_score, diff_overlaps, probability = batch.sampleMove(current_temp,
+                                                                                               max_score, refining)
+            elif len(unlocked_list) >= 2:
+                mixture_rows, picks = state.proposeMove(self.random, refining)
+                diff_score, diff_overlaps = state.moveDelta(mixture_rows, picks)
+            else:
+                scores.stop_reason = "Locked Mixtures"
+                break
+            new_score = curr_score + diff_score
+            new_overlap = curr_overlap + diff_overlaps
+            if batch is not None:
+                # The sampled candidate is always made, unless the current mixtures were sampled.
+                accepted = mixture_rows is not None
+                scores.append(step, current_temp, curr_score, new_score, curr_overlap, new_overlap, probability,
+                              accepted)
+                if accepted:
+                    batch.applyMove(mixture_rows, picks)
+                    curr_score = new_score
+                    curr_overlap = new_overlap
+                if curr_score <= 0.0001:
+                    self.emit(self.newStep, self.group, step, abs(curr_score), refining)
+                    scores.stop_reason = "Zero Score"
+                    break
+            elif new_score <= 0.0001:
+                scores.append(step, current_temp, curr_score, new_score, curr_overlap, new_overlap, 1, True)
+                state.applyMove(mixture_rows, picks)
+                curr_score = new_score
+                curr_overlap = new_overlap
+                self.emit(self.newStep, self.group, step, abs(curr_score), refining)
+                scores.stop_reason = "Zero Score"
+                break
+            elif new_score <= curr_score:
+                accepted = True
+                scores.append(step, current_temp, curr_score, new_score, curr_overlap, new_overlap, 1, accepted)
+                state.applyMove(mixture_rows, picks)
+                curr_score = new_score
+                curr_overlap = new_overlap
+            else:
+                if current_temp > 0.0:
+                    score_diff = new_score - curr_score
+                    probability = math.exp(((-score_diff / max_score) / current_temp) * 25000)
+                    accepted = self.random.random() < probability
+                    scores.append(step, current_temp, curr_score, new_score, curr_overlap, new_overlap, probability,
+                                  accepted)
+                    if accepted:
+                        state.applyMove(mixture_rows, picks)
+                        curr_score = new_score
+                        curr_overlap = new_overlap
+                else:
+                    accepted = False
+                    scores.append(step, current_temp, curr_score, new_score, curr_overlap, new_overlap, 0, accepted)
+            if adaptive is not None:
+                if batch is not None:
+                    adaptive.addStep(step, batch.diff_scores)
+                else:
+                    adaptive.addStep(step, [diff_score])
+            if monitor is not None:
+                monitor.addStep(step, curr_score, accepted)
+                stop_reason = monitor.stopReason(step)
+                if stop_reason is not None:
+                    self.emit(self.newStep, self.group, step, curr_score, refining)
+                    scores.stop_reason = stop_reason
+                    break
+            step += 1
+            if step > max_steps:
+                self.emit(self.newStep, self.group, step-1, curr_score, refining)
+                break
+            if checkpoint is not None and (self.exiting or (step - 1) % checkpoint.interval == 0):
+                traces = {phase: scores}
+                if refining:
+                    traces['optimize'] = self.anneal_scores[self.iteration]
+                batch_random = None
+                if batch is not None:
+                    batch_random = batch.rng.bit_generator.state
+                # The compounds keep the order of their columns, so that the resumed annealing rebuilds the same array.
+                mixtures.update(state.toDict(sort=False))
+                self.saveCheckpoint(phase, {'mixtures': mixtures, 'curr_score': curr_score,
+                                            'curr_overlap': curr_overlap, 'step': step, 'monitor': monitor,
+                                            'batch_random': batch_random, 'cooling': adaptive}, traces)
+            if self.exiting:
+                self.emit(self.newStep, self.group, step, curr_score, refining)
+                scores.stop_reason = "Stopped"
+                break
+        scores.trim()
+        mixtures.update(state.toDict())
+        return(curr_score, mixtures, scores)
+
+
+# The process backend. Each worker process rebuilds the library from a PeakTable of the library peaks when it starts,
+# and then anneals the iterations it is sent. The progress of each iteration is put on the queue of its group, and
+# the statistics of the score cache of the worker during each task are returned with its result, so that they can be
+# added to the statistics of the main process. The optimization is stopped by setting the stop event of the pool,
+# which the tasks check whenever they report their progress, so that they can be checkpointed before the pool is
+# terminated.
+worker_mixtures = None
+worker_queues = {}
+worker_stop = None
+
+
+def createPool(params_object, library_object, mixtures_object, groups):
+    """Starts the pool of worker processes for the process backend. Returns the pool, a dictionary with the
+    progress queue of each group and the event that stops the tasks of the pool."""
+    stop_event = multiprocessing.Event()
+    queues = {}
+    for group in groups:
+        queues[group] = multiprocessing.Queue()
+    if params_object.optimizer == 'tempering':
+        num_tasks = len(groups) * params_object.replicas
+    else:
+        num_tasks = len(groups) * params_object.iterations
+    if params_object.worker_processes > 0:
+        processes = min(params_object.worker_processes, num_tasks)
+    else:
+        processes = min(multiprocessing.cpu_count(), num_tasks)
+    pool = multiprocessing.Pool(max(processes, 1), initializer=initWorker,
+                                initargs=(params_object, library_object.generatePeakTable(),
+                                          list(mixtures_object.mixtures_lock), queues, stop_event))
+    return(pool, queues, stop_event)
+
+
+def randomSeeds(count):
+    """Returns a list of random seeds for tasks run in the worker processes, so that they do not repeat the same
+    moves."""
+    return([random.getrandbits(32) for i in range(count)])
+
+
+def groupSeeds(params_object, groups):
+    """Returns the random seeds of the iterations of each group. With a seed in Parameters, each iteration of each
+    group has its own stream spawned from it, so the optimization can be repeated exactly with either backend."""
+    if params_object.use_seed:
+        seeds = {}
+        for group in groups:
+            group_index = seeding.groupIndex(groups, group)
+            seeds[group] = [seeding.streamSeed(params_object, seeding.ITERATIONS, group_index, i)
+                            for i in range(params_object.iterations)]
+        return(seeds)
+    return(dict((group, randomSeeds(params_object.iterations)) for group in groups))
+
+
+def initWorker(params_object, peak_table, mixtures_lock, queues, stop_event):
+    global worker_mixtures, worker_queues, worker_stop
+    worker_library = library.Library(params_object)
+    worker_library.addPeakTableCompounds(peak_table)
+    worker_mixtures = mixtures.Mixtures(params_object, worker_library)
+    worker_mixtures.mixtures_lock = mixtures_lock
+    worker_queues = queues
+    worker_stop = stop_event
+
+
+def watchStop(annealer, callback=None):
+    """Returns a newStep callback for an annealer in a worker process, which passes the progress on to callback and
+    stops the annealer once the stop event of the pool is set."""
+    def newStep(*args):
+        if callback is not None:
+            callback(*args)
+        if worker_stop.is_set():
+            annealer.stop()
+    return(newStep)
+
+
+def stopPool(stop_event, results):
+    """Stops the tasks of the process pool and waits for the results of the tasks that were sent to it, so that
+    the stopped iterations have been checkpointed by the workers before the pool is terminated."""
+    stop_event.set()
+    for result in results:
+        result.wait()
+
+
+def annealIteration(group, mixnum_list, mixtures_dict, i, seed, checkpoint=None):
+    """Performs one iteration of the annealing of a group in a worker process. Progress messages are put on the
+    queue of the group as tuples of the name of the signal, the iteration and the arguments of the signal. Returns
+    the score and mixtures of the iteration, its score traces and the statistics of the score cache, or None if the
+    optimization was stopped, once the iteration has been checkpointed."""
+    if worker_stop.is_set():
+        return(None)
+    worker_mixtures.mixtures = mixtures_dict
+    worker_mixtures.score_cache.resetStats()
+    queue = worker_queues[group]
+    annealer = Annealer(worker_mixtures.params, worker_mixtures, group, mixnum_list)
+    annealer.newIteration = lambda *args: queue.put(('newIteration', i) + args)
+    annealer.startRefining = lambda *args: queue.put(('startRefining', i) + args)
+    annealer.newStep = watchStop(annealer, lambda *args: queue.put(('newStep', i) + args))
+    annealer.checkpoint = checkpoint
+    annealer.emit(annealer.newIteration, "Optimizing", group, i)
+    curr_score, best_mixtures = annealer.runIteration(i, seed)
+    if annealer.exiting:
+        return(None)
+    return(curr_score, best_mixtures, annealer.anneal_scores[i], annealer.refine_scores.get(i),
+           worker_mixtures.score_cache.stats())
+
+
+def temperSegment(group, mixnum_list, mixtures_dict, temp, num_steps, seed):
+    """Anneals one replica of the parallel tempering at a constant temperature in a worker process. Returns the
+    result of Annealer.annealMixtures and the statistics of the score cache, or None if the optimization was stopped
+    before the segment finished."""
+    if worker_stop.is_set():
+        return(None)
+    worker_mixtures.score_cache.resetStats()
+    annealer = Annealer(worker_mixtures.params, worker_mixtures, group, mixnum_list)
+    annealer.newStep = watchStop(annealer)
+    annealer.random.seed(seed)
+    curr_score, mixtures_dict, scores = annealer.annealMixtures(mixtures_dict, temperatures=[temp] * num_steps)
+    if annealer.exiting:
+        return(None)
+    return(curr_score, mixtures_dict, scores, worker_mixtures.score_cache.stats())
+
+
+def relayMessages(queues, callback=None):
+    """Takes every progress message waiting on the queues of the groups, and passes the name and arguments of the
+    signal of each message to callback."""
+    for group in queues:
+        while True:
+            try:
+                message = queues[group].get(False)
+            except:
+                break
+            if callback is not None:
+                callback(message[0], *message[2:])
+
+
+def waitForResult(result, queues, callback=None):
+    """Waits for a task in the process pool to finish while relaying the progress messages, and returns its result."""
+    while not result.ready():
+        result.wait(0.1)
+        relayMessages(queues, callback)
+    relayMessages(queues, callback)
+    return(result.get())
+
+
+def poolSegmentRunner(pool, queues, group, mixnum_list, score_cache, callback=None):
+    """Returns a segment_runner for an Annealer that runs the segments of the parallel tempering of a group in
+    parallel in the process pool. The statistics of the score caches of the workers are added to score_cache. The
+    runner returns None if the pool was stopped before every segment finished."""
+    def runSegments(segments):
+        results = []
+        for segment in segments:
+            results.append(pool.apply_async(temperSegment, (group, mixnum_list) + tuple(segment)))
+        segment_results = []
+        for result in results:
+            segment_result = waitForResult(result, queues, callback)
+            if segment_result is None:
+                segment_results = None
+            elif segment_results is not None:
+                curr_score, mixtures_dict, scores, cache_stats = segment_result
+                score_cache.addStats(cache_stats)
+                segment_results.append((curr_score, mixtures_dict, scores))
+        return(segment_results)
+    return(runSegments)
+
+
+def optimizeMixtures(params_object, library_object, mixtures_object, callback=None, checkpoint=None):
+    """Optimizes the mixtures of every group, with the backend and optimizer from Parameters, and updates the
+    mixtures and the score traces of mixtures_object. This does the same as the optimization window without Qt, and
+    is used by the command line version. The progress is passed to callback as the name and arguments of the signals
+    of the optimization window. The optimization is checkpointed if checkpoint is given, and if the checkpoint was
+    loaded from an unfinished optimization, that optimization is resumed. The checkpoint is removed once the
+    optimization has finished."""
+    groups = list(mixtures_object.group_mixnum.keys())
+    mixtures_object.calculateTotalScore(mixtures_object.mixtures)
+    if checkpoint is not None and checkpoint.seeds is not None:
+        seeds = checkpoint.seeds
+    else:
+        seeds = groupSeeds(params_object, groups)
+        if checkpoint is not None:
+            checkpoint.saveRun(params_object, mixtures_object, seeds)
+    annealers = {}
+    for group in groups:
+        annealers[group] = Annealer(params_object, mixtures_object, group, mixtures_object.group_mixnum[group])
+        annealers[group].seeds = seeds[group]
+        annealers[group].checkpoint = checkpoint
+        if callback is not None:
+            annealers[group].newIteration = lambda *args: callback('newIteration', *args)
+            annealers[group].startRefining = lambda *args: callback('startRefining', *args)
+            annealers[group].newStep = lambda *args: callback('newStep', *args)
+    if params_object.anneal_backend == 'processes':
+        pool, queues, stop_event = createPool(params_object, library_object, mixtures_object, groups)
+        try:
+            if params_object.optimizer == 'tempering':
+                for group in groups:
+                    annealers[group].segment_runner = poolSegmentRunner(pool, queues, group,
+                                                                        annealers[group].mixnum_list,
+                                                                        mixtures_object.score_cache, callback)
+                    annealers[group].run()
+            else:
+                results = {}
+                for group in groups:
+                    group_mixtures = {}
+                    for mixnum in annealers[group].mixnum_list:
+                        group_mixtures[mixnum] = list(mixtures_object.mixtures[mixnum])
+                    results[group] = []
+                    for i, seed in enumerate(seeds[group]):
+                        results[group].append(pool.apply_async(annealIteration, (group, annealers[group].mixnum_list,
+                                                                                 group_mixtures, i, seed,
+                                                                                 checkpoint)))
+                for group in groups:
+                    for i, result in enumerate(results[group]):
+                        curr_score, mixtures_dict, scores, refine_scores, cache_stats = waitForResult(result, queues,
+                                                                                                     callback)
+                        mixtures_object.score_cache.addStats(cache_stats)
+                        annealers[group].anneal_scores[i] = scores
+                        if refine_scores is not None:
+                            annealers[group].refine_scores[i] = refine_scores
+                        annealers[group].addIteration(i, curr_score, mixtures_dict)
+        finally:
+            pool.terminate()
+    else:
+        for group in groups:
+            annealers[group].run()
+    for group in groups:
+        mixtures_object.anneal_scores[group] = annealers[group].anneal_scores
+        mixtures_object.refine_scores[group] = annealers[group].refine_scores
+        mixtures_object.mixtures.update(annealers[group].best_mixtures)
+    if checkpoint is not None:
+        checkpoint.remove()
+    return(mixtures_object.calculateTotalScore(mixtures_object.mixtures))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+batchmoves.py
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import numpy as np
+
+
+class BatchMoves(object):
+    """Proposes and scores a batch of candidate moves at each annealing step, and samples one of them. Each
+    candidate is drawn as in MixtureState.proposeMove: mix_rate distinct unlocked mixtures each give up a random slot
+    (a compound, or a blank when the slot is empty) to the next mixture in the cycle. The current mixtures are kept
+    as a candidate with no change in score, and one candidate is chosen with a chance in proportion to its
+    Metropolis weight, min(1, exp(-dE/T)), or its heat bath weight, 1/(1+exp(dE/T)), so that at low temperatures
+    the best candidates of the batch are made much more often than single moves would be accepted.
+
+    With the pairwise scoring, the whole batch is scored at once from the overlap matrix of the MixtureState and a
+    table holding the pairwise score of each compound against each mixture, which is updated when a move is made.
+    With the greedy scoring, each candidate is scored with MixtureState.swapDelta.
+
+    With guided moves, the first compound of a share of the candidates is drawn by its weight in the guide of the
+    MixtureState, and the other mixtures of those candidates uniformly."""
+    def __init__(self, state, seed):
+        self.state = state
+        self.params = state.params
+        self.rng = np.random.Generator(np.random.PCG64(seed))
+        self.diff_scores = []
+        if self.state.pair_scores is not None:
+            num_mixtures = len(self.state.mixnum_list)
+            self.mixture_scores = np.zeros((num_mixtures, len(self.state.compound_names)))
+            self.mixture_counts = np.zeros((num_mixtures, len(self.state.compound_names)), dtype=np.int64)
+            for k in range(num_mixtures):
+                self.updateMixture(k)
+
+    def updateMixture(self, k):
+        # The members are sorted so that the sums do not depend on the order of the columns.
+        members = np.sort(self.state.slots[k, :self.state.sizes[k]])
+        self.mixture_scores[k] = self.state.pair_scores[members].sum(axis=0)
+        self.mixture_counts[k] = self.state.pair_counts[members].sum(axis=0)
+
+    def proposeMoves(self, batch_size, mix_rate):
+        """Returns the rows of the mixtures of each candidate as a (batch_size, mix_rate) array, with the index of the
+        compound that each of them gives up."""
+        num_mixtures = len(self.state.mixnum_list)
+        mix_rate = min(mix_rate, num_mixtures)
+        guided = None
+        if self.state.guide is not None and mix_rate >= 2:
+            guided = self.rng.random(batch_size) < self.params.guided_fraction
+            guide = self.state.guide
+            guided_picks = np.array([guide.find(value)
+                                     for value in self.rng.integers(0, guide.total(), batch_size).tolist()],
+                                    dtype=np.int64)
+        if mix_rate == 2:
+            first = self.rng.integers(0, num_mixtures, batch_size)
+            if guided is not None:
+                first = np.where(guided, self.state.rows[guided_picks], first)
+            second = self.rng.integers(0, num_mixtures - 1, batch_size)
+            second += second >= first
+            mixture_rows = np.stack((first, second), axis=1)
+        else:
+            keys = self.rng.random((batch_size, num_mixtures))
+            if guided is not None:
+                # The mixture of a guided compound is given the lowest key, so that it is sorted first.
+                keys[np.nonzero(guided)[0], self.state.rows[guided_picks[guided]]] = -1.0
+            mixture_rows = np.argsort(keys, axis=1)[:, :mix_rate]
+        # As in proposeMove, a mixture that is not full gives up each of mix_size slots with the same chance, and a
+        # full mixture gives up one of its compounds. The columns past the compounds of a mixture hold -1.
+        limits = np.maximum(self.state.sizes, self.params.mix_size)[mixture_rows]
+        cols = (self.rng.random(mixture_rows.shape) * limits).astype(np.int64)
+        picks = self.state.slots[mixture_rows, cols]
+        if guided is not None:
+            picks[:, 0] = np.where(guided, guided_picks, picks[:, 0])
+        return(mixture_rows, picks)
+
+    def scoreMoves(self, mixture_rows, picks):
+        """Returns the changes in score and overlap count of each candidate."""
+        received = np.roll(picks, -1, axis=1)
+        if self.state.pair_scores is not None:
+            # A mixture loses the score of the compound it gives up against its members, and gains the score of
+            # the compound it receives against the members other than the one given up.
+            diff_scores = (self.mixture_scores[mixture_rows, received] -
+                           self.state.pair_scores[received, picks] -
+                           self.mixture_scores[mixture_rows, picks]).sum(axis=1)
+            diff_overlaps = (self.mixture_counts[mixture_rows, received] -
+                             self.state.pair_counts[received, picks] -
+                             self.mixture_counts[mixture_rows, picks]).sum(axis=1)
+            return(diff_scores, diff_overlaps)
+        diff_scores = np.zeros(len(mixture_rows))
+        diff_overlaps = np.zeros(len(mixture_rows), dtype=np.int64)
+        for n, (rows, removed, added) in enumerate(zip(mixture_rows.tolist(), picks.tolist(), received.tolist())):
+            for k, removed_index, added_index in zip(rows, removed, added):
+                add_score, add_overlaps = self.state.swapDelta(k, removed_index, added_index)
+                diff_scores[n] += add_score
+                diff_overlaps[n] += add_overlaps
+        return(diff_scores, diff_overlaps)
+
+    def sampleMove(self, current_temp, max_score, refining=False):
+        """Proposes a batch of candidate moves and samples one of them, or the current mixtures. Returns the rows of
+        the mixtures and the compounds of the sampled move, or None if the current mixtures were sampled, with the
+        changes in score and overlap count and the chance that the sampled candidate was chosen."""
+        if refining:
+            mix_rate = self.params.refine_mix_rate
+        else:
+            mix_rate = self.params.mix_rate
+        mixture_rows, picks = self.proposeMoves(self.params.batch_size, mix_rate)
+        diff_scores, diff_overlaps = self.scoreMoves(mixture_rows, picks)
+        # The changes in score of the last batch are kept for the adaptive cooling.
+        self.diff_scores = diff_scores
+        # The current mixtures are the last candidate.
+        energies = np.append(diff_scores, 0.0) / max_score * 25000
+        if current_temp > 0.0:
+            exponents = np.clip(energies / current_temp, -700, 700)
+            if self.params.batch_weights == 'heatbath':
+                weights = 1 / (1 + np.exp(exponents))
+            else:
+                weights = np.exp(np.minimum(-exponents, 0))
+        elif self.params.batch_weights == 'heatbath':
+            weights = np.where(energies < 0, 1.0, np.where(energies > 0, 0.0, 0.5))
+        else:
+            weights = (energies <= 0).astype(float)
+        probabilities = weights / weights.sum()
+        n = min(int(np.searchsorted(np.cumsum(probabilities), self.rng.random(), side='right')), len(weights) - 1)
+        if n == len(diff_scores):
+            return(None, None, 0.0, 0, float(probabilities[n]))
+        return(mixture_rows[n].tolist(), picks[n].tolist(), float(diff_scores[n]), int(diff_overlaps[n]),
+               float(probabilities[n]))
+
+    def applyMove(self, mixture_rows, picks):
+        """Makes a sampled move in the MixtureState and updates the rows of the mixtures that it changes."""
+        self.state.applyMove(mixture_rows, picks)
+        if self.state.pair_scores is not None:
+            for k in mixture_rows:
+                self.updateMixture(k)
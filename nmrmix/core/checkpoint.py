@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+checkpoint.py
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import os
+import shutil
+import pickle
+import binascii
+
+import numpy as np
+
+from core.scoretrace import ScoreTrace, TRACE_DTYPE
+
+CHECKPOINT_FOLDER = "NMRmix_Checkpoint"
+
+
+def writePickle(path, data):
+    """Writes data to a temporary file and then moves it over path, so that a checkpoint is never left half
+    written if NMRmix is closed while it is being saved."""
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as pickle_file:
+        pickle.dump(data, pickle_file, 2)
+        pickle_file.flush()
+        os.fsync(pickle_file.fileno())
+    try:
+        os.replace(temp_path, path)
+    except AttributeError:
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(temp_path, path)
+
+
+def readPickle(path):
+    with open(path, 'rb') as pickle_file:
+        return(pickle.load(pickle_file))
+
+
+class Checkpoint(object):
+    """The checkpoint of an optimization, kept in a folder of the working directory. The run file holds the
+    parameters, the starting mixtures and the random seeds of the iterations. Each iteration of each group has a
+    state file, with its phase (optimize, temper, tabu, neighbourhood, refine or done), its current mixtures,
+    its position in the cooling schedule and its random state, and the steps of its score traces are appended to
+    separate trace files. The state file records how many steps of each trace file belong to it, so the trace files
+    are never rewritten."""
+    def __init__(self, params_object, directory=None):
+        if directory is None:
+            directory = os.path.join(params_object.work_dir, CHECKPOINT_FOLDER)
+        self.directory = directory
+        self.interval = params_object.checkpoint_interval
+        self.run = None
+        self.seeds = None
+        self.written = {}
+
+    def exists(self):
+        return(os.path.isfile(os.path.join(self.directory, "run.pkl")))
+
+    def remove(self):
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def saveRun(self, params_object, mixtures_object, seeds):
+        """Starts a new checkpoint for an optimization of the mixtures, discarding any previous checkpoint."""
+        self.remove()
+        os.makedirs(self.directory)
+        self.seeds = seeds
+        self.run = {'params': params_object.__getstate__(),
+                    'compounds': sorted(mixtures_object.library.library.keys()),
+                    'mixtures': dict((mixnum, list(mixtures_object.mixtures[mixnum]))
+                                     for mixnum in mixtures_object.mixtures),
+                    'mixtures_lock': list(mixtures_object.mixtures_lock),
+                    'group_dict': dict((group, list(mixtures_object.group_dict[group]))
+                                       for group in mixtures_object.group_dict),
+                    'group_mixnum': dict((group, list(mixtures_object.group_mixnum[group]))
+                                         for group in mixtures_object.group_mixnum),
+                    'seeds': seeds}
+        writePickle(os.path.join(self.directory, "run.pkl"), self.run)
+
+    def loadRun(self):
+        try:
+            self.run = readPickle(os.path.join(self.directory, "run.pkl"))
+        except Exception as e:
+            return(False, "The checkpoint in %s could not be read: %s" % (self.directory, e))
+        self.seeds = self.run['seeds']
+        return(True, "")
+
+    def restoreParams(self, params_object):
+        """Restores the parameters of the optimization that is being resumed, apart from the directories."""
+        if self.run is None:
+            success, message = self.loadRun()
+            if not success:
+                return(success, message)
+        directories = (params_object.work_dir, params_object.peaklist_dir, params_object.library_path)
+        params_object.__dict__.update(self.run['params'])
+        params_object.work_dir, params_object.peaklist_dir, params_object.library_path = directories
+        self.interval = params_object.checkpoint_interval
+        return(True, "")
+
+    def restoreMixtures(self, mixtures_object):
+        """Restores the starting mixtures of the optimization that is being resumed, if the checkpoint was made with
+        the same compounds as the library of mixtures_object."""
+        if self.run is None:
+            success, message = self.loadRun()
+            if not success:
+                return(success, message)
+        if sorted(mixtures_object.library.library.keys()) != self.run['compounds']:
+            return(False, "The checkpoint in %s was made with a different library." % self.directory)
+        mixtures_object.mixtures = dict((mixnum, list(self.run['mixtures'][mixnum]))
+                                        for mixnum in self.run['mixtures'])
+        mixtures_object.mixtures_lock = list(self.run['mixtures_lock'])
+        mixtures_object.group_dict = dict((group, list(self.run['group_dict'][group]))
+                                          for group in self.run['group_dict'])
+        mixtures_object.group_mixnum = dict((group, list(self.run['group_mixnum'][group]))
+                                            for group in self.run['group_mixnum'])
+        return(True, "")
+
+    def iterationPath(self, group, i, name):
+        group_name = binascii.hexlify(group.encode('utf-8')).decode('ascii') or "all"
+        return(os.path.join(self.directory, "%s_%d_%s" % (group_name, i, name)))
+
+    def saveIteration(self, group, i, state, traces):
+        """Saves the state of an iteration of a group, and appends the new steps of its score traces to the trace
+        files."""
+        state = dict(state)
+        state['traces'] = {}
+        for name in traces:
+            trace = traces[name]
+            path = self.iterationPath(group, i, name + ".trace")
+            written = self.written.get(path, 0)
+            if not os.path.exists(path):
+                written = 0
+            with open(path, 'r+b' if written else 'wb') as trace_file:
+                trace_file.seek(written * TRACE_DTYPE.itemsize)
+                trace_file.write(trace.data[written:len(trace)].tobytes())
+                trace_file.truncate()
+                trace_file.flush()
+                os.fsync(trace_file.fileno())
+            self.written[path] = len(trace)
+            state['traces'][name] = (len(trace), trace.num_peaks, trace.max_score, trace.stop_reason)
+        writePickle(self.iterationPath(group, i, "state.pkl"), state)
+
+    def loadIteration(self, group, i):
+        """Returns the saved state of an iteration of a group with its score traces, or None if it has not been
+        saved."""
+        path = self.iterationPath(group, i, "state.pkl")
+        if not os.path.isfile(path):
+            return(None)
+        state = readPickle(path)
+        traces = {}
+        for name in state['traces']:
+            size, num_peaks, max_score, stop_reason = state['traces'][name]
+            trace_path = self.iterationPath(group, i, name + ".trace")
+            trace = ScoreTrace(num_peaks, max_score, size=size, stop_reason=stop_reason)
+            trace.appendRows(np.fromfile(trace_path, dtype=TRACE_DTYPE, count=size))
+            self.written[trace_path] = size
+            traces[name] = trace
+        state['traces'] = traces
+        return(state)
@@ -10,9 +10,6 @@ from __future__ import division
 import os
 from operator import itemgetter
 
-
-from PIL import ImageQt
-
 import numpy as np
 
 from rdkit import Chem
@@ -20,6 +17,8 @@ from rdkit.Chem import Draw, rdMolDescriptors, rdDepictor
 from rdkit.Chem.Draw import DrawingOptions
 
 from core import readpeaks
+from core import overlaps
+from core import peaktable
 
 if 'RDBASE' not in os.environ.keys():
     os.environ['RDBASE'] = os.getcwd()
@@ -33,8 +32,29 @@ DrawingOptions.bondLineWidth=2
 # DrawingOptions.useFraction=1.0
 
 
+def peakListProperty(status):
+    """Returns a property for the peaks of a compound with a status, which are read from and written to the slot of the
+    compound in its peak table."""
+    def getPeakList(self):
+        return(self.peak_table.peakList(self.peak_slot, status))
+
+    def setPeakList(self, peaklist):
+        self.peak_table.setPeakLists(self.peak_slot, {status: peaklist})
+    return(property(getPeakList, setPeakList))
+
+
 class Compound(object):
-    """Requires the input of a list of rows from the library csv file."""
+    """Requires the input of a list of rows from the library csv file.
+
+    The peak lists are stored in a slot of a PeakTable, which is the table of the library once the compound has been
+    added to it, and are read and written as lists of tuples through the peak list properties. Reading a peak list
+    returns a new list, so a peak list is changed by assigning a new list to it."""
+    original_peaklist = peakListProperty(peaktable.ORIGINAL)
+    peaklist = peakListProperty(peaktable.PEAKLIST)
+    mix_peaklist = peakListProperty(peaktable.ACTIVE)
+    ignored_peaklist = peakListProperty(peaktable.IGNORED)
+    removed_peaklist = peakListProperty(peaktable.REMOVED)
+
     def __init__(self, params_object, compound_list):
         self.params = params_object
         self.modified = False
@@ -67,7 +87,13 @@ class Compound(object):
                               'format':self.format_choice, 'group':self.group, 'pubchem':self.pubchem_id,
                               'kegg':self.kegg_id, 'smiles':self.smiles}
 
-        self.peak_range_list = []
+        self.peak_table = peaktable.PeakTable()
+        self.peak_slot = self.peak_table.addCompound(self.id)
+        self.peak_range_array = self.peak_table.rangeView(self.peak_slot)
+        self.peak_range_generation = None
+        self.fingerprint = 0
+        self.peak_range_key = None
+        self.full_rois_key = None
         self.full_rois = []
         self.ignored_regions = {}
         self.no_overlap_list = []
@@ -83,6 +109,26 @@ class Compound(object):
     def __lt__(self, other):
         return(self.sortname, other.sortname)
 
+    def __getstate__(self):
+        # A copy of the compound takes a table with a copy of its own peaks, rather than of the whole table.
+        state = dict(self.__dict__)
+        state['peak_table'] = self.peak_table.subset([self.peak_slot])
+        state['peak_slot'] = 0
+        state['peak_range_array'] = state['peak_table'].rangeView(0)
+        state['peak_range_generation'] = None
+        return(state)
+
+    def usePeakSlot(self, peak_table, peak_slot):
+        """Reads and writes the peaks of the compound in a slot of peak_table from now on."""
+        self.peak_table = peak_table
+        self.peak_slot = peak_slot
+        self.peak_range_array = peak_table.rangeView(peak_slot)
+        self.peak_range_generation = peak_table.generation
+
+    def setPeakTable(self, peak_table):
+        """Moves the peaks of the compound to a new slot of peak_table, such as the table of the library."""
+        self.usePeakSlot(peak_table, peak_table.addCompound(self.id, self.peak_table, self.peak_slot))
+
 
 
     def importPeakList(self):
@@ -149,12 +195,13 @@ class Compound(object):
                     continue
                 tmp_peaklist.append(peak)
             self.original_peaklist = list(tmp_peaklist)
-        self.peaklist = list(self.original_peaklist)
-        self.mix_peaklist = list(self.peaklist)
-        self.ignored_peaklist = []
-        self.removed_peaklist = []
+        else:
+            raise ValueError("A peak list must have one to three columns.")
+        original_peaklist = self.original_peaklist
+        self.peak_table.setPeakLists(self.peak_slot, {peaktable.ACTIVE: original_peaklist, peaktable.IGNORED: [],
+                                                      peaktable.REMOVED: [], peaktable.PEAKLIST: original_peaklist})
         self.normalizeIntensities()
-        self.full_rois = self.generateROIs(self.mix_peaklist)
+        self.updateFullROIs()
         # self.roi_list = self.generateROIs(self.mix_peaklist)
 
     def set2DStructure(self):
@@ -170,6 +217,8 @@ class Compound(object):
                     for x in range(self.structure_image.size[0]):
                         if pixdata[x, y] == (255, 255, 255, 255):
                             pixdata[x, y] = (255, 255, 255, 0)
+                # Imported here so that the command line version does not need Qt.
+                from PIL import ImageQt
                 self.structure_qt = ImageQt.ImageQt(self.structure_image)
             except Exception as e:
                 print(e)
@@ -318,7 +367,7 @@ class Compound(object):
                         self.ignored_intense_count += 1
                     break
         self.normalizeIntensities()
-        self.full_rois = self.generateROIs(self.mix_peaklist)
+        self.updateFullROIs()
         return
 
     def resetMixPeakList(self):
@@ -335,16 +384,30 @@ class Compound(object):
 
     def ignorePeak(self, peak):
         """Removes a peak from the mix_peaklist and adds it to the ignored_peaklist."""
-        self.mix_peaklist.remove(peak)
-        self.ignored_peaklist.append(peak)
+        mix_peaklist = self.mix_peaklist
+        mix_peaklist.remove(peak)
+        self.peak_table.setPeakLists(self.peak_slot, {peaktable.ACTIVE: mix_peaklist,
+                                                      peaktable.IGNORED: self.ignored_peaklist + [peak]})
+
+    def discardPeak(self, peak):
+        """Removes a peak from whichever of the mix_peaklist, the ignored_peaklist and the removed_peaklist holds it,
+        without keeping it anywhere else."""
+        for status in (peaktable.ACTIVE, peaktable.IGNORED, peaktable.REMOVED):
+            peaklist = self.peak_table.peakList(self.peak_slot, status)
+            if peak in peaklist:
+                peaklist.remove(peak)
+                self.peak_table.setPeakLists(self.peak_slot, {status: peaklist})
+                return
 
     def removePeak(self, peak):
-        if peak in self.mix_peaklist:
-            self.mix_peaklist.remove(peak)
-        elif peak in self.ignored_peaklist:
-            self.ignored_peaklist.remove(peak)
-        self.removed_peaklist.append(peak)
-        self.peaklist = self.mix_peaklist + self.ignored_peaklist
+        mix_peaklist = self.mix_peaklist
+        ignored_peaklist = self.ignored_peaklist
+        if peak in mix_peaklist:
+            mix_peaklist.remove(peak)
+        elif peak in ignored_peaklist:
+            ignored_peaklist.remove(peak)
+        self.removed_peaklist = self.removed_peaklist + [peak]
+        self.peaklist = mix_peaklist + ignored_peaklist
         self.resetMixPeakList()
         self.determineIgnoredPeaks()
         self.peaks_modified = True
@@ -470,15 +533,44 @@ class Compound(object):
                     merged_list.append(higher)
         return(list(merged_list))
 
+    def updateFullROIs(self):
+        """Generates the ROIs of the mix_peaklist, unless the peaks and the overlap range are the same as when they
+        were last generated."""
+        full_rois_key = (self.params.peak_range, self.peak_table.versions[self.peak_slot])
+        if full_rois_key != self.full_rois_key:
+            self.full_rois = self.generateROIs(self.mix_peaklist)
+            self.full_rois_key = full_rois_key
+
+    def setNoOverlapList(self, no_overlap_list):
+        """Stores the peaks that are not overlapped in the current mixture, and generates their ROIs if the peaks
+        have changed."""
+        if no_overlap_list != self.no_overlap_list:
+            self.no_overlap_list = no_overlap_list
+            self.no_overlap_rois = self.generateROIs(self.no_overlap_list)
+
     def generatePeakRanges(self):
-        self.peak_range_list = []
-        for peak in self.mix_peaklist:
-            if len(peak) == 3:
-                peak_low = peak[0] - (peak[2] / 2)
-                peak_high = peak[0] + (peak[2] / 2)
-            else:
-                peak_low = peak[0] - (self.params.peak_range / 2)
-                peak_high = peak[0] + (self.params.peak_range / 2)
-            peak_center = peak[0]
-            intensity = peak[1]
-            self.peak_range_list.append((peak_center, peak_low, peak_high, intensity))
\ No newline at end of file
+        """Sets the bounds of the peak ranges of the mix_peaklist in the peak table, unless the peaks, the overlap
+        range and the nuclei are the same as when they were last set. peak_range_array is a view of the ranges in the
+        table, with a row of (ppm, lower bound, upper bound, intensity) for each peak, and is taken again when the
+        table has been copied to new arrays."""
+        peak_table = self.peak_table
+        peak_range_key = (self.params.peak_range, self.params.nuclei, peak_table.versions[self.peak_slot])
+        if peak_range_key == self.peak_range_key:
+            if self.peak_range_generation != peak_table.generation:
+                self.peak_range_array = peak_table.rangeView(self.peak_slot)
+                self.peak_range_generation = peak_table.generation
+            return
+        self.peak_range_key = peak_range_key
+        self.peak_range_array = peak_table.peakRanges(self.peak_slot, self.params.peak_range)
+        self.peak_range_generation = peak_table.generation
+        if self.params.peak_range > 0:
+            bin_width = self.params.peak_range
+        else:
+            bin_width = 0.01
+        self.fingerprint = overlaps.range_fingerprint(self.peak_range_array[:, 1:3].tolist(),
+                                                      self.params.shift_range[self.params.nuclei], bin_width)
+
+    def canOverlap(self, other):
+        """Returns False if none of the peak ranges of the compound can overlap a peak range of the other compound,
+        as shown by their fingerprints. Returns True if they might overlap."""
+        return(bool(self.fingerprint & other.fingerprint))
\ No newline at end of file
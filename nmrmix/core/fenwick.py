@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+fenwick.py
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+
+class FenwickTree(object):
+    """A Fenwick (binary indexed) tree of non-negative integer weights, from which an index can be drawn with a
+    chance in proportion to its weight. Setting a weight and drawing an index both take O(log n) steps. The weights
+    are integers so that the sums are exact, and the same draws are made however the weights were reached."""
+    def __init__(self, weights):
+        self.size = len(weights)
+        self.weights = [int(weight) for weight in weights]
+        self.tree = [0] + list(self.weights)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+        self.top = 1
+        while self.top * 2 <= self.size:
+            self.top *= 2
+
+    def total(self):
+        total = 0
+        i = self.size
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return(total)
+
+    def setWeight(self, index, weight):
+        weight = int(weight)
+        diff = weight - self.weights[index]
+        if diff == 0:
+            return
+        self.weights[index] = weight
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += diff
+            i += i & -i
+
+    def find(self, value):
+        """Returns the index whose range of the cumulative weights holds value, which must be at least 0 and less
+        than the total weight."""
+        index = 0
+        step = self.top
+        while step > 0:
+            if index + step <= self.size and self.tree[index + step] <= value:
+                index += step
+                value -= self.tree[index]
+            step //= 2
+        return(index)
@@ -18,9 +18,10 @@ else:
     except:
         from core import unicodecsv as csv
 import numpy as np
-import copy
 
 from core import compounds
+from core import peaktable
+from core import shiftindex
 
 class Library(object):
     def __init__(self, params_object):
@@ -31,6 +32,10 @@ class Library(object):
         self.original_library = {}
         self.groups = []
         self.import_log = []
+        self.peak_table = peaktable.PeakTable()
+        self.shift_index = None
+        # The compounds added to or removed from the library since the shift index was last updated.
+        self.changed_compounds = set()
 
     def __repr__(self):
         return(self.library.keys)
@@ -88,39 +93,19 @@ class Library(object):
         try:
             with open(path, 'w') as newcsv:
                 writer = csv.writer(newcsv)
-                compound_list = list(self.library.keys())
                 writer.writerow(['Compound ID', 'Peak Number', 'PPM', 'Intensity', 'Width', 'Status'])
-                for compound in compound_list:
-                    compound_obj = self.library[compound]
-                    for i in range(0,3):
-                        if i == 0:
-                            peaklist = compound_obj.mix_peaklist
-                        elif i == 1:
-                            peaklist = compound_obj.ignored_peaklist
-                        elif i == 2:
-                            peaklist = compound_obj.removed_peaklist
-                        for j, peak in enumerate(peaklist):
-                            if len(peak) > 2:
-                                peakrow = [compound_obj.id, j+1, peak[0], peak[1], peak[2], status[i]]
-                            else:
-                                peakrow = [compound_obj.id, j+1, peak[0], peak[1], self.params.peak_range, status[i]]
-                            writer.writerow(peakrow)
-                compound_list = list(self.ignored_library.keys())
-                for compound in compound_list:
-                    compound_obj = self.ignored_library[compound]
-                    for i in range(0,3):
-                        if i == 0:
-                            peaklist = compound_obj.mix_peaklist
-                        elif i == 1:
-                            peaklist = compound_obj.ignored_peaklist
-                        elif i == 2:
-                            peaklist = compound_obj.removed_peaklist
-                        for j, peak in enumerate(peaklist):
-                            if len(peak) > 2:
-                                peakrow = [compound_obj.id, j+1, peak[0], peak[1], peak[2], status[i]]
-                            else:
-                                peakrow = [compound_obj.id, j+1, peak[0], peak[1], self.params.peak_range, status[i]]
-                            writer.writerow(peakrow)
+                for compound_dict in (self.library, self.ignored_library):
+                    for compound in sorted(compound_dict.keys()):
+                        compound_obj = compound_dict[compound]
+                        for peak_status in range(len(status)):
+                            ppms, intensities, widths, owners = compound_obj.peak_table.gatherPeaks(
+                                [compound_obj.peak_slot], peak_status)
+                            widths = np.where(np.isnan(widths), self.params.peak_range, widths)
+                            # Peaks are numbered separately for each status.
+                            for peak_num, peak in enumerate(zip(ppms.tolist(), intensities.tolist(),
+                                                                widths.tolist())):
+                                writer.writerow([compound, peak_num + 1, peak[0], peak[1], peak[2],
+                                                 status[peak_status]])
         except Exception as e:
             print("Peaklist export failed")
             print(e)
@@ -227,14 +212,56 @@ class Library(object):
                                self.ignored_library[compound].group]
                         writer.writerow(row)
 
+    def attachCompound(self, compound_object):
+        """Moves the peaks of a compound to the peak table of the library, unless they are already in it."""
+        if compound_object.peak_table is not self.peak_table:
+            compound_object.setPeakTable(self.peak_table)
+
+    def peakSlots(self, compound_list):
+        """Returns the slots of the compounds in compound_list in the peak table of the library."""
+        slots = []
+        for compound in compound_list:
+            compound_object = self.library[compound]
+            self.attachCompound(compound_object)
+            slots.append(compound_object.peak_slot)
+        return(slots)
+
+    def generatePeakTable(self):
+        """Returns a compact copy of the peak table with only the compounds in the library, in the order of their ids,
+        which is what the annealing worker processes are sent."""
+        return(self.peak_table.subset(self.peakSlots(sorted(self.library.keys()))))
+
+    def updateShiftIndex(self):
+        """Creates the chemical shift index of the active peaks in the library, or updates it for the compounds and
+        peaks that have changed since it was last used."""
+        if self.shift_index is None:
+            self.shift_index = shiftindex.ShiftIndex(self.params)
+        self.shift_index.update(self)
+        return(self.shift_index)
+
+    def addPeakTableCompounds(self, peak_table):
+        """Adds a compound for each compound in a PeakTable, with its peak lists but without any of its descriptors.
+        This is how the annealing worker processes rebuild the library from the peaks they are sent, and the table
+        becomes the peak table of the library."""
+        self.peak_table = peak_table
+        for slot, compound in enumerate(peak_table.compound_ids):
+            compound_object = compounds.Compound(self.params, ['YES', compound, compound, '', '', '', '', '', '', '',
+                                                               ''])
+            compound_object.usePeakSlot(peak_table, slot)
+            compound_object.calculateIntensitySum()
+            self.library[compound] = compound_object
+            self.changed_compounds.add(compound)
+
     def addLibraryCompound(self, index_count, compound_object):
         """Adds the compound object to the library dictionary with a key that is the same as the compound id."""
         if compound_object.id in self.library:
             log_message = "%s at index %d is a duplicate and was not imported." % (compound_object.id, index_count)
             self.importlog.append(log_message)
         else:
+            self.attachCompound(compound_object)
             if compound_object.active:
                 self.library[compound_object.id] = compound_object
+                self.changed_compounds.add(compound_object.id)
                 if compound_object.group not in self.groups:
                     self.groups.append(compound_object.group)
             else:
@@ -243,6 +270,7 @@ class Library(object):
     def removeLibraryCompound(self, compound_object):
         self.inactive_library[compound_object.id] = compound_object
         del self.library[compound_object.id]
+        self.changed_compounds.add(compound_object.id)
 
     def backupOriginalLibraryCompound(self, compound_object):
         self.original_library[compound_object.id] = compound_object
@@ -250,6 +278,8 @@ class Library(object):
     def restoreOriginalLibraryCompound(self, compound_object):
         self.library[compound_object.id] = self.original_library[compound_object.id]
         del self.original_library[compound_object.id]
+        self.attachCompound(self.library[compound_object.id])
+        self.changed_compounds.add(compound_object.id)
 
     def calcStats(self, ignored_regions={}):
         self.stats = {}
@@ -285,13 +315,22 @@ class Library(object):
                                    'more aliphatic': 0}
         self.ignored_regions = dict(ignored_regions)
         self.library.update(self.ignored_library)
+        self.changed_compounds.update(self.ignored_library)
         self.ignored_library = {}
 
         compound_list = list(self.library.keys())
         for compound in compound_list:
             # Resets the mix_peaklist and ignored_peaklist
+            self.library[compound].resetMixPeakList()
+        # Only the compounds with a peak range touching an ignored region can have a peak in it.
+        region_compounds = set()
+        if self.ignored_regions:
+            shift_index = self.updateShiftIndex()
+            for name in self.ignored_regions:
+                region_compounds.update(shift_index.compoundsInRange(self.ignored_regions[name][0],
+                                                                     self.ignored_regions[name][1]))
+        for compound in compound_list:
             compound_obj = self.library[compound]
-            compound_obj.resetMixPeakList()
             peaklist_hist, intense_peaklist_hist = compound_obj.calcStats()
             self.stats['ALL']['Compound List'].append(compound)
             self.stats[compound_obj.group]['Compound List'].append(compound)
@@ -309,7 +348,11 @@ class Library(object):
             peak_types[compound_obj.group][compound_obj.peak_types] += 1
             if self.ignored_regions:
                 compound_obj.setIgnoredRegions(self.ignored_regions)
-                compound_obj.determineIgnoredPeaks()
+                if compound in region_compounds:
+                    compound_obj.determineIgnoredPeaks()
+                else:
+                    compound_obj.ignored_intense_count = 0
+                    compound_obj.updateFullROIs()
                 # Add the changed peaks back here?
                 if len(compound_obj.ignored_peaklist) != 0:
                     self.stats['ALL']['Ignored Peak Compounds'].append(compound_obj.id)
@@ -324,9 +367,9 @@ class Library(object):
                 if len(compound_obj.mix_peaklist) == 0:
                     self.stats['ALL']['Ignored Compounds'].append(compound_obj.id)
                     self.stats[compound_obj.group]['Ignored Compounds'].append(compound_obj.id)
-                    a = copy.deepcopy(self.library[compound_obj.id])
-                    self.ignored_library[compound_obj.id] = a
+                    self.ignored_library[compound_obj.id] = compound_obj
                     del self.library[compound_obj.id]
+                    self.changed_compounds.add(compound_obj.id)
         # Total Number of Compounds
         self.stats["ALL"][0] = "%d" % len(self.stats["ALL"]["Peak Count"])
         # Total Number of Peaks
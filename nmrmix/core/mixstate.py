@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+mixstate.py
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import numpy as np
+
+from core.fenwick import FenwickTree
+
+
+class MixtureState(object):
+    """The mixtures of a group as an integer array for the annealer. Row k of slots holds the indices of the
+    compounds of mixture mixnum_list[k] in compound_list, in its first sizes[k] columns, and -1 in the empty columns.
+    The row and column of each compound are kept in rows and cols, so a compound swap is two writes to the array, and
+    the mixtures are only converted to and from the mixtures dictionary when the annealing starts, is checkpointed
+    and finishes.
+
+    With the pairwise scoring, pair_scores and pair_counts hold the symmetric overlap matrix of the compounds with an
+    extra row and column of zeros at the end, which index -1 refers to, so that blanks have no overlaps.
+
+    With guided moves, guide is a FenwickTree of the overlap score of each compound in its mixture, rounded to an
+    integer and plus one so that compounds without overlaps can still be picked."""
+    def __init__(self, mixtures_object, mixtures_dict, mixnum_list):
+        self.mixtures = mixtures_object
+        self.params = mixtures_object.params
+        self.mixnum_list = list(mixnum_list)
+        self.compound_list = []
+        for mixnum in self.mixnum_list:
+            self.compound_list += list(mixtures_dict[mixnum])
+        self.compound_list.sort()
+        self.compound_index = dict((compound, i) for i, compound in enumerate(self.compound_list))
+        # The last name is that of index -1.
+        self.compound_names = self.compound_list + ["Blank"]
+        num_compounds = len(self.compound_list)
+        max_size = self.params.mix_size
+        for mixnum in self.mixnum_list:
+            max_size = max(max_size, len(mixtures_dict[mixnum]))
+        self.slots = np.full((len(self.mixnum_list), max_size), -1, dtype=np.int64)
+        self.sizes = np.zeros(len(self.mixnum_list), dtype=np.int64)
+        self.rows = np.zeros(num_compounds, dtype=np.int64)
+        self.cols = np.zeros(num_compounds, dtype=np.int64)
+        for k, mixnum in enumerate(self.mixnum_list):
+            self.setMixture(k, mixtures_dict[mixnum])
+        self.pair_scores = None
+        self.pair_counts = None
+        if self.params.scoring_mode == 'pairwise':
+            if self.mixtures.overlap_scores is None:
+                self.mixtures.calculateOverlapMatrix()
+            index_list = [self.mixtures.overlap_index[compound] for compound in self.compound_list]
+            block = np.ix_(index_list, index_list)
+            self.pair_scores = np.zeros((num_compounds + 1, num_compounds + 1))
+            self.pair_scores[:num_compounds, :num_compounds] = (self.mixtures.overlap_scores[block] +
+                                                                self.mixtures.overlap_scores[block].T)
+            self.pair_counts = np.zeros((num_compounds + 1, num_compounds + 1), dtype=np.int64)
+            self.pair_counts[:num_compounds, :num_compounds] = (self.mixtures.overlap_counts[block] +
+                                                                self.mixtures.overlap_counts[block].T)
+        self.guide = None
+        if self.params.use_guided_moves:
+            self.guide = FenwickTree([0] * num_compounds)
+            for k in range(len(self.mixnum_list)):
+                self.updateGuide(k)
+
+    def setMixture(self, k, mixture_list):
+        members = [self.compound_index[compound] for compound in mixture_list]
+        self.slots[k] = -1
+        self.slots[k, :len(members)] = members
+        self.sizes[k] = len(members)
+        for col, i in enumerate(members):
+            self.rows[i] = k
+            self.cols[i] = col
+
+    def members(self, k):
+        """Returns the compounds of mixture k in the order of their columns."""
+        compound_list = self.compound_list
+        return([compound_list[i] for i in self.slots[k, :self.sizes.item(k)].tolist()])
+
+    def updateGuide(self, k):
+        """Sets the weights of the compounds of mixture k in the guide. With the pairwise scoring, the weight of a
+        compound is its pairwise score against the other members, and with the greedy scoring, it is the score of
+        its peaks that the other members overlap."""
+        members = self.slots[k, :self.sizes.item(k)]
+        if self.pair_scores is not None:
+            compound_scores = self.pair_scores[np.ix_(members, members)].sum(axis=1).tolist()
+        else:
+            compound_list = self.compound_list
+            compound_scores = []
+            for i in members.tolist():
+                pair_masks = self.mixtures.calculatePairMasks(compound_list[i])
+                peak_mask = 0
+                for j in members.tolist():
+                    if j != i:
+                        peak_mask |= pair_masks.get(compound_list[j], 0)
+                compound_scores.append(self.mixtures.calculateMaskScore(compound_list[i], peak_mask)[0])
+        for i, compound_score in zip(members.tolist(), compound_scores):
+            self.guide.setWeight(i, int(round(compound_score)) + 1)
+
+    def toDict(self, sort=True):
+        """Returns the mixtures as a dictionary of lists of compounds. The lists are sorted, unless sort is False, in
+        which case they keep the order of the columns, so that setMixture rebuilds exactly the same array."""
+        mixtures_dict = {}
+        for k, mixnum in enumerate(self.mixnum_list):
+            mixtures_dict[mixnum] = self.members(k)
+            if sort:
+                mixtures_dict[mixnum].sort()
+        return(mixtures_dict)
+
+    def proposeMove(self, rng, refining=False):
+        """Chooses mix_rate distinct mixtures, and the compound or blank (-1) that each of them gives up to the next
+        mixture in the cycle, with the random choices made by rng. A mixture with room for more compounds gives up a
+        blank with a chance of one minus its size over mix_size. With guided moves, the first compound of a
+        guided_fraction share of the moves is instead drawn from the guide, so that the moves concentrate on the
+        compounds that overlap the most. Returns the rows of the mixtures and the indices of the compounds."""
+        if refining:
+            mix_rate = min(self.params.refine_mix_rate, len(self.mixnum_list))
+        else:
+            mix_rate = min(self.params.mix_rate, len(self.mixnum_list))
+        picks = []
+        if self.guide is not None and mix_rate >= 2 and rng.random() < self.params.guided_fraction:
+            # The first compound is drawn by its weight in the guide, and the other mixtures uniformly.
+            first = self.guide.find(rng.randrange(self.guide.total()))
+            first_row = self.rows.item(first)
+            mixture_rows = [first_row]
+            for k in rng.sample(range(len(self.mixnum_list) - 1), mix_rate - 1):
+                mixture_rows.append(k + (k >= first_row))
+            picks.append(first)
+        else:
+            mixture_rows = rng.sample(range(len(self.mixnum_list)), mix_rate)
+        mix_size = self.params.mix_size
+        for k in mixture_rows[len(picks):]:
+            size = self.sizes.item(k)
+            if size < mix_size:
+                col = rng.randint(1, mix_size) - 1
+            else:
+                col = rng.randrange(size)
+            if col < size:
+                picks.append(self.slots.item(k, col))
+            else:
+                picks.append(-1)
+        return(mixture_rows, picks)
+
+    def swapDelta(self, k, removed, added):
+        """Returns the change in score and overlap count of mixture k when the compound removed is replaced by the
+        compound added, either of which can be -1."""
+        if removed == added:
+            return(0.0, 0)
+        if self.pair_scores is None:
+            return(self.mixtures.calculateSwapDelta(self.members(k), self.compound_names[removed],
+                                                    self.compound_names[added]))
+        members = self.slots[k, :self.sizes[k]]
+        diff_score = (self.pair_scores[added].take(members).sum() - self.pair_scores[added, removed] -
+                      self.pair_scores[removed].take(members).sum())
+        diff_overlaps = (self.pair_counts[added].take(members).sum() - self.pair_counts[added, removed] -
+                         self.pair_counts[removed].take(members).sum())
+        return(float(diff_score), int(diff_overlaps))
+
+    def moveDelta(self, mixture_rows, picks):
+        """Returns the change in score and overlap count of a move from proposeMove."""
+        diff_score = 0.0
+        diff_overlaps = 0
+        for n, k in enumerate(mixture_rows):
+            add_score, add_overlaps = self.swapDelta(k, picks[n], picks[(n + 1) % len(picks)])
+            diff_score += add_score
+            diff_overlaps += add_overlaps
+        return(diff_score, diff_overlaps)
+
+    def applyMove(self, mixture_rows, picks):
+        """Makes a move from proposeMove. Each compound takes the column of the compound it replaces, and when a
+        mixture gives up a compound for a blank, its last compound fills the column, so that the compounds of each
+        mixture stay in its first columns."""
+        # The columns are looked up before any of them change.
+        picked_cols = [self.cols.item(i) if i >= 0 else -1 for i in picks]
+        for n, k in enumerate(mixture_rows):
+            removed = picks[n]
+            added = picks[(n + 1) % len(picks)]
+            if removed == added:
+                continue
+            if removed >= 0 and added >= 0:
+                col = picked_cols[n]
+                self.slots[k, col] = added
+                self.rows[added] = k
+                self.cols[added] = col
+            elif removed >= 0:
+                col = picked_cols[n]
+                last = self.sizes.item(k) - 1
+                if col != last:
+                    moved = self.slots.item(k, last)
+                    self.slots[k, col] = moved
+                    self.cols[moved] = col
+                self.slots[k, last] = -1
+                self.sizes[k] -= 1
+            else:
+                col = self.sizes.item(k)
+                self.slots[k, col] = added
+                self.rows[added] = k
+                self.cols[added] = col
+                self.sizes[k] += 1
+        if self.guide is not None:
+            for k in mixture_rows:
+                self.updateGuide(k)
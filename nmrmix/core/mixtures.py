@@ -22,6 +22,10 @@ else:
         from core import unicodecsv as csv
 import copy
 
+from core import overlaps
+from core import scorecache
+from core import seeding
+
 class Mixtures(object):
     """An object to represent the entire set of mixtures being evaluated."""
     def __init__(self, params_object, library_object):
@@ -30,8 +34,11 @@ class Mixtures(object):
         self.mixtures = {}
         self.group_dict = {}
         self.group_mixnum = {}
-        self.mixture_scores = {}
-        self.mixture_overlaps = {}
+        self.score_cache = scorecache.ScoreCache(self.params.score_cache_size)
+        self.zobrist_keys = {}
+        self.zobrist_random = random.Random()
+        self.pair_masks = {}
+        self.pair_mask_count = 0
         self.compound_scores = {}
         self.total_score = 0
         self.total_overlaps = 0
@@ -40,6 +47,13 @@ class Mixtures(object):
         self.refine_scores = {}
         self.refine_overlaps = {}
         self.mixtures_lock = []
+        self.overlap_index = {}
+        self.overlap_compounds = []
+        self.peak_index = None
+        self.overlap_scores = None
+        self.overlap_counts = None
+        self.peak_arrays = {}
+        self.peak_array_sources = {}
 
 
     def generateGroupLists(self):
@@ -62,13 +76,19 @@ class Mixtures(object):
                 self.group_dict[""].append(compound_object.id)
 
     def generateInitialMixtures(self):
+        self.resetScores()
         self.mixtures = {}
         self.mixtures.update(self.mixtures_lock)
         start_num = self.params.start_num
         for group in self.group_dict:
             self.group_mixnum[group] = []
             library_list = list(self.group_dict[group])
-            random.shuffle(library_list)
+            if self.params.use_seed:
+                group_random = random.Random(seeding.streamSeed(self.params, seeding.INITIAL_MIXTURES,
+                                                                seeding.groupIndex(self.group_dict, group)))
+                group_random.shuffle(library_list)
+            else:
+                random.shuffle(library_list)
             num_compounds = len(library_list)
             # Prevents setting mixture size to greater than the size of the library.
             if num_compounds <= self.params.mix_size:
@@ -87,24 +107,182 @@ class Mixtures(object):
                     adjust_value += 1
                     mix_num = start_num + i + adjust_value
                 self.mixtures[mix_num] = []
-                for j in range(self.params.mix_size):
-                    if len(library_list) != 0:
-                        compound = library_list.pop()
-                        self.mixtures[mix_num].append(compound)
-                # Reorganizes the elements in the mixture alphabetically
-                self.mixtures[mix_num].sort()
+                if not self.params.greedy_initial:
+                    for j in range(self.params.mix_size):
+                        if len(library_list) != 0:
+                            compound = library_list.pop()
+                            self.mixtures[mix_num].append(compound)
+                    # Reorganizes the elements in the mixture alphabetically
+                    self.mixtures[mix_num].sort()
                 self.group_mixnum[group].append(mix_num)
+            if self.params.greedy_initial:
+                self.mixtures.update(self.greedyMixtures(library_list, self.group_mixnum[group]))
             start_num = mix_num + 1
         self.num_mixtures = len(self.mixtures)
-        self.resetScores()
         self.total_score, self.total_overlaps = self.calculateTotalScore(self.mixtures)
 
+    def greedyMixtures(self, compound_list, mixnum_list):
+        """Builds mixtures of the compounds by greedy coloring of their conflict graph, in which the weight of the
+        edge between two compounds is their score in the pairwise overlap matrix. The compounds are placed from the
+        most to the least conflicted, each into the mixture that is not yet full where it adds the least overlap,
+        or into the one with the fewest compounds when several add the same overlap. Compounds that are equally conflicted are placed in the
+        order of compound_list, so a shuffled list gives different mixtures. Returns a dictionary of the mixtures
+        with the numbers in mixnum_list."""
+        if self.overlap_scores is None:
+            self.calculateOverlapMatrix()
+        index_list = [self.overlap_index[compound] for compound in compound_list]
+        conflicts = self.overlap_scores[np.ix_(index_list, index_list)]
+        conflicts = conflicts + conflicts.T
+        conflict_order = np.argsort(-conflicts.sum(axis=1), kind='mergesort')
+        added_scores = np.zeros((len(mixnum_list), len(compound_list)))
+        sizes = np.zeros(len(mixnum_list), dtype=np.int64)
+        mix_order = np.arange(len(mixnum_list))
+        mixtures_dict = dict((mixnum, []) for mixnum in mixnum_list)
+        for i in conflict_order:
+            open_mixtures = np.flatnonzero(sizes < self.params.mix_size)
+            if not len(open_mixtures):
+                break
+            choices = np.lexsort((mix_order[open_mixtures], sizes[open_mixtures], added_scores[open_mixtures, i]))
+            k = open_mixtures[choices[0]]
+            mixtures_dict[mixnum_list[k]].append(compound_list[i])
+            sizes[k] += 1
+            added_scores[k] += conflicts[i]
+        for mixnum in mixtures_dict:
+            mixtures_dict[mixnum].sort()
+        return(mixtures_dict)
+
     def resetScores(self):
-        self.mixture_scores = {}
+        self.score_cache.setMaxSize(self.params.score_cache_size)
+        self.score_cache.clear()
+        self.pair_masks = {}
+        self.pair_mask_count = 0
         self.compound_scores = {}
-        self.mixture_overlaps = {}
         self.total_score = 0
         self.total_overlaps = 0
+        self.overlap_index = {}
+        self.overlap_compounds = []
+        self.peak_index = None
+        self.overlap_scores = None
+        self.overlap_counts = None
+        self.peak_arrays = {}
+        self.peak_array_sources = {}
+
+    def generatePeakIndex(self):
+        """Sorts the peak ranges of every compound in the library by their lower bound, so that the peaks overlapping
+        any range can be found with two searches. Each peak is stored with the position of its compound in
+        overlap_compounds and the weight it adds to the score of its compound when it is overlapped."""
+        self.overlap_compounds = sorted(self.library.library.keys())
+        self.overlap_index = dict((compound, i) for i, compound in enumerate(self.overlap_compounds))
+        for compound in self.overlap_compounds:
+            self.library.library[compound].generatePeakRanges()
+        peak_centers, peak_intensities, peak_widths, peak_owners = self.library.peak_table.gatherPeaks(
+            self.library.peakSlots(self.overlap_compounds))
+        peak_widths = np.where(np.isnan(peak_widths), self.params.peak_range, peak_widths)
+        if self.params.use_intensity:
+            intensity_sums = np.array([self.library.library[compound].intensity_sum
+                                       for compound in self.overlap_compounds], dtype=float)
+            peak_weights = peak_intensities / intensity_sums[peak_owners]
+        else:
+            peak_counts = np.bincount(peak_owners, minlength=len(self.overlap_compounds))
+            peak_weights = 1.0 / peak_counts[peak_owners]
+        peak_lows = peak_centers - (peak_widths / 2)
+        peak_highs = peak_centers + (peak_widths / 2)
+        order = np.argsort(peak_lows, kind='mergesort')
+        peak_lows = peak_lows[order]
+        peak_highs = peak_highs[order]
+        peak_owners = peak_owners[order]
+        peak_weights = peak_weights[order]
+        # Any peak that can overlap a given peak starts less than one peak width before it.
+        if len(peak_lows):
+            max_width = np.max(peak_highs - peak_lows) + 1e-9
+        else:
+            max_width = 0.0
+        self.peak_index = (peak_lows, peak_highs, peak_owners, peak_weights, max_width)
+
+    def calculateOverlapMatrix(self):
+        """Builds the library-wide pairwise overlap matrix used by the pairwise scoring mode. Entry [A, B] of
+        overlap_counts is the number of peaks of compound A overlapped by any peak of compound B, and the same
+        entry of overlap_scores is the score that those peaks add to compound A. Unlike the greedy scoring, a peak
+        of A that is overlapped by two other compounds is counted once for each of them, so the score of a mixture
+        is simply the sum of the matrix over every ordered pair of its compounds."""
+        self.generatePeakIndex()
+        peak_lows, peak_highs, peak_owners, peak_weights, max_width = self.peak_index
+        num_compounds = len(self.overlap_compounds)
+        self.overlap_scores = np.zeros((num_compounds, num_compounds))
+        self.overlap_counts = np.zeros((num_compounds, num_compounds), dtype=np.int32)
+        window_starts = np.searchsorted(peak_lows, peak_lows - max_width, side='left')
+        window_stops = np.searchsorted(peak_lows, peak_highs, side='left')
+        for i in range(len(peak_lows)):
+            start = window_starts[i]
+            stop = window_stops[i]
+            window_owners = peak_owners[start:stop][peak_highs[start:stop] > peak_lows[i]]
+            partners = np.unique(window_owners)
+            partners = partners[partners != peak_owners[i]]
+            if len(partners):
+                self.overlap_counts[peak_owners[i], partners] += 1
+                self.overlap_scores[peak_owners[i], partners] += peak_weights[i]
+        self.overlap_scores *= self.params.score_scale
+
+    def calculatePairwiseScore(self, mixture_list):
+        """Returns the pairwise score and overlap count of a mixture from the overlap matrix."""
+        if self.overlap_scores is None:
+            self.calculateOverlapMatrix()
+        index_list = [self.overlap_index[compound] for compound in mixture_list]
+        block = np.ix_(index_list, index_list)
+        return(float(self.overlap_scores[block].sum()), int(self.overlap_counts[block].sum()))
+
+    def calculatePairwiseCompoundScore(self, compound1, mixture_list):
+        """Returns the pairwise score and overlap count of a compound against the rest of its mixture."""
+        if self.overlap_scores is None:
+            self.calculateOverlapMatrix()
+        row = self.overlap_index[compound1]
+        index_list = [self.overlap_index[compound] for compound in mixture_list if compound != compound1]
+        return(float(self.overlap_scores[row, index_list].sum()), int(self.overlap_counts[row, index_list].sum()))
+
+    def getPeakArrays(self, compound):
+        """Returns the lower bounds, upper bounds, scoring weights and self overlap counts of the peak ranges of a
+        compound as NumPy arrays for the NumPy scoring backend. The self overlap counts are the number of peaks of
+        the same compound that overlap each peak, including the peak itself. The arrays are only built again when
+        the peaks of the compound or their ranges have changed. The bounds are copied out of the peak table, whose
+        rows are written again when the peaks change."""
+        compound_object = self.library.library[compound]
+        if self.peak_array_sources.get(compound) != compound_object.peak_range_key:
+            peak_lows = compound_object.peak_range_array[:, 1].copy()
+            peak_highs = compound_object.peak_range_array[:, 2].copy()
+            if self.params.use_intensity:
+                peak_weights = compound_object.peak_range_array[:, 3] / compound_object.intensity_sum
+            else:
+                peak_weights = np.ones(len(peak_lows))
+            self_counts = overlaps.count_overlaps(peak_lows, peak_highs, peak_lows, peak_highs)
+            self.peak_arrays[compound] = (peak_lows, peak_highs, peak_weights, self_counts)
+            self.peak_array_sources[compound] = compound_object.peak_range_key
+        return(self.peak_arrays[compound])
+
+    def concatenatePeakArrays(self, mixture_list):
+        """Returns the peak arrays of all the compounds in a mixture joined together, along with the position of
+        the owner of each peak in mixture_list."""
+        if not mixture_list:
+            return(np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0, dtype=int), np.zeros(0, dtype=int))
+        array_list = [self.getPeakArrays(compound) for compound in mixture_list]
+        peak_owners = np.repeat(np.arange(len(array_list)), [len(arrays[0]) for arrays in array_list])
+        return(tuple(np.concatenate(arrays) for arrays in zip(*array_list)) + (peak_owners,))
+
+    def calculateArrayMixtureScore(self, mixture_list):
+        """Returns the score and overlap count of a mixture with the NumPy scoring backend. The peaks of all the
+        compounds are compared at once, and a peak is overlapped when more peaks overlap it than peaks from its own
+        compound."""
+        peak_lows, peak_highs, peak_weights, self_counts, peak_owners = self.concatenatePeakArrays(mixture_list)
+        overlapped = overlaps.count_overlaps(peak_lows, peak_highs, peak_lows, peak_highs) > self_counts
+        num_compounds = len(mixture_list)
+        overlap_counts = np.bincount(peak_owners[overlapped], minlength=num_compounds)
+        if self.params.use_intensity:
+            compound_scores = np.bincount(peak_owners[overlapped], weights=peak_weights[overlapped],
+                                          minlength=num_compounds)
+        else:
+            num_peaks = np.bincount(peak_owners, minlength=num_compounds)
+            compound_scores = overlap_counts / num_peaks
+        score = float(sum(compound_scores * self.params.score_scale))
+        return(score, int(overlap_counts.sum()))
 
     def calculateTotalScore(self, mixtures_dict):
         score = 0
@@ -116,11 +294,28 @@ class Mixtures(object):
         return(score, overlaps)
 
 
+    def getMixtureKey(self, mixture_list):
+        """Returns a 64-bit key for a mixture, which is the XOR of a random key for each compound in it (Zobrist
+        hashing). The key does not depend on the order of the compounds, so the mixture does not need to be sorted
+        to look up its score."""
+        mixture_key = 0
+        for compound in mixture_list:
+            compound_key = self.zobrist_keys.get(compound)
+            if compound_key is None:
+                compound_key = self.zobrist_keys.setdefault(compound, self.zobrist_random.getrandbits(64))
+            mixture_key ^= compound_key
+        return(mixture_key)
+
     def calculateMixtureScore(self, mixture_list, temp_score = False):
+        mixture_key = self.getMixtureKey(mixture_list)
+        cached_score = self.score_cache.get(mixture_key)
+        if cached_score is not None:
+            return(cached_score)
         temp_list = sorted(list(set(mixture_list)))
-        if tuple(temp_list) in self.mixture_scores:
-            score = self.mixture_scores[tuple(temp_list)]
-            overlaps = self.mixture_overlaps[tuple(temp_list)]
+        if temp_score and self.params.scoring_mode == 'pairwise':
+            score, overlaps = self.calculatePairwiseScore(temp_list)
+        elif temp_score and self.params.scoring_backend == 'numpy':
+            score, overlaps = self.calculateArrayMixtureScore(temp_list)
         else:
             score = 0
             overlaps = 0
@@ -133,51 +328,172 @@ class Mixtures(object):
                     addscore, addoverlaps = self.calculateCompoundScore(compound, comp_list, temp_score=False)
                 score += addscore
                 overlaps += addoverlaps
-            self.mixture_scores[tuple(temp_list)] = score
-            self.mixture_overlaps[tuple(temp_list)] = overlaps
+        self.score_cache.put(mixture_key, score, overlaps)
         return(score, overlaps)
 
+    def getMixtureScore(self, mixture_num):
+        """Returns the score of one of the current mixtures. The score is recalculated if it has been discarded from
+        the score cache."""
+        return(self.calculateMixtureScore(self.mixtures[mixture_num])[0])
+
+    def getOverlapPartners(self, compound):
+        """Returns the set of compounds in the library that have a peak overlapping any peak of the compound. The
+        library chemical shift index is first brought up to date with any compounds or peaks that have changed."""
+        return(self.library.updateShiftIndex().overlapPartners(compound))
+
     def calculateCompoundScore(self, compound1, mixture_list, temp_score = False):
+        if temp_score and self.params.scoring_mode == 'pairwise':
+            return(self.calculatePairwiseCompoundScore(compound1, mixture_list))
         compound_object = self.library.library[compound1]
         if not temp_score:
             compound_object.generatePeakRanges()
-        peak_listA = list(compound_object.peak_range_list)
-        peak_listB = []
-        for compound2 in mixture_list:
-            if not temp_score:
+            for compound2 in mixture_list:
                 self.library.library[compound2].generatePeakRanges()
-            peak_listB += list(self.library.library[compound2].peak_range_list)
+            # Compounds whose fingerprints share no bin with compound1 cannot overlap it.
+            mixture_list = [compound2 for compound2 in mixture_list
+                            if compound_object.canOverlap(self.library.library[compound2])]
+        # Compounds without a peak near any peak of compound1 cannot overlap it.
+        overlap_partners = self.getOverlapPartners(compound1)
+        mixture_list = [compound2 for compound2 in mixture_list if compound2 in overlap_partners]
+        peak_listA = compound_object.peak_range_array.tolist()
         num_peaks = len(peak_listA)
         peak_overlap_score = 0.0
         peak_overlap_count = 0
         peak_overlap_list = []
 
-        for peakB in peak_listB:
-            new_list = list(peak_listA)
-            for peakA in peak_listA:
-                if (peakA[2] > peakB[1]) and (peakA[1] < peakB[2]):
-                    peak_overlap_count += 1
-                    if self.params.use_intensity:
-                        intensity_sum = compound_object.intensity_sum
-                        peak_overlap_score += float(peakA[3]) / intensity_sum
-                    else:
-                        peak_overlap_score += 1.0
-                    overlap_peak = (peakA[0], -peakA[3], peakA[2]-peakA[1])
-                    peak_overlap_list.append(overlap_peak)
-                    new_list.remove(peakA)
-            peak_listA = list(new_list)
+        if self.params.scoring_backend == 'numpy':
+            lowsA, highsA, weightsA = self.getPeakArrays(compound1)[:3]
+            lowsB, highsB = self.concatenatePeakArrays(mixture_list)[:2]
+            overlapped = overlaps.count_overlaps(lowsA, highsA, lowsB, highsB) > 0
+            peak_overlap_count = int(overlapped.sum())
+            peak_overlap_score = float(weightsA[overlapped].sum())
+            if not temp_score:
+                peak_overlap_list = [(peakA[0], -peakA[3], peakA[2]-peakA[1])
+                                     for peakA, overlap in zip(peak_listA, overlapped) if overlap]
+                peak_listA = [peakA for peakA, overlap in zip(peak_listA, overlapped) if not overlap]
+        else:
+            peak_listB = []
+            for compound2 in mixture_list:
+                peak_listB += self.library.library[compound2].peak_range_array.tolist()
+            # Each peak of A is counted once, against the first peak of B that overlaps it. Overlapped peaks are
+            # visited in that order so the overlap list and the score sum match a peak by peak comparison.
+            first_hits = overlaps.first_overlaps(peak_listA, peak_listB)
+            overlapped = sorted((first_hit, i) for i, first_hit in enumerate(first_hits) if first_hit is not None)
+            for first_hit, i in overlapped:
+                peakA = peak_listA[i]
+                peak_overlap_count += 1
+                if self.params.use_intensity:
+                    intensity_sum = compound_object.intensity_sum
+                    peak_overlap_score += float(peakA[3]) / intensity_sum
+                else:
+                    peak_overlap_score += 1.0
+                overlap_peak = (peakA[0], -peakA[3], peakA[2]-peakA[1])
+                peak_overlap_list.append(overlap_peak)
+            peak_listA = [peakA for peakA, first_hit in zip(peak_listA, first_hits) if first_hit is None]
         if self.params.use_intensity:
             compound_score = peak_overlap_score * self.params.score_scale
         else:
             compound_score = (peak_overlap_score / num_peaks) * self.params.score_scale
+        if self.params.scoring_mode == 'pairwise':
+            # The overlapped peak lists are still needed for the ROIs, but the score comes from the matrix.
+            compound_score, peak_overlap_count = self.calculatePairwiseCompoundScore(compound1, mixture_list)
         if not temp_score:
-            compound_object.no_overlap_list = [(item[0], item[3], item[2]-item[1]) for item in peak_listA]
-            compound_object.no_overlap_rois = compound_object.generateROIs(compound_object.no_overlap_list)
+            compound_object.setNoOverlapList([(item[0], item[3], item[2]-item[1]) for item in peak_listA])
+            compound_object.updateFullROIs()
             compound_object.overlap_list = list(peak_overlap_list)
             self.compound_scores[compound1] = (compound_score, peak_overlap_count, num_peaks)
 
         return(compound_score, peak_overlap_count)
 
+    def calculatePairMasks(self, compound1):
+        """Returns a dictionary with a bit mask for each compound that overlaps compound1. Bit i of a mask is set when
+        peak i of the peak range list of compound1 is overlapped by any peak of the other compound. The masks of a
+        compound are found in one pass over the peak index and are kept until the scores are reset, or until more
+        masks than the score cache size have been stored."""
+        try:
+            return(self.pair_masks[compound1])
+        except KeyError:
+            pass
+        if self.peak_index is None:
+            self.generatePeakIndex()
+        peak_lows, peak_highs, peak_owners, peak_weights, max_width = self.peak_index
+        compound_index = self.overlap_index[compound1]
+        peak_range_array = self.library.library[compound1].peak_range_array
+        window_starts = np.searchsorted(peak_lows, peak_range_array[:, 1] - max_width, side='left')
+        window_stops = np.searchsorted(peak_lows, peak_range_array[:, 2], side='left')
+        pair_masks = {}
+        for i in range(len(peak_range_array)):
+            start = window_starts[i]
+            stop = window_stops[i]
+            window_owners = peak_owners[start:stop][peak_highs[start:stop] > peak_range_array[i, 1]]
+            for owner in set(window_owners.tolist()):
+                if owner != compound_index:
+                    partner = self.overlap_compounds[owner]
+                    pair_masks[partner] = pair_masks.get(partner, 0) | (1 << i)
+        if self.pair_mask_count + len(pair_masks) > self.params.score_cache_size:
+            self.pair_masks = {}
+            self.pair_mask_count = 0
+        self.pair_masks[compound1] = pair_masks
+        self.pair_mask_count += len(pair_masks)
+        return(pair_masks)
+
+    def calculateMaskScore(self, compound, peak_mask):
+        """Returns the score and overlap count of a compound whose overlapped peaks are given by a bit mask."""
+        compound_object = self.library.library[compound]
+        peak_overlap_count = bin(peak_mask).count('1')
+        if self.params.use_intensity:
+            peak_overlap_score = 0.0
+            for i, intensity in enumerate(compound_object.peak_range_array[:, 3].tolist()):
+                if (peak_mask >> i) & 1:
+                    peak_overlap_score += intensity / compound_object.intensity_sum
+            compound_score = peak_overlap_score * self.params.score_scale
+        else:
+            compound_score = (peak_overlap_count / len(compound_object.peak_range_array)) * self.params.score_scale
+        return(compound_score, peak_overlap_count)
+
+    def calculateSwapDelta(self, mixture_list, removed, added):
+        """Returns the change in score and overlap count of a mixture when the compound removed is replaced by the
+        compound added, either of which can be "Blank". Only the overlaps between the swapped compounds and the
+        remaining members are evaluated, and only the members they overlap are rescored."""
+        remaining = [compound for compound in mixture_list if compound != removed]
+        diff_score = 0.0
+        diff_overlaps = 0
+        if self.params.scoring_mode == 'pairwise':
+            if self.overlap_scores is None:
+                self.calculateOverlapMatrix()
+            index_list = [self.overlap_index[compound] for compound in remaining]
+            for compound, sign in ((removed, -1), (added, 1)):
+                if compound != "Blank" and index_list:
+                    k = self.overlap_index[compound]
+                    diff_score += sign * float(self.overlap_scores[k, index_list].sum() +
+                                               self.overlap_scores[index_list, k].sum())
+                    diff_overlaps += sign * int(self.overlap_counts[k, index_list].sum() +
+                                                self.overlap_counts[index_list, k].sum())
+            return(diff_score, diff_overlaps)
+        for compound in remaining:
+            pair_masks = self.calculatePairMasks(compound)
+            removed_mask = pair_masks.get(removed, 0)
+            added_mask = pair_masks.get(added, 0)
+            if removed_mask == added_mask:
+                continue
+            other_mask = 0
+            for partner in remaining:
+                other_mask |= pair_masks.get(partner, 0)
+            old_score, old_overlaps = self.calculateMaskScore(compound, other_mask | removed_mask)
+            new_score, new_overlaps = self.calculateMaskScore(compound, other_mask | added_mask)
+            diff_score += new_score - old_score
+            diff_overlaps += new_overlaps - old_overlaps
+        for compound, sign in ((removed, -1), (added, 1)):
+            if compound != "Blank":
+                pair_masks = self.calculatePairMasks(compound)
+                peak_mask = 0
+                for partner in remaining:
+                    peak_mask |= pair_masks.get(partner, 0)
+                swap_score, swap_overlaps = self.calculateMaskScore(compound, peak_mask)
+                diff_score += sign * swap_score
+                diff_overlaps += sign * swap_overlaps
+        return(diff_score, diff_overlaps)
+
     def calcPeakStats(self):
         self.peak_overlap_count = 0
         self.num_peaks = 0
@@ -233,116 +549,6 @@ class Mixtures(object):
             delta_mean = (0.001 * self.params.score_scale)
         return(delta_mean)
 
-    def mixMixtures(self, mixtures_dict, mixture_list, refining=False):
-        new_mixtures = {}
-        if refining:
-            ideal_mix_rate = self.params.refine_mix_rate
-        else:
-            ideal_mix_rate = self.params.mix_rate
-        if len(mixtures_dict) < ideal_mix_rate:
-            mix_rate = len(mixtures_dict)
-        else:
-            mix_rate = ideal_mix_rate
-        mixed_mixtures = random.sample(mixture_list, mix_rate)
-        swap_list = []
-        for mix_num in mixed_mixtures:
-            new_mixtures[mix_num] = list(mixtures_dict[mix_num])
-            if len(new_mixtures[mix_num]) < self.params.mix_size:
-                intpick = random.randint(1, self.params.mix_size)
-                if intpick > len(new_mixtures[mix_num]):
-                    pick = "Blank"
-                else:
-                    pick = new_mixtures[mix_num][intpick-1]
-                    new_mixtures[mix_num].remove(pick)
-            else:
-                pick = random.choice(new_mixtures[mix_num])
-                new_mixtures[mix_num].remove(pick)
-            swap_list.append(pick)
-        diff_score = 0.0
-        diff_overlaps = 0.0
-        for i,mix_num in enumerate(mixed_mixtures):
-            if i+1 == mix_rate:
-                pick = swap_list[0]
-            else:
-                pick = swap_list[i+1]
-            if pick == "Blank":
-                pass
-            else:
-                new_mixtures[mix_num].append(pick)
-            new_mixtures[mix_num].sort()
-            old_score, old_overlaps = self.calculateMixtureScore(mixtures_dict[mix_num], temp_score=True)
-            new_score, new_overlaps = self.calculateMixtureScore(new_mixtures[mix_num], temp_score=True)
-            diff_score = diff_score + (new_score - old_score)
-            diff_overlaps = diff_overlaps + (new_overlaps - old_overlaps)
-        return(new_mixtures, diff_score, diff_overlaps)
-
-    def optimizeMixtures(self):
-        """Only used in command line version. Not threaded."""
-        groups = list(self.group_dict)
-        self.calculateTotalScore(self.mixtures)
-        self.anneal_scores = {}
-        for group in groups:
-            iter = {}
-            for i in range(self.params.iterations):
-                mixnum_list = list(self.group_mixnum[group])
-                curr_score, mixtures, scores = self.annealMixtures(mixnum_list)
-                iter[i] = [curr_score, mixtures, scores]
-                if i == 0:
-                    self.mixtures.update(mixtures)
-                    previous_score = curr_score
-                else:
-                    if curr_score <= previous_score:
-                        self.mixtures.update(mixtures)
-        self.calculateTotalScore(self.mixtures)
-
-
-    def annealMixtures(self, mixnum_list):
-        mixtures = {}
-        for mixnum in mixnum_list:
-            mixtures[mixnum] = self.mixtures[mixnum]
-        scores = []
-        delta_scores = []
-        curr_score = self.calculateTotalScore(mixtures)
-        step = 1
-        if self.params.cooling == 'exponential':
-            cooling_schedule = self.exponentialCooling()
-        else:
-            cooling_schedule = self.linearCooling()
-        for current_temp in cooling_schedule:
-            if step > self.params.max_steps:
-                break
-            new_mixtures = dict(self.mixMixtures(mixtures))
-            new_score = self.calculateTotalScore(new_mixtures)
-            score_diff = abs(new_score - curr_score)
-            delta_scores.append(score_diff)
-            if step == 1:
-                delta_median = score_diff
-            else:
-                delta_median = self.medianDeltaScore(delta_scores)
-            if new_score == 0:
-                score_step = (step, current_temp, curr_score, new_score, delta_median, 1, 'PASSED')
-                scores.append(score_step)
-                mixtures = dict(new_mixtures)
-                curr_score = new_score
-                break
-            elif new_score <= curr_score:
-                score_step = (step, current_temp, curr_score, new_score, delta_median, 1, 'PASSED')
-                scores.append(score_step)
-                mixtures = dict(new_mixtures)
-                curr_score = new_score
-            else:
-                probability = math.exp(-(score_diff)/(delta_median * current_temp))
-                if random.random() < probability:
-                    score_step = (step, current_temp, curr_score, new_score, delta_median, probability, 'PASSED')
-                    scores.append(score_step)
-                    mixtures = dict(new_mixtures)
-                    curr_score = new_score
-                else:
-                    score_step = (step, current_temp, curr_score, new_score, delta_median, probability, 'FAILED')
-                    scores.append(score_step)
-            step += 1
-        return(curr_score, mixtures, scores)
-
     def exportMixturesCSV(self, results_directory):
         path = os.path.join(results_directory, "mixtures.csv")
         with open(path, 'w') as mixture_csv:
@@ -360,7 +566,7 @@ class Mixtures(object):
                 mixture_results = []
                 mixture_results.append(str(mixture))
                 mixture_group = []
-                mixture_score = "%0.1f" % self.mixture_scores[tuple(self.mixtures[mixture])]
+                mixture_score = "%0.1f" % self.getMixtureScore(mixture)
                 mixture_results.append(mixture_score)
                 for compound in self.mixtures[mixture]:
                     if self.library.library[compound].group not in mixture_group:
@@ -480,7 +686,7 @@ class Mixtures(object):
                         group = 'N/A'
                     else:
                         group = mixture_group[0]
-                mixture_results.append("%.1f" % self.mixture_scores[tuple(self.mixtures[mixture])])
+                mixture_results.append("%.1f" % self.getMixtureScore(mixture))
                 mixture_results.append("%s" % group)
                 compound_list = list(self.mixtures[mixture])
                 while len(compound_list) < self.params.mix_size:
@@ -504,7 +710,7 @@ class Mixtures(object):
                     scores.append(self.compound_scores[compound][1])
                     scores.append("%.1f" % self.compound_scores[compound][0])
                     scores.append(mixture)
-                    scores.append("%.1f" % self.mixture_scores[tuple(self.mixtures[mixture])])
+                    scores.append("%.1f" % self.getMixtureScore(mixture))
                     writer.writerow(scores)
 
     def exportStats(self):
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+neighbourhood.py
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+
+class NeighbourhoodSolver(object):
+    """Re-partitions the compounds of a few mixtures into the same number of mixtures of at most mix_size compounds
+    with the lowest total score, for the large neighbourhood search. The compounds are assigned one at a time, the
+    most overlapped first, by a depth first branch and bound. Adding a compound to a mixture never lowers its score,
+    so a partial assignment that already scores no better than the best complete one is abandoned. The mixtures
+    are interchangeable, so a compound is only tried in one of the empty mixtures. The search is exact unless it
+    visits more than max_nodes assignments, in which case the best partition found so far is kept."""
+    def __init__(self, mixtures_object, max_nodes):
+        self.mixtures = mixtures_object
+        self.params = mixtures_object.params
+        self.max_nodes = max_nodes
+        self.pool = []
+        self.pair_masks = {}
+        self.pair_scores = {}
+        self.mask_scores = {}
+        self.nodes = 0
+        self.best_score = 0.0
+        self.best_partition = None
+
+    def maskScore(self, compound, peak_mask):
+        try:
+            return(self.mask_scores[(compound, peak_mask)])
+        except KeyError:
+            pass
+        mask_score = self.mixtures.calculateMaskScore(compound, peak_mask)
+        self.mask_scores[(compound, peak_mask)] = mask_score
+        return(mask_score)
+
+    def insertDelta(self, mixture_list, peak_masks, compound):
+        """Returns the change in score and overlap count of adding a compound to a mixture, as in
+        Mixtures.calculateSwapDelta. With the greedy scoring, peak_masks holds the overlapped peaks of each member
+        of the mixture as a bit mask."""
+        diff_score = 0.0
+        diff_overlaps = 0
+        if self.params.scoring_mode == 'pairwise':
+            pair_scores = self.pair_scores[compound]
+            for member in mixture_list:
+                member_score, member_overlaps = pair_scores.get(member, (0.0, 0))
+                diff_score += member_score
+                diff_overlaps += member_overlaps
+            return(diff_score, diff_overlaps)
+        pair_masks = self.pair_masks[compound]
+        peak_mask = 0
+        for member in mixture_list:
+            member_mask = self.pair_masks[member].get(compound, 0)
+            if member_mask | peak_masks[member] != peak_masks[member]:
+                old_score, old_overlaps = self.maskScore(member, peak_masks[member])
+                new_score, new_overlaps = self.maskScore(member, peak_masks[member] | member_mask)
+                diff_score += new_score - old_score
+                diff_overlaps += new_overlaps - old_overlaps
+            peak_mask |= pair_masks.get(member, 0)
+        add_score, add_overlaps = self.maskScore(compound, peak_mask)
+        return(diff_score + add_score, diff_overlaps + add_overlaps)
+
+    def insert(self, mixture_list, peak_masks, compound):
+        """Adds a compound to a mixture and updates the overlapped peaks of its members. Returns the previous peak
+        masks of the members, which remove uses to take the compound out again."""
+        previous = {}
+        if self.params.scoring_mode != 'pairwise':
+            pair_masks = self.pair_masks[compound]
+            peak_mask = 0
+            for member in mixture_list:
+                member_mask = self.pair_masks[member].get(compound, 0)
+                if member_mask:
+                    previous[member] = peak_masks[member]
+                    peak_masks[member] |= member_mask
+                peak_mask |= pair_masks.get(member, 0)
+            peak_masks[compound] = peak_mask
+        mixture_list.append(compound)
+        return(previous)
+
+    def remove(self, mixture_list, peak_masks, previous):
+        compound = mixture_list.pop()
+        peak_masks.pop(compound, None)
+        peak_masks.update(previous)
+
+    def prepare(self, pool):
+        """Gathers the overlaps between the compounds of the pool."""
+        pool_set = set(pool)
+        self.pair_masks = {}
+        self.pair_scores = {}
+        if len(self.mask_scores) > self.params.score_cache_size:
+            self.mask_scores = {}
+        for compound in pool:
+            self.pair_masks[compound] = dict((partner, peak_mask) for partner, peak_mask
+                                             in self.mixtures.calculatePairMasks(compound).items()
+                                             if partner in pool_set)
+        if self.params.scoring_mode == 'pairwise':
+            for compound in pool:
+                self.pair_scores[compound] = {}
+                for partner in pool:
+                    if partner != compound:
+                        self.pair_scores[compound][partner] = self.mixtures.calculateSwapDelta([partner], "Blank",
+                                                                                               compound)
+
+    def solve(self, mixture_lists):
+        """Returns the best partition of the compounds of the mixtures in mixture_lists as a list of sorted
+        mixtures, with the changes in score and overlap count from the current mixtures, or None if no partition
+        with a lower score was found."""
+        self.pool = []
+        for mixture_list in mixture_lists:
+            self.pool += list(mixture_list)
+        self.prepare(self.pool)
+        curr_score = 0.0
+        curr_overlaps = 0
+        for mixture_list in mixture_lists:
+            members = []
+            peak_masks = {}
+            for compound in mixture_list:
+                add_score, add_overlaps = self.insertDelta(members, peak_masks, compound)
+                curr_score += add_score
+                curr_overlaps += add_overlaps
+                self.insert(members, peak_masks, compound)
+        self.pool.sort(key=lambda compound: (-len(self.pair_masks[compound]), compound))
+        self.nodes = 0
+        # Only partitions that improve on the current mixtures by more than rounding errors are kept.
+        self.best_score = curr_score - 0.0001
+        self.best_partition = None
+        self.search(0, [[] for mixture_list in mixture_lists], [{} for mixture_list in mixture_lists], 0.0, 0)
+        if self.best_partition is None:
+            return(None)
+        partition, score, overlaps = self.best_partition
+        return([sorted(mixture_list) for mixture_list in partition], score - curr_score, overlaps - curr_overlaps)
+
+    def search(self, depth, partition, peak_masks, score, overlaps):
+        if self.nodes >= self.max_nodes:
+            return
+        self.nodes += 1
+        if depth == len(self.pool):
+            self.best_score = score
+            self.best_partition = ([list(mixture_list) for mixture_list in partition], score, overlaps)
+            return
+        compound = self.pool[depth]
+        options = []
+        tried_empty = False
+        for k, mixture_list in enumerate(partition):
+            if len(mixture_list) >= self.params.mix_size:
+                continue
+            if not mixture_list:
+                if tried_empty:
+                    continue
+                tried_empty = True
+            add_score, add_overlaps = self.insertDelta(mixture_list, peak_masks[k], compound)
+            if score + add_score < self.best_score:
+                options.append((add_score, k, add_overlaps))
+        options.sort()
+        for add_score, k, add_overlaps in options:
+            # The best score may have improved while searching the previous options.
+            if score + add_score >= self.best_score:
+                break
+            previous = self.insert(partition[k], peak_masks[k], compound)
+            self.search(depth + 1, partition, peak_masks, score + add_score, overlaps + add_overlaps)
+            self.remove(partition[k], peak_masks[k], previous)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+overlaps.py
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import math
+from bisect import bisect_left
+
+import numpy as np
+
+
+def first_overlaps(peak_listA, peak_listB):
+    """Compares two lists of peak ranges, as generated by Compound.generatePeakRanges, by sweeping along the chemical
+    shift axis. Returns a list with an entry for each peak in peak_listA that holds the index of the first peak in
+    peak_listB whose range overlaps it, or None if no peak in peak_listB overlaps it.
+
+    The peaks in peak_listB are sorted by their lower bound, so for each peak in peak_listA only the peaks of
+    peak_listB that open less than one peak width before it and before it closes need to be compared."""
+    sorted_listB = sorted((peak[1], peak[2], j) for j, peak in enumerate(peak_listB))
+    lows = [peak[0] for peak in sorted_listB]
+    max_width = 0.0
+    for low, high, j in sorted_listB:
+        if high - low > max_width:
+            max_width = high - low
+    # Small margin so that rounding in the widths can never drop an overlapping peak from the window.
+    max_width += 1e-9
+    first_hits = []
+    for peakA in peak_listA:
+        peak_low = peakA[1]
+        first_hit = None
+        for k in range(bisect_left(lows, peak_low - max_width), bisect_left(lows, peakA[2])):
+            if sorted_listB[k][1] > peak_low:
+                j = sorted_listB[k][2]
+                if first_hit is None or j < first_hit:
+                    first_hit = j
+        first_hits.append(first_hit)
+    return(first_hits)
+
+
+def count_overlaps(lows, highs, other_lows, other_highs):
+    """Takes arrays with the lower and upper bounds of a set of peak ranges and of a second set of peak ranges, and
+    returns an array with the number of ranges of the second set that overlap each range of the first set. Two ranges
+    overlap when each one opens before the other one closes, as in the peak by peak comparison.
+
+    Overlapping ranges are counted as the ranges that open before the upper bound minus the ranges that close at or
+    before the lower bound, so the whole set is handled by two searches of the sorted bounds."""
+    counts = np.searchsorted(np.sort(other_lows), highs, side='left')
+    counts -= np.searchsorted(np.sort(other_highs), lows, side='right')
+    # A zero width range lying on another zero width range closes before the other opens without having opened
+    # before it closes, so it is subtracted above without having been added.
+    points = lows == highs
+    if points.any():
+        other_points = np.sort(other_lows[other_lows == other_highs])
+        if len(other_points):
+            counts[points] += (np.searchsorted(other_points, lows[points], side='right') -
+                               np.searchsorted(other_points, lows[points], side='left'))
+    return(counts)
+
+
+def range_fingerprint(peak_ranges, shift_range, bin_width):
+    """Returns a fingerprint of a list of peak ranges as an integer bitset, where bit i is set when any peak range
+    touches the i-th bin of bin_width ppm from the low end of shift_range. Ranges beyond the ends of shift_range are
+    put in the first or last bin. Two sets of peak ranges can only overlap if their fingerprints share a bit, so a
+    bitwise AND of zero proves that they do not overlap."""
+    shift_low = min(shift_range)
+    last_bin = int(math.ceil((max(shift_range) - shift_low) / bin_width))
+    fingerprint = 0
+    for peak_low, peak_high in peak_ranges:
+        first = min(max(int(math.floor((peak_low - shift_low) / bin_width)), 0), last_bin)
+        last = min(max(int(math.floor((peak_high - shift_low) / bin_width)), 0), last_bin)
+        fingerprint |= ((1 << (last - first + 1)) - 1) << first
+    return(fingerprint)
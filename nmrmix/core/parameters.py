@@ -31,6 +31,9 @@ class Parameters(object):
         self.library_path = os.path.expanduser("~/Desktop/library.csv")
         self.autosave = True
         self.use_intensity = False
+        self.scoring_mode = 'greedy'
+        self.scoring_backend = 'python'
+        self.score_cache_size = 200000
         self.extra_mixtures = 0
         self.peak_range = 0.025
         self.use_group = False
@@ -44,6 +47,11 @@ class Parameters(object):
         self.refine_alpha_temp = math.exp((math.log(self.refine_final_temp/self.refine_start_temp))/self.refine_max_steps)
         self.cooling = 'exponential'
         self.refine_cooling = 'exponential'
+        self.start_acceptance = 0.5
+        self.final_acceptance = 0.00000001
+        self.refine_start_acceptance = 0.01
+        self.refine_final_acceptance = 0.00000001
+        self.acceptance_window = 100
         self.mix_rate = 2
         self.refine_mix_rate = 2
         self.mix_size = 5
@@ -53,7 +61,29 @@ class Parameters(object):
         self.intense_peak_cutoff = 0.900
         self.score_scale = 10000
         self.iterations = 1
+        self.anneal_backend = 'threads'
+        self.worker_processes = 0
+        self.optimizer = 'annealing'
+        self.replicas = 8
+        self.exchange_interval = 100
+        self.tabu_tenure = 10
+        self.tabu_candidates = 10
+        self.neighbourhood_mixtures = 3
+        self.neighbourhood_nodes = 5000
+        self.batch_size = 1
+        self.batch_weights = 'metropolis'
+        self.use_guided_moves = False
+        self.guided_fraction = 0.5
+        self.use_early_stop = False
+        self.stall_steps = 200
+        self.min_acceptance = 0.01
+        self.score_lower_bound = 0.0
+        self.use_checkpoints = False
+        self.use_seed = False
+        self.seed = 0
+        self.checkpoint_interval = 1000
         self.randomize_initial = True
+        self.greedy_initial = False
         self.use_refine = False
         self.group_specific_ignored_region = False
         self.print_step_size = 50
@@ -95,6 +125,26 @@ class Parameters(object):
         """Turns off the use of peak intensity for peak overlap scoring."""
         self.use_intensity = False
 
+    def useGreedyScoring(self):
+        """Counts each peak of a compound at most once, no matter how many other
+        compounds in the mixture overlap it. This is the original NMRmix scoring."""
+        self.scoring_mode = 'greedy'
+
+    def usePairwiseScoring(self):
+        """Scores a mixture as the sum of independent compound pair scores, so a
+        peak overlapped by two other compounds is counted twice. This allows the
+        library-wide overlap matrix to be used for fast mixture scoring."""
+        self.scoring_mode = 'pairwise'
+
+    def usePythonBackend(self):
+        """Compares the peaks of the compounds in a mixture one by one in Python."""
+        self.scoring_backend = 'python'
+
+    def useNumpyBackend(self):
+        """Compares the peaks of all the compounds in a mixture at once with NumPy
+        arrays. The scores are the same as with the Python backend."""
+        self.scoring_backend = 'numpy'
+
     def useGroup(self):
         """Turns on the generation of mixtures so that each mixture only
         contains compounds dissolved in the same group."""
@@ -185,6 +235,62 @@ class Parameters(object):
     def useRefineExponentialCooling(self):
         self.refine_cooling = 'exponential'
 
+    def useAdaptiveCooling(self):
+        """Cools the annealing to follow a target acceptance rate, starting
+        from a temperature calibrated on a sample of random moves."""
+        self.cooling = 'adaptive'
+
+    def useRefineAdaptiveCooling(self):
+        """Cools the refinement to follow a target acceptance rate, starting
+        from a temperature calibrated on a sample of random moves."""
+        self.refine_cooling = 'adaptive'
+
+    def setStartAcceptance(self, start_acceptance):
+        """Sets the target acceptance rate of the first step of the
+        annealing with adaptive cooling."""
+        try:
+            if 0 < float(start_acceptance) < 1:
+                self.start_acceptance = float(start_acceptance)
+        except:
+            pass
+
+    def setFinalAcceptance(self, final_acceptance):
+        """Sets the target acceptance rate of the last step of the
+        annealing with adaptive cooling."""
+        try:
+            if 0 < float(final_acceptance) < 1:
+                self.final_acceptance = float(final_acceptance)
+        except:
+            pass
+
+    def setRefineStartAcceptance(self, start_acceptance):
+        """Sets the target acceptance rate of the first step of the
+        refinement with adaptive cooling."""
+        try:
+            if 0 < float(start_acceptance) < 1:
+                self.refine_start_acceptance = float(start_acceptance)
+        except:
+            pass
+
+    def setRefineFinalAcceptance(self, final_acceptance):
+        """Sets the target acceptance rate of the last step of the
+        refinement with adaptive cooling."""
+        try:
+            if 0 < float(final_acceptance) < 1:
+                self.refine_final_acceptance = float(final_acceptance)
+        except:
+            pass
+
+    def setAcceptanceWindow(self, acceptance_window):
+        """Sets the number of steps over which the acceptance rate is
+        measured with adaptive cooling, which is also the number of random
+        moves used to calibrate the start temperature."""
+        try:
+            if int(acceptance_window) > 0:
+                self.acceptance_window = int(acceptance_window)
+        except:
+            pass
+
     def setMixRate(self, mix_rate):
         """Sets the number of mixtures to mix during each temperature step of
         the simulated annealing process."""
@@ -265,6 +371,15 @@ class Parameters(object):
         except:
             pass
 
+    def setScoreCacheSize(self, cache_size):
+        """Sets the max number of mixture scores kept in memory during the
+        optimization. The least recently used scores are discarded first."""
+        try:
+            if int(cache_size) > 0:
+                self.score_cache_size = int(cache_size)
+        except:
+            pass
+
     def setNumIterations(self, iterations):
         try:
             if int(iterations) > 0:
@@ -272,6 +387,206 @@ class Parameters(object):
         except:
             pass
 
+    def useThreadBackend(self):
+        """Anneals the mixtures of each group in a thread of the NMRmix process."""
+        self.anneal_backend = 'threads'
+
+    def useProcessBackend(self):
+        """Anneals the mixtures of each group in a pool of worker processes, so
+        that the groups and their iterations can be optimized on separate CPU
+        cores."""
+        self.anneal_backend = 'processes'
+
+    def setWorkerProcesses(self, worker_processes):
+        """Sets the number of worker processes used by the process backend. A
+        value of 0 uses one process per CPU core."""
+        try:
+            if int(worker_processes) >= 0:
+                self.worker_processes = int(worker_processes)
+        except:
+            pass
+
+    def useAnnealingOptimizer(self):
+        """Optimizes the mixtures by simulated annealing along the cooling
+        schedule."""
+        self.optimizer = 'annealing'
+
+    def useTemperingOptimizer(self):
+        """Optimizes the mixtures by parallel tempering, with replicas of the
+        mixtures at a ladder of fixed temperatures between the start and final
+        temperatures that periodically exchange their mixtures."""
+        self.optimizer = 'tempering'
+
+    def useTabuOptimizer(self):
+        """Optimizes the mixtures by tabu search, making the best move of a
+        compound between two mixtures at each step."""
+        self.optimizer = 'tabu'
+
+    def useNeighbourhoodOptimizer(self):
+        """Optimizes the mixtures by large neighbourhood search, repartitioning
+        the compounds of a few mixtures at a time by branch and bound."""
+        self.optimizer = 'neighbourhood'
+
+    def setReplicas(self, replicas):
+        """Sets the number of replicas used by parallel tempering."""
+        try:
+            if int(replicas) > 0:
+                self.replicas = int(replicas)
+        except:
+            pass
+
+    def setExchangeInterval(self, exchange_interval):
+        """Sets the number of steps between exchanges of the replicas in
+        parallel tempering."""
+        try:
+            if int(exchange_interval) > 0:
+                self.exchange_interval = int(exchange_interval)
+        except:
+            pass
+
+    def setTabuTenure(self, tabu_tenure):
+        """Sets the number of steps during which a compound may not go back
+        to a mixture it has left in tabu search."""
+        try:
+            if int(tabu_tenure) >= 0:
+                self.tabu_tenure = int(tabu_tenure)
+        except:
+            pass
+
+    def setTabuCandidates(self, tabu_candidates):
+        """Sets the number of moves with the best estimated scores that are
+        scored exactly at each step of tabu search."""
+        try:
+            if int(tabu_candidates) > 0:
+                self.tabu_candidates = int(tabu_candidates)
+        except:
+            pass
+
+    def setNeighbourhoodMixtures(self, neighbourhood_mixtures):
+        """Sets the number of mixtures repartitioned at each step of large
+        neighbourhood search."""
+        try:
+            if int(neighbourhood_mixtures) >= 2:
+                self.neighbourhood_mixtures = int(neighbourhood_mixtures)
+        except:
+            pass
+
+    def setNeighbourhoodNodes(self, neighbourhood_nodes):
+        """Sets the number of assignments that the branch and bound of large
+        neighbourhood search may try for each neighbourhood."""
+        try:
+            if int(neighbourhood_nodes) > 0:
+                self.neighbourhood_nodes = int(neighbourhood_nodes)
+        except:
+            pass
+
+    def setBatchSize(self, batch_size):
+        """Sets the number of candidate moves scored at each step of the
+        annealing. With a batch size of 1, a single move is proposed and
+        accepted by the Metropolis criterion."""
+        try:
+            if int(batch_size) > 0:
+                self.batch_size = int(batch_size)
+        except:
+            pass
+
+    def useMetropolisWeights(self):
+        """Samples the candidate moves of a batch by their Metropolis
+        weights."""
+        self.batch_weights = 'metropolis'
+
+    def useHeatBathWeights(self):
+        """Samples the candidate moves of a batch by their heat bath
+        weights."""
+        self.batch_weights = 'heatbath'
+
+    def useGuidedMoves(self):
+        """Picks the first compound of a share of the annealing moves with a
+        chance in proportion to its overlap score in its mixture."""
+        self.use_guided_moves = True
+
+    def noGuidedMoves(self):
+        """Picks the compounds of the annealing moves uniformly."""
+        self.use_guided_moves = False
+
+    def setGuidedFraction(self, guided_fraction):
+        """Sets the share of the annealing moves that are guided by the
+        overlap scores, when guided moves are used. The other moves are
+        picked uniformly."""
+        try:
+            if 0 <= float(guided_fraction) <= 1:
+                self.guided_fraction = float(guided_fraction)
+        except:
+            pass
+
+    def useEarlyStop(self):
+        """Stops the annealing of an iteration early once it has converged."""
+        self.use_early_stop = True
+
+    def noEarlyStop(self):
+        """Anneals each iteration for the full number of steps."""
+        self.use_early_stop = False
+
+    def setStallSteps(self, stall_steps):
+        """Sets the number of steps without an improvement of the best score
+        after which the annealing stops early. The acceptance rate is also
+        measured over this many steps."""
+        try:
+            if int(stall_steps) > 0:
+                self.stall_steps = int(stall_steps)
+        except:
+            pass
+
+    def setMinAcceptance(self, min_acceptance):
+        """Sets the fraction of accepted steps below which the annealing
+        stops early."""
+        try:
+            if 0.0 <= float(min_acceptance) <= 1.0:
+                self.min_acceptance = float(min_acceptance)
+        except:
+            pass
+
+    def setScoreLowerBound(self, lower_bound):
+        """Sets a known lower bound of the total score of the mixtures, at
+        which the annealing stops early."""
+        try:
+            if float(lower_bound) >= 0.0:
+                self.score_lower_bound = float(lower_bound)
+        except:
+            pass
+
+    def useCheckpoints(self):
+        """Saves checkpoints of the optimization to the working directory, so
+        that an unfinished optimization can be resumed."""
+        self.use_checkpoints = True
+
+    def noCheckpoints(self):
+        self.use_checkpoints = False
+
+    def setCheckpointInterval(self, checkpoint_interval):
+        """Sets the number of annealing steps between checkpoints."""
+        try:
+            if int(checkpoint_interval) > 0:
+                self.checkpoint_interval = int(checkpoint_interval)
+        except:
+            pass
+
+    def useSeed(self):
+        """Draws every random choice of the initial mixtures and the
+        optimization from the seed, so that the same mixtures are made each
+        time."""
+        self.use_seed = True
+
+    def noSeed(self):
+        self.use_seed = False
+
+    def setSeed(self, seed):
+        try:
+            if int(seed) >= 0:
+                self.seed = int(seed)
+        except:
+            pass
+
     def setPrintStepSize(self, step_size):
         """Sets how often the optimization progress bar updates"""
         try:
@@ -303,6 +618,12 @@ class Parameters(object):
     def initWindowSize(self, size):
         self.size = size
 
+    def __getstate__(self):
+        # The window size is a Qt object that the annealing worker processes do not need.
+        state = dict(self.__dict__)
+        state.pop('size', None)
+        return(state)
+
     def exportScoringParams(self, results_path):
         path = os.path.join(results_path, 'params_scoring.log')
         try:
@@ -313,6 +634,13 @@ class Parameters(object):
                 scoreparams.write(score_scale+'\n')
                 use_intensity = "Intensity Scoring: %s" % str(self.use_intensity)
                 scoreparams.write(use_intensity+'\n')
+                scoring_mode = "Scoring Mode: %s" % self.scoring_mode.capitalize()
+                scoreparams.write(scoring_mode+'\n')
+                if self.use_seed:
+                    random_seed = "Random Seed: %d" % self.seed
+                else:
+                    random_seed = "Random Seed: None"
+                scoreparams.write(random_seed+'\n')
         except:
             pass
 
@@ -320,9 +648,12 @@ class Parameters(object):
         self.setDefaultParams()
         self.writePreferences()
 
-    def readPreferences(self):
+    def readPreferences(self, param_path=None):
+        """Reads the parameters from the preferences file in the .nmrmix directory, or from another file in the same
+        format."""
         try:
-            param_path = os.path.expanduser(self.param_file)
+            if param_path is None:
+                param_path = os.path.expanduser(self.param_file)
             if os.path.isfile(param_path):
                 with codecs.open(param_path, 'r', encoding='utf-8') as param_file:
                     for line in param_file:
@@ -345,6 +676,16 @@ class Parameters(object):
                                 self.useIntensity()
                             else:
                                 self.noIntensity()
+                        elif parameter == "Scoring Mode":
+                            if param_value.lower() == "pairwise":
+                                self.usePairwiseScoring()
+                            else:
+                                self.useGreedyScoring()
+                        elif parameter == "Scoring Backend":
+                            if param_value.lower() == "numpy":
+                                self.useNumpyBackend()
+                            else:
+                                self.usePythonBackend()
                         elif parameter == "Extra Mixtures":
                             self.setExtraMixtures(param_value)
                         elif parameter == "Overlap Range":
@@ -369,13 +710,27 @@ class Parameters(object):
                         elif parameter == "Optimizing Cooling Rate":
                             if param_value.lower() == 'linear':
                                 self.useLinearCooling()
+                            elif param_value.lower() == 'adaptive':
+                                self.useAdaptiveCooling()
                             else:
                                 self.useExponentialCooling()
                         elif parameter == "Refining Cooling Rate":
                             if param_value.lower() == 'linear':
                                 self.useRefineLinearCooling()
+                            elif param_value.lower() == 'adaptive':
+                                self.useRefineAdaptiveCooling()
                             else:
                                 self.useRefineExponentialCooling()
+                        elif parameter == "Optimizing Start Acceptance":
+                            self.setStartAcceptance(param_value)
+                        elif parameter == "Optimizing Final Acceptance":
+                            self.setFinalAcceptance(param_value)
+                        elif parameter == "Refining Start Acceptance":
+                            self.setRefineStartAcceptance(param_value)
+                        elif parameter == "Refining Final Acceptance":
+                            self.setRefineFinalAcceptance(param_value)
+                        elif parameter == "Acceptance Window":
+                            self.setAcceptanceWindow(param_value)
                         elif parameter == "Optimizing Mix Rate":
                             self.setMixRate(param_value)
                         elif parameter == "Refining Mix Rate":
@@ -392,11 +747,85 @@ class Parameters(object):
                             self.setScoreScale(param_value)
                         elif parameter == "Iterations":
                             self.setNumIterations(param_value)
+                        elif parameter == "Score Cache Size":
+                            self.setScoreCacheSize(param_value)
+                        elif parameter == "Anneal Backend":
+                            if param_value.lower() == "processes":
+                                self.useProcessBackend()
+                            else:
+                                self.useThreadBackend()
+                        elif parameter == "Worker Processes":
+                            self.setWorkerProcesses(param_value)
+                        elif parameter == "Optimizer":
+                            if param_value.lower() == "tempering":
+                                self.useTemperingOptimizer()
+                            elif param_value.lower() == "tabu":
+                                self.useTabuOptimizer()
+                            elif param_value.lower() == "neighbourhood":
+                                self.useNeighbourhoodOptimizer()
+                            else:
+                                self.useAnnealingOptimizer()
+                        elif parameter == "Replicas":
+                            self.setReplicas(param_value)
+                        elif parameter == "Exchange Interval":
+                            self.setExchangeInterval(param_value)
+                        elif parameter == "Tabu Tenure":
+                            self.setTabuTenure(param_value)
+                        elif parameter == "Tabu Candidates":
+                            self.setTabuCandidates(param_value)
+                        elif parameter == "Neighbourhood Mixtures":
+                            self.setNeighbourhoodMixtures(param_value)
+                        elif parameter == "Neighbourhood Nodes":
+                            self.setNeighbourhoodNodes(param_value)
+                        elif parameter == "Batch Size":
+                            self.setBatchSize(param_value)
+                        elif parameter == "Batch Weights":
+                            if param_value.lower() == "heatbath":
+                                self.useHeatBathWeights()
+                            else:
+                                self.useMetropolisWeights()
+                        elif parameter == "Use Guided Moves":
+                            if param_value.lower() == "true":
+                                self.useGuidedMoves()
+                            else:
+                                self.noGuidedMoves()
+                        elif parameter == "Guided Fraction":
+                            self.setGuidedFraction(param_value)
+                        elif parameter == "Use Early Stop":
+                            if param_value.lower() == "true":
+                                self.useEarlyStop()
+                            else:
+                                self.noEarlyStop()
+                        elif parameter == "Stall Steps":
+                            self.setStallSteps(param_value)
+                        elif parameter == "Min Acceptance Rate":
+                            self.setMinAcceptance(param_value)
+                        elif parameter == "Score Lower Bound":
+                            self.setScoreLowerBound(param_value)
+                        elif parameter == "Use Checkpoints":
+                            if param_value.lower() == "true":
+                                self.useCheckpoints()
+                            else:
+                                self.noCheckpoints()
+                        elif parameter == "Checkpoint Interval":
+                            self.setCheckpointInterval(param_value)
+                        elif parameter == "Use Seed":
+                            if param_value.lower() == "true":
+                                self.useSeed()
+                            else:
+                                self.noSeed()
+                        elif parameter == "Seed":
+                            self.setSeed(param_value)
                         elif parameter == "Randomize Initial Mixture State":
                             if param_value.lower() == "true":
                                 self.randomize_initial = True
                             else:
                                 self.randomize_initial = False
+                        elif parameter == "Greedy Initial Mixture State":
+                            if param_value.lower() == "true":
+                                self.greedy_initial = True
+                            else:
+                                self.greedy_initial = False
                         elif parameter == "Use Refinement":
                             if param_value.lower() == "true":
                                 self.use_refine = True
@@ -432,6 +861,8 @@ class Parameters(object):
                 param_file.write("Library File Path" + " = " + str(self.library_path) + "\n")
                 param_file.write("Use Autosave" + " = " + str(self.autosave) + "\n")
                 param_file.write("Use Peak Intensity" + " = " + str(self.use_intensity) + "\n")
+                param_file.write("Scoring Mode" + " = " + str(self.scoring_mode) + "\n")
+                param_file.write("Scoring Backend" + " = " + str(self.scoring_backend) + "\n")
                 param_file.write("Extra Mixtures" + " = " + str(self.extra_mixtures) + "\n")
                 param_file.write("Overlap Range" + " = " + str(self.peak_range) + "\n")
                 param_file.write("Use Group" + " = " + str(self.use_group) + "\n")
@@ -443,6 +874,11 @@ class Parameters(object):
                 param_file.write("Refining Final Temp" + " = " + str(self.refine_final_temp) + "\n")
                 param_file.write("Optimizing Cooling Rate" + " = " + str(self.cooling) + "\n")
                 param_file.write("Refining Cooling Rate" + " = " + str(self.refine_cooling) + "\n")
+                param_file.write("Optimizing Start Acceptance" + " = " + str(self.start_acceptance) + "\n")
+                param_file.write("Optimizing Final Acceptance" + " = " + str(self.final_acceptance) + "\n")
+                param_file.write("Refining Start Acceptance" + " = " + str(self.refine_start_acceptance) + "\n")
+                param_file.write("Refining Final Acceptance" + " = " + str(self.refine_final_acceptance) + "\n")
+                param_file.write("Acceptance Window" + " = " + str(self.acceptance_window) + "\n")
                 param_file.write("Optimizing Mix Rate" + " = " + str(self.mix_rate) + "\n")
                 param_file.write("Refining Mix Rate" + " = " + str(self.refine_mix_rate) + "\n")
                 param_file.write("Max Mixture Size" + " = " + str(self.mix_size) + "\n")
@@ -452,7 +888,30 @@ class Parameters(object):
                 param_file.write("Intense Peak Cutoff" + " = " + str(self.intense_peak_cutoff) + "\n")
                 param_file.write("Score Scale" + " = " + str(self.score_scale) + "\n")
                 param_file.write("Iterations" + " = " + str(self.iterations) + "\n")
+                param_file.write("Score Cache Size" + " = " + str(self.score_cache_size) + "\n")
+                param_file.write("Anneal Backend" + " = " + str(self.anneal_backend) + "\n")
+                param_file.write("Worker Processes" + " = " + str(self.worker_processes) + "\n")
+                param_file.write("Optimizer" + " = " + str(self.optimizer) + "\n")
+                param_file.write("Replicas" + " = " + str(self.replicas) + "\n")
+                param_file.write("Exchange Interval" + " = " + str(self.exchange_interval) + "\n")
+                param_file.write("Tabu Tenure" + " = " + str(self.tabu_tenure) + "\n")
+                param_file.write("Tabu Candidates" + " = " + str(self.tabu_candidates) + "\n")
+                param_file.write("Neighbourhood Mixtures" + " = " + str(self.neighbourhood_mixtures) + "\n")
+                param_file.write("Neighbourhood Nodes" + " = " + str(self.neighbourhood_nodes) + "\n")
+                param_file.write("Batch Size" + " = " + str(self.batch_size) + "\n")
+                param_file.write("Batch Weights" + " = " + str(self.batch_weights) + "\n")
+                param_file.write("Use Guided Moves" + " = " + str(self.use_guided_moves) + "\n")
+                param_file.write("Guided Fraction" + " = " + str(self.guided_fraction) + "\n")
+                param_file.write("Use Early Stop" + " = " + str(self.use_early_stop) + "\n")
+                param_file.write("Stall Steps" + " = " + str(self.stall_steps) + "\n")
+                param_file.write("Min Acceptance Rate" + " = " + str(self.min_acceptance) + "\n")
+                param_file.write("Score Lower Bound" + " = " + str(self.score_lower_bound) + "\n")
+                param_file.write("Use Checkpoints" + " = " + str(self.use_checkpoints) + "\n")
+                param_file.write("Checkpoint Interval" + " = " + str(self.checkpoint_interval) + "\n")
+                param_file.write("Use Seed" + " = " + str(self.use_seed) + "\n")
+                param_file.write("Seed" + " = " + str(self.seed) + "\n")
                 param_file.write("Randomize Initial Mixture State" + " = " + str(self.randomize_initial) + "\n")
+                param_file.write("Greedy Initial Mixture State" + " = " + str(self.greedy_initial) + "\n")
                 param_file.write("Use Refinement" + " = " + str(self.use_refine) + "\n")
                 param_file.write("Step Size Print" + " = " + str(self.print_step_size) + "\n")
                 param_file.write("Peak Display Width" + " = " + str(self.peak_display_width) + "\n")
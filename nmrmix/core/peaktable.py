@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+peaktable.py
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import itertools
+
+import numpy as np
+
+ACTIVE = 0
+IGNORED = 1
+REMOVED = 2
+PEAKLIST = 3
+ORIGINAL = 4
+NUM_STATUSES = 5
+
+# Every write to the peaks of a compound gets a new version, so that the version shows whether the peaks have changed
+# even after the compound has been copied to another table.
+peak_versions = itertools.count(1)
+
+
+class PeakTable(object):
+    """Stores the peak lists of a set of compounds in one set of NumPy arrays. Each compound has a slot, and the rows
+    of slot i start at offsets[i] and hold its peaks grouped by status: the active peaks (the mix_peaklist), the
+    ignored peaks, the removed peaks, the peaklist the active and ignored peaks are reset from, and the peaks as they
+    were imported, with counts[i, status] rows of each. Each row of ranges holds the ppm, the lower and upper bounds
+    of the peak range and the intensity of a peak, so that the peak ranges of the active peaks of a compound are a
+    view of the table. Peaks without their own width have a width of NaN, so that the overlap range from Parameters
+    is used for them.
+
+    When the peaks of a compound no longer fit in its rows, they are moved to the end of the table, and the table is
+    compacted once more than half of its rows are unused. Rows are never written again after they stop being used,
+    and compacting or growing the table copies it to new arrays, so a view of the peaks of a compound stays valid
+    until the peaks of that compound or the bounds of their ranges change. The slots whose peaks are written are
+    collected in changed_slots, so that the shift index of the library only needs to index those compounds again."""
+    def __init__(self):
+        self.ranges = np.zeros((0, 4))
+        self.width = np.zeros(0)
+        self.status = np.zeros(0, dtype=np.int8)
+        self.num_rows = 0
+        self.used_rows = 0
+        self.compound_ids = []
+        self.compound_index = {}
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self.capacities = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros((0, NUM_STATUSES), dtype=np.int64)
+        self.versions = []
+        self.generation = 0
+        self.changed_slots = set()
+
+    def __len__(self):
+        return(self.used_rows)
+
+    def resizeRows(self, num_rows):
+        """Copies the rows in use to new arrays with room for num_rows rows."""
+        ranges = np.zeros((num_rows, 4))
+        width = np.zeros(num_rows)
+        status = np.zeros(num_rows, dtype=np.int8)
+        ranges[:self.num_rows] = self.ranges[:self.num_rows]
+        width[:self.num_rows] = self.width[:self.num_rows]
+        status[:self.num_rows] = self.status[:self.num_rows]
+        self.ranges = ranges
+        self.width = width
+        self.status = status
+        self.generation += 1
+
+    def addCompound(self, compound, source=None, source_slot=None):
+        """Adds a slot for a compound, with a copy of the peaks of slot source_slot of another table if source is
+        given. Returns the slot."""
+        slot = len(self.compound_ids)
+        if slot == len(self.offsets):
+            size = max(2 * slot, 16)
+            self.offsets = np.resize(self.offsets, size)
+            self.capacities = np.resize(self.capacities, size)
+            self.counts = np.resize(self.counts, (size, NUM_STATUSES))
+        self.compound_ids.append(compound)
+        self.compound_index[compound] = slot
+        self.offsets[slot] = self.num_rows
+        self.capacities[slot] = 0
+        self.counts[slot] = 0
+        self.versions.append(next(peak_versions))
+        self.changed_slots.add(slot)
+        if source is not None:
+            rows = source.slotRows(source_slot)
+            self.writeSlot(slot, source.ranges[rows], source.width[rows], source.counts[source_slot])
+            self.versions[slot] = source.versions[source_slot]
+        return(slot)
+
+    def slotRows(self, slot, status=None):
+        """Returns the slice of rows that holds the peaks of a slot with a status, or all of its peaks."""
+        start = self.offsets.item(slot)
+        if status is None:
+            return(slice(start, start + int(self.counts[slot].sum())))
+        start += int(self.counts[slot, :status].sum())
+        return(slice(start, start + self.counts.item(slot, status)))
+
+    def compoundRows(self, compound, status=None):
+        return(self.slotRows(self.compound_index[compound], status))
+
+    def writeSlot(self, slot, ranges, width, counts):
+        """Replaces the peaks of a slot with the rows in ranges and width, grouped by status with counts rows of
+        each."""
+        num_peaks = int(sum(counts))
+        if num_peaks > self.capacities.item(slot):
+            if self.num_rows + num_peaks > len(self.width):
+                self.resizeRows(max(2 * len(self.width), self.num_rows + num_peaks, 64))
+            self.used_rows -= self.capacities.item(slot)
+            self.offsets[slot] = self.num_rows
+            self.capacities[slot] = num_peaks
+            self.num_rows += num_peaks
+            self.used_rows += num_peaks
+        rows = slice(self.offsets.item(slot), self.offsets.item(slot) + num_peaks)
+        self.ranges[rows] = ranges
+        self.width[rows] = width
+        self.status[rows] = np.repeat(np.arange(NUM_STATUSES, dtype=np.int8), counts)
+        self.counts[slot] = counts
+        self.versions[slot] = next(peak_versions)
+        self.changed_slots.add(slot)
+        if self.num_rows > 1024 and self.num_rows > 2 * self.used_rows:
+            self.compact()
+
+    def compact(self):
+        """Copies the peaks of every slot to new arrays without the unused rows."""
+        num_slots = len(self.compound_ids)
+        order = np.argsort(self.offsets[:num_slots], kind='mergesort')
+        starts = self.offsets[:num_slots][order]
+        sizes = self.capacities[:num_slots][order]
+        rows = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(int(sizes.sum()))
+        self.ranges = self.ranges[rows]
+        self.width = self.width[rows]
+        self.status = self.status[rows]
+        self.offsets[order] = np.cumsum(sizes) - sizes
+        self.num_rows = len(rows)
+        self.used_rows = len(rows)
+        self.generation += 1
+
+    def setPeakLists(self, slot, peaklists):
+        """Replaces the peak lists of a slot with those in the dictionary peaklists, keyed by status. The peaks are
+        (ppm, intensity) or (ppm, intensity, width) tuples."""
+        ranges = []
+        widths = []
+        counts = []
+        for status in range(NUM_STATUSES):
+            if status in peaklists:
+                peaklist = peaklists[status]
+                status_ranges = np.zeros((len(peaklist), 4))
+                status_ranges[:, 1:3] = np.nan
+                status_widths = np.full(len(peaklist), np.nan)
+                for row, peak in enumerate(peaklist):
+                    status_ranges[row, 0] = peak[0]
+                    status_ranges[row, 3] = peak[1]
+                    if len(peak) > 2:
+                        status_widths[row] = peak[2]
+            else:
+                rows = self.slotRows(slot, status)
+                status_ranges = self.ranges[rows]
+                status_widths = self.width[rows]
+            ranges.append(status_ranges)
+            widths.append(status_widths)
+            counts.append(len(status_widths))
+        self.writeSlot(slot, np.concatenate(ranges), np.concatenate(widths), counts)
+
+    def peakList(self, slot, status=ACTIVE):
+        """Returns the peaks of a slot with the given status as a list of (ppm, intensity) tuples, or
+        (ppm, intensity, width) tuples for the peaks with their own width."""
+        rows = self.slotRows(slot, status)
+        peaklist = []
+        for ppm, intensity, width in zip(self.ranges[rows, 0].tolist(), self.ranges[rows, 3].tolist(),
+                                         self.width[rows].tolist()):
+            if width != width:
+                peaklist.append((ppm, intensity))
+            else:
+                peaklist.append((ppm, intensity, width))
+        return(peaklist)
+
+    def peakCount(self, slot, status=ACTIVE):
+        return(self.counts.item(slot, status))
+
+    def peakRanges(self, slot, peak_range):
+        """Sets the bounds of the peak ranges of the active peaks of a slot, using peak_range for the peaks without
+        their own width, and returns them as a view of the table with a row of (ppm, lower bound, upper bound,
+        intensity) for each peak."""
+        rows = self.slotRows(slot, ACTIVE)
+        widths = np.where(np.isnan(self.width[rows]), peak_range, self.width[rows])
+        self.ranges[rows, 1] = self.ranges[rows, 0] - (widths / 2)
+        self.ranges[rows, 2] = self.ranges[rows, 0] + (widths / 2)
+        return(self.ranges[rows])
+
+    def rangeView(self, slot):
+        """Returns the peak ranges of the active peaks of a slot as last set by peakRanges."""
+        return(self.ranges[self.slotRows(slot, ACTIVE)])
+
+    def gatherPeaks(self, slots, status=ACTIVE):
+        """Returns the ppm, intensity and width of the peaks with the given status of each slot in slots, one slot
+        after another, with the position in slots of the owner of each peak."""
+        slots = np.asarray(slots, dtype=np.int64)
+        starts = self.offsets[slots] + self.counts[slots, :status].sum(axis=1)
+        sizes = self.counts[slots, status]
+        owners = np.repeat(np.arange(len(slots)), sizes)
+        rows = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(int(sizes.sum()))
+        return(self.ranges[rows, 0], self.ranges[rows, 3], self.width[rows], owners)
+
+    def subset(self, slots):
+        """Returns a compact table with a copy of the peaks of each slot in slots."""
+        peak_table = PeakTable()
+        for slot in slots:
+            peak_table.addCompound(self.compound_ids[slot], self, slot)
+        return(peak_table)
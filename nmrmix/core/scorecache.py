@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+scorecache.py
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import threading
+from collections import OrderedDict
+
+
+class ScoreCache(object):
+    """A size limited store of mixture scores and overlap counts, keyed by the Zobrist key of each mixture (see
+    Mixtures.getMixtureKey). When the cache is full, the least recently used mixture is discarded. The cache can be
+    shared by the annealing threads of different groups."""
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.scores = OrderedDict()
+        self.lock = threading.Lock()
+        self.resetStats()
+
+    def __contains__(self, key):
+        with self.lock:
+            return(key in self.scores)
+
+    def __len__(self):
+        return(len(self.scores))
+
+    def get(self, key):
+        """Returns the score and overlap count stored for a mixture, or None if the mixture is not in the cache."""
+        with self.lock:
+            try:
+                value = self.scores.pop(key)
+            except KeyError:
+                self.misses += 1
+                return(None)
+            self.scores[key] = value
+            self.hits += 1
+            return(value)
+
+    def put(self, key, score, overlaps):
+        """Stores the score and overlap count of a mixture, discarding the least recently used mixtures if needed."""
+        with self.lock:
+            self.scores.pop(key, None)
+            self.scores[key] = (score, overlaps)
+            while len(self.scores) > self.max_size:
+                self.scores.popitem(last=False)
+                self.evictions += 1
+
+    def setMaxSize(self, max_size):
+        with self.lock:
+            self.max_size = max_size
+            while len(self.scores) > self.max_size:
+                self.scores.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.scores.clear()
+
+    def resetStats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        return((self.hits, self.misses, self.evictions))
+
+    def addStats(self, stats):
+        """Adds the hits, misses and evictions of another cache, such as the cache of a worker process, to the
+        statistics of this cache."""
+        with self.lock:
+            self.hits += stats[0]
+            self.misses += stats[1]
+            self.evictions += stats[2]
+
+    def hitRate(self):
+        """Returns the percentage of lookups that were found in the cache."""
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return(0.0)
+        return(100.0 * self.hits / lookups)
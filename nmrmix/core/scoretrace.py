@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+scoretrace.py
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import numpy as np
+
+
+# str() keeps the field names as byte strings, which older versions of NumPy require under Python 2.
+TRACE_FIELDS = [('step', 'i4'), ('temp', 'f8'), ('curr_score', 'f8'), ('new_score', 'f8'), ('curr_overlap', 'i4'),
+                ('new_overlap', 'i4'), ('probability', 'f8'), ('accepted', '?')]
+TRACE_DTYPE = np.dtype([(str(name), fmt) for name, fmt in TRACE_FIELDS])
+
+
+class ScoreTrace(object):
+    """The score of each step of an annealing, stored as the rows of a NumPy structured array with one column for
+    each field of TRACE_FIELDS. The rows are preallocated, and the array doubles in size when it is full. The number
+    of peaks and the maximum score are the same for every step, so they are kept once for the trace, along with the
+    reason that the annealing stopped. A column is read with trace['curr_score'] and the step rows are not
+    copied."""
+    def __init__(self, num_peaks=0, max_score=0, size=1000, stop_reason="Max Steps"):
+        self.data = np.zeros(max(int(size), 1), dtype=TRACE_DTYPE)
+        self.size = 0
+        self.num_peaks = num_peaks
+        self.max_score = max_score
+        self.stop_reason = stop_reason
+
+    def __len__(self):
+        return(self.size)
+
+    def __getitem__(self, column):
+        return(self.data[column][:self.size])
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['data'] = self.data[:self.size].copy()
+        return(state)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def reserve(self, size):
+        if size > len(self.data):
+            data = np.zeros(max(size, 2 * len(self.data)), dtype=TRACE_DTYPE)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+
+    def append(self, step, temp, curr_score, new_score, curr_overlap, new_overlap, probability, accepted):
+        if self.size == len(self.data):
+            self.reserve(self.size + 1)
+        self.data[self.size] = (step, temp, curr_score, new_score, curr_overlap, new_overlap, probability, accepted)
+        self.size += 1
+
+    def appendRows(self, rows):
+        """Appends an array of steps with the dtype TRACE_DTYPE."""
+        self.reserve(self.size + len(rows))
+        self.data[self.size:self.size + len(rows)] = rows
+        self.size += len(rows)
+
+    def extend(self, trace, step_offset=0):
+        """Appends the steps of another trace, with their step numbers offset by step_offset."""
+        self.appendRows(trace.data[:trace.size])
+        self.data['step'][self.size - trace.size:self.size] += step_offset
+        self.num_peaks = trace.num_peaks
+        self.max_score = trace.max_score
+
+    def trim(self):
+        """Releases the unused preallocated rows."""
+        self.data = self.data[:self.size].copy()
+
+    def scores(self):
+        """Returns the score of the mixtures after each step."""
+        return(np.where(self['accepted'], self['new_score'], self['curr_score']))
+
+    def overlaps(self):
+        """Returns the number of overlaps of the mixtures after each step."""
+        return(np.where(self['accepted'], self['new_overlap'], self['curr_overlap']))
+
+    def rows(self):
+        """Yields the steps in the column order of the optimization results file."""
+        for row in self.data[:self.size].tolist():
+            if row[7]:
+                result = 'PASSED'
+            else:
+                result = 'FAILED'
+            yield (row[0], row[1], row[2], row[3], row[4], row[5], self.num_peaks, self.max_score, row[6], result)
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+seeding.py
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import numpy as np
+
+# The first element of the key of each random stream, so that the streams of different uses never overlap.
+INITIAL_MIXTURES = 0
+ITERATIONS = 1
+
+
+def streamSeed(params_object, *key):
+    """Returns a seed for the random stream identified by key, spawned from the seed in Parameters with a NumPy
+    SeedSequence. The streams of different keys are independent, and the seed of a stream does not depend on which
+    other streams are used or in what order, so the same stream is given to a group or iteration whether it is run
+    in a thread, in a worker process or one after another."""
+    words = np.random.SeedSequence(params_object.seed, spawn_key=key).generate_state(4)
+    return(sum(int(word) << (32 * k) for k, word in enumerate(words)))
+
+
+def groupIndex(groups, group):
+    """Returns the position of a group among the sorted group names, which identifies its random streams."""
+    return(sorted(groups).index(group))
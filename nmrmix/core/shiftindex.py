@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+shiftindex.py
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import math
+
+
+class ShiftIndex(object):
+    """An index of the active peak ranges of the compounds in a library. The chemical shift axis is divided into
+    buckets of bucket_width ppm, and each peak range is stored in every bucket that it spans, so that only the peaks
+    in the buckets spanned by a query need to be compared. The index is updated one compound at a time.
+
+    Ranges that touch are treated as overlapping, so that the compounds found are never fewer than those that either
+    scoring backend counts as overlapping, including zero width peaks at the same shift."""
+    def __init__(self, params_object, bucket_width=0.1):
+        self.params = params_object
+        self.bucket_width = bucket_width
+        self.peak_range = self.params.peak_range
+        self.buckets = {}
+        self.compound_versions = {}
+        self.compound_ranges = {}
+        self.partner_sets = {}
+        self.library_dict = None
+        self.peak_table = None
+
+    def __contains__(self, compound):
+        return(compound in self.compound_ranges)
+
+    def bucketSpan(self, low, high):
+        return(range(int(math.floor(low / self.bucket_width)), int(math.floor(high / self.bucket_width)) + 1))
+
+    def addCompound(self, compound, peaklist, version=None):
+        """Adds the peak ranges of a compound, with the same widths as Compound.generatePeakRanges. The version of
+        the peaks in the peak table is kept, so that the compound is only indexed again when its peaks change."""
+        peak_ranges = []
+        for peak in peaklist:
+            if len(peak) == 3:
+                peak_low = peak[0] - (peak[2] / 2)
+                peak_high = peak[0] + (peak[2] / 2)
+            else:
+                peak_low = peak[0] - (self.peak_range / 2)
+                peak_high = peak[0] + (self.peak_range / 2)
+            peak_ranges.append((peak_low, peak_high))
+            for bucket in self.bucketSpan(peak_low, peak_high):
+                if bucket not in self.buckets:
+                    self.buckets[bucket] = []
+                self.buckets[bucket].append((peak_low, peak_high, compound))
+        self.compound_versions[compound] = version
+        self.compound_ranges[compound] = peak_ranges
+        self.partner_sets = {}
+
+    def removeCompound(self, compound):
+        for peak_low, peak_high in self.compound_ranges.pop(compound, []):
+            for bucket in self.bucketSpan(peak_low, peak_high):
+                self.buckets[bucket].remove((peak_low, peak_high, compound))
+                if not self.buckets[bucket]:
+                    del self.buckets[bucket]
+        self.compound_versions.pop(compound, None)
+        self.partner_sets = {}
+
+    def update(self, library_object):
+        """Brings the index up to date with the mix_peaklist of each compound in the library. The library records the
+        compounds it adds and removes, and its peak table the slots whose peaks are written, so only those compounds,
+        and the compounds with peaks that use the overlap range if it has changed, are indexed again. Every compound
+        is checked when the library dictionary or its peak table has been replaced."""
+        library_dict = library_object.library
+        peak_table = library_object.peak_table
+        if library_dict is not self.library_dict or peak_table is not self.peak_table:
+            self.library_dict = library_dict
+            self.peak_table = peak_table
+            changed = set(self.compound_ranges) | set(library_dict)
+        else:
+            changed = set(library_object.changed_compounds)
+            for slot in peak_table.changed_slots:
+                changed.add(peak_table.compound_ids[slot])
+        library_object.changed_compounds.clear()
+        peak_table.changed_slots.clear()
+        range_changed = (self.peak_range != self.params.peak_range)
+        self.peak_range = self.params.peak_range
+        if range_changed:
+            changed.update(self.compound_ranges)
+        for compound in changed:
+            compound_object = library_dict.get(compound)
+            if compound_object is None:
+                self.removeCompound(compound)
+                continue
+            version = compound_object.peak_table.versions[compound_object.peak_slot]
+            if self.compound_versions.get(compound) == version:
+                if not range_changed or all(len(peak) == 3 for peak in compound_object.mix_peaklist):
+                    continue
+            self.removeCompound(compound)
+            self.addCompound(compound, compound_object.mix_peaklist, version)
+
+    def compoundsInRange(self, low, high):
+        """Returns the set of compounds with a peak range that overlaps or touches the range from low to high."""
+        compound_set = set()
+        for bucket in self.bucketSpan(low, high):
+            for peak_low, peak_high, compound in self.buckets.get(bucket, ()):
+                if (peak_low <= high) and (peak_high >= low):
+                    compound_set.add(compound)
+        return(compound_set)
+
+    def overlapPartners(self, compound):
+        """Returns the set of other compounds with a peak range that overlaps any peak range of the compound. These
+        are the only compounds that can add to its score."""
+        if compound not in self.partner_sets:
+            partner_set = set()
+            for peak_low, peak_high in self.compound_ranges.get(compound, []):
+                partner_set.update(self.compoundsInRange(peak_low, peak_high))
+            partner_set.discard(compound)
+            self.partner_sets[compound] = partner_set
+        return(self.partner_sets[compound])
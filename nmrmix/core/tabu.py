@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+tabu.py
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import numpy as np
+
+
+class MoveTable(object):
+    """The changes in score of moving each compound of a group into each of its unlocked mixtures, for the tabu
+    search. Row k of insert_scores holds the change in the score of mixture k when each compound is added to it, and
+    remove_scores holds the change in the score of the mixture of each compound when the compound is taken out of
+    it. A move either puts a compound into a mixture that is not full, or swaps two compounds of different mixtures,
+    so it only changes the rows of two mixtures, and the table is kept up to date by recalculating those rows.
+
+    With the pairwise scoring, the change of every move follows exactly from the table and the pairwise overlap
+    matrix. With the greedy scoring, a peak is only counted once however many compounds overlap it, so the table
+    gives an estimate of the change of a swap, and the moves with the best estimates are scored exactly with
+    Mixtures.calculateSwapDelta. The mixtures in mixtures_dict are changed in place by applyMove."""
+    def __init__(self, mixtures_object, mixtures_dict, mixnum_list):
+        self.mixtures = mixtures_object
+        self.params = mixtures_object.params
+        self.mixtures_dict = mixtures_dict
+        self.mixnum_list = list(mixnum_list)
+        self.compound_list = []
+        for mixnum in self.mixnum_list:
+            self.compound_list += list(self.mixtures_dict[mixnum])
+        self.compound_list.sort()
+        self.compound_index = dict((compound, i) for i, compound in enumerate(self.compound_list))
+        num_compounds = len(self.compound_list)
+        self.location = np.zeros(num_compounds, dtype=np.int64)
+        self.sizes = np.zeros(len(self.mixnum_list), dtype=np.int64)
+        for k, mixnum in enumerate(self.mixnum_list):
+            for compound in self.mixtures_dict[mixnum]:
+                self.location[self.compound_index[compound]] = k
+            self.sizes[k] = len(self.mixtures_dict[mixnum])
+        self.insert_scores = np.zeros((len(self.mixnum_list), num_compounds))
+        self.remove_scores = np.zeros(num_compounds)
+        self.pair_scores = None
+        self.partners = []
+        if self.params.scoring_mode == 'pairwise':
+            if self.mixtures.overlap_scores is None:
+                self.mixtures.calculateOverlapMatrix()
+            index_list = [self.mixtures.overlap_index[compound] for compound in self.compound_list]
+            block = self.mixtures.overlap_scores[np.ix_(index_list, index_list)]
+            self.pair_scores = block + block.T
+        else:
+            for compound in self.compound_list:
+                pair_masks = self.mixtures.calculatePairMasks(compound)
+                self.partners.append([self.compound_index[partner] for partner in pair_masks
+                                      if partner in self.compound_index])
+        for k in range(len(self.mixnum_list)):
+            self.updateRow(k)
+
+    def updateRow(self, k):
+        """Recalculates the changes in score of adding each compound to mixture k, and of removing each of its
+        members."""
+        mixture_list = self.mixtures_dict[self.mixnum_list[k]]
+        member_index = [self.compound_index[compound] for compound in mixture_list]
+        if self.pair_scores is not None:
+            self.insert_scores[k] = self.pair_scores[member_index].sum(axis=0)
+            for i in member_index:
+                self.remove_scores[i] = -self.pair_scores[i, member_index].sum()
+            return
+        self.insert_scores[k] = 0.0
+        candidates = set()
+        for i in member_index:
+            candidates.update(self.partners[i])
+        for j in candidates:
+            if self.location[j] != k:
+                self.insert_scores[k, j] = self.mixtures.calculateSwapDelta(mixture_list, "Blank",
+                                                                            self.compound_list[j])[0]
+        for i in member_index:
+            self.remove_scores[i] = self.mixtures.calculateSwapDelta(mixture_list, self.compound_list[i],
+                                                                     "Blank")[0]
+
+    def candidateMoves(self, num_candidates, tabu_until=None, step=0, aspiration=None):
+        """Returns up to num_candidates moves with the best estimated changes in score, best first, as a list of
+        (estimate, compound, other) tuples. A move is a swap of two compounds when other is a compound index, or a
+        move of the compound into mixture -other-1 when other is negative. When tabu_until is given, the moves that
+        return a compound to a mixture it left before that step are skipped, unless their estimate is below
+        aspiration."""
+        num_compounds = len(self.compound_list)
+        location = self.location
+        cross = self.insert_scores[location].T
+        swap_scores = self.remove_scores[:, None] + self.remove_scores[None, :] + cross + cross.T
+        if self.pair_scores is not None:
+            swap_scores -= 2 * self.pair_scores
+        invalid = (location[:, None] == location[None, :]) | np.tri(num_compounds, dtype=bool)
+        move_scores = self.remove_scores[:, None] + self.insert_scores.T
+        move_invalid = ((location[:, None] == np.arange(len(self.mixnum_list))[None, :]) |
+                        (self.sizes >= self.params.mix_size)[None, :])
+        if tabu_until is not None:
+            swap_tabu = (tabu_until[:, location] > step)
+            swap_tabu |= swap_tabu.T
+            move_tabu = tabu_until > step
+            if aspiration is not None:
+                swap_tabu &= swap_scores >= aspiration
+                move_tabu &= move_scores >= aspiration
+            invalid |= swap_tabu
+            move_invalid |= move_tabu
+        estimates = np.concatenate((np.where(invalid, np.inf, swap_scores).ravel(),
+                                    np.where(move_invalid, np.inf, move_scores).ravel()))
+        valid = np.flatnonzero(np.isfinite(estimates))
+        if len(valid) > num_candidates:
+            valid = valid[np.argpartition(estimates[valid], num_candidates - 1)[:num_candidates]]
+        valid = valid[np.lexsort((valid, estimates[valid]))]
+        moves = []
+        for position in valid.tolist():
+            if position < num_compounds * num_compounds:
+                i, j = divmod(position, num_compounds)
+            else:
+                i, k = divmod(position - num_compounds * num_compounds, len(self.mixnum_list))
+                j = -k - 1
+            moves.append((float(estimates[position]), i, j))
+        return(moves)
+
+    def moveMixtures(self, i, j):
+        """Returns the mixture numbers that a move takes the compound from and puts it into, and the compound that
+        it takes from the second mixture or "Blank"."""
+        from_mixnum = self.mixnum_list[self.location[i]]
+        if j < 0:
+            return(from_mixnum, self.mixnum_list[-j - 1], "Blank")
+        return(from_mixnum, self.mixnum_list[self.location[j]], self.compound_list[j])
+
+    def moveDelta(self, i, j):
+        """Returns the exact change in score and overlap count of a move."""
+        compound = self.compound_list[i]
+        from_mixnum, to_mixnum, other = self.moveMixtures(i, j)
+        from_score, from_overlaps = self.mixtures.calculateSwapDelta(self.mixtures_dict[from_mixnum], compound, other)
+        to_score, to_overlaps = self.mixtures.calculateSwapDelta(self.mixtures_dict[to_mixnum], other, compound)
+        return(from_score + to_score, from_overlaps + to_overlaps)
+
+    def applyMove(self, i, j):
+        """Makes a move in the mixtures and updates the rows of the two mixtures that it changes. Returns the
+        positions of the two mixtures in mixnum_list."""
+        compound = self.compound_list[i]
+        from_mixnum, to_mixnum, other = self.moveMixtures(i, j)
+        from_k = self.location[i]
+        to_k = self.mixnum_list.index(to_mixnum)
+        self.mixtures_dict[from_mixnum] = [member for member in self.mixtures_dict[from_mixnum] if member != compound]
+        self.mixtures_dict[to_mixnum] = [member for member in self.mixtures_dict[to_mixnum] if member != other]
+        self.mixtures_dict[to_mixnum].append(compound)
+        self.location[i] = to_k
+        if other != "Blank":
+            self.mixtures_dict[from_mixnum].append(other)
+            self.location[j] = from_k
+        else:
+            self.sizes[from_k] -= 1
+            self.sizes[to_k] += 1
+        self.mixtures_dict[from_mixnum].sort()
+        self.mixtures_dict[to_mixnum].sort()
+        self.updateRow(from_k)
+        self.updateRow(to_k)
+        return(from_k, to_k)
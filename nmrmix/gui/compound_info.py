@@ -750,12 +750,7 @@ class PeakWindow(QDialog):
     def acceptRegion(self):
         if self.checkTableValues():
             if self.matched_peak:
-                if self.matched_peak in self.compound.mix_peaklist:
-                    self.compound.mix_peaklist.remove(self.matched_peak)
-                elif self.matched_peak in self.compound.ignored_peaklist:
-                    self.compound.ignored_peaklist.remove(self.matched_peak)
-                elif self.matched_peak in self.compound.removed_peaklist:
-                    self.compound.removed_peaklist.remove(self.matched_peak)
+                self.compound.discardPeak(self.matched_peak)
             QDialog.accept(self)
 
     def checkTableValues(self):
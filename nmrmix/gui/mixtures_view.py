@@ -27,6 +27,7 @@ else:
 import copy
 
 from core import mixtures
+from core import checkpoint
 from gui import mixture_spectra, compound_info, optimize, move_compounds, compounds_ranked
 
 class Window(QDialog):
@@ -165,6 +166,19 @@ class Window(QDialog):
             self.useintensityCheckBox.setCheckState(Qt.Checked)
         else:
             self.useintensityCheckBox.setCheckState(Qt.Unchecked)
+        self.scoringmodeLabel = QLabel("Scoring Mode")
+        self.scoringmodeLabel.setAlignment(Qt.AlignCenter)
+        self.scoringmodeLabel.setToolTip("Greedy counts each overlapped peak once. Pairwise counts a peak once for\n"
+                                         "each compound overlapping it, which allows much faster optimization.")
+        self.scoringmodeComboBox = QComboBox()
+        self.scoringmodeComboBox.setEditable(True)
+        self.scoringmodeComboBox.lineEdit().setReadOnly(True)
+        self.scoringmodeComboBox.lineEdit().setAlignment(Qt.AlignCenter)
+        self.scoringmodeComboBox.addItems(['Greedy', 'Pairwise'])
+        if self.params.scoring_mode == "pairwise":
+            self.scoringmodeComboBox.setCurrentIndex(1)
+        else:
+            self.scoringmodeComboBox.setCurrentIndex(0)
 
     def initMixParams(self):
         self.startnumLabel = QLabel("Starting Mixture Number")
@@ -194,11 +208,13 @@ class Window(QDialog):
         self.coolingComboBox.setEditable(True)
         self.coolingComboBox.lineEdit().setReadOnly(True)
         self.coolingComboBox.lineEdit().setAlignment(Qt.AlignCenter)
-        self.coolingComboBox.addItems(['Exponential', 'Linear'])
+        self.coolingComboBox.addItems(['Exponential', 'Linear', 'Adaptive'])
         if self.params.cooling == "exponential":
             self.coolingComboBox.setCurrentIndex(0)
         elif self.params.cooling == "linear":
             self.coolingComboBox.setCurrentIndex(1)
+        elif self.params.cooling == "adaptive":
+            self.coolingComboBox.setCurrentIndex(2)
         self.starttempLabel = QLabel("Start Temp")
         self.starttempLabel.setAlignment(Qt.AlignCenter)
         self.starttempSpinBox = QSpinBox()
@@ -255,6 +271,15 @@ class Window(QDialog):
             self.randomizeCheckBox.setCheckState(Qt.Checked)
         else:
             self.randomizeCheckBox.setCheckState(Qt.Unchecked)
+        self.greedyLabel = QLabel("Greedy Initial Mixtures")
+        self.greedyLabel.setAlignment(Qt.AlignCenter)
+        self.greedyLabel.setToolTip("Places the most overlapped compounds first, where they add the least overlap.")
+        self.greedyCheckBox = QCheckBox()
+        self.greedyCheckBox.setToolTip("Places the most overlapped compounds first, where they add the least overlap.")
+        if self.params.greedy_initial:
+            self.greedyCheckBox.setCheckState(Qt.Checked)
+        else:
+            self.greedyCheckBox.setCheckState(Qt.Unchecked)
         self.resetLabel = QLabel("Reset Mixtures to see changes")
         self.resetLabel.setStyleSheet("QLabel {color: red;}")
         self.resetLabel.setAlignment(Qt.AlignCenter)
@@ -277,11 +302,13 @@ class Window(QDialog):
         self.refinecoolingComboBox.setEditable(True)
         self.refinecoolingComboBox.lineEdit().setReadOnly(True)
         self.refinecoolingComboBox.lineEdit().setAlignment(Qt.AlignCenter)
-        self.refinecoolingComboBox.addItems(['Exponential', 'Linear'])
+        self.refinecoolingComboBox.addItems(['Exponential', 'Linear', 'Adaptive'])
         if self.params.refine_cooling == "exponential":
             self.refinecoolingComboBox.setCurrentIndex(0)
         elif self.params.refine_cooling == "linear":
             self.refinecoolingComboBox.setCurrentIndex(1)
+        elif self.params.refine_cooling == "adaptive":
+            self.refinecoolingComboBox.setCurrentIndex(2)
         self.refinecoolingComboBox.setDisabled(disabled)
         self.refinestarttempLabel = QLabel("Start Temp")
         self.refinestarttempLabel.setAlignment(Qt.AlignCenter)
@@ -426,19 +453,21 @@ class Window(QDialog):
         checkbox1Layout = QHBoxLayout()
         checkbox1Layout.addWidget(self.useintensityCheckBox)
         scoreLayout.addLayout(checkbox1Layout, 24, 1, Qt.AlignCenter)
-        scoreLayout.addItem(QSpacerItem(0, 8), 25, 0)
-        scoreLayout.addWidget(self.scoreHLine, 26, 0, 1, 2)
-        scoreLayout.addItem(QSpacerItem(0, 8), 27, 0)
-        scoreLayout.addWidget(self.useautosaveLabel, 28, 0)
+        scoreLayout.addWidget(self.scoringmodeLabel, 25, 0)
+        scoreLayout.addWidget(self.scoringmodeComboBox, 25, 1)
+        scoreLayout.addItem(QSpacerItem(0, 8), 26, 0)
+        scoreLayout.addWidget(self.scoreHLine, 27, 0, 1, 2)
+        scoreLayout.addItem(QSpacerItem(0, 8), 28, 0)
+        scoreLayout.addWidget(self.useautosaveLabel, 29, 0)
         checkbox2Layout = QHBoxLayout()
         checkbox2Layout.addWidget(self.useautosaveCheckBox)
-        scoreLayout.addLayout(checkbox2Layout, 28, 1, Qt.AlignCenter)
-        scoreLayout.addItem(QSpacerItem(0, 0, QSizePolicy.MinimumExpanding, QSizePolicy.MinimumExpanding), 29, 0)
-        scoreLayout.addWidget(self.searchLineEdit, 30, 0)
-        scoreLayout.addWidget(self.searchButton, 30, 1)
-        scoreLayout.addWidget(self.searchResults, 31, 0, 1, 2)
+        scoreLayout.addLayout(checkbox2Layout, 29, 1, Qt.AlignCenter)
+        scoreLayout.addItem(QSpacerItem(0, 0, QSizePolicy.MinimumExpanding, QSizePolicy.MinimumExpanding), 30, 0)
+        scoreLayout.addWidget(self.searchLineEdit, 31, 0)
+        scoreLayout.addWidget(self.searchButton, 31, 1)
+        scoreLayout.addWidget(self.searchResults, 32, 0, 1, 2)
         #scoreLayout.addWidget(self.showmixturehist, 29, 0, 1, 2)
-        scoreLayout.addWidget(self.showrankedcompounds, 32, 0, 1, 2)
+        scoreLayout.addWidget(self.showrankedcompounds, 33, 0, 1, 2)
         self.paramtab1.setLayout(scoreLayout)
         self.paramTabs.addTab(self.paramtab1, "Scoring")
 
@@ -469,8 +498,12 @@ class Window(QDialog):
         checkbox4Layout = QHBoxLayout()
         checkbox4Layout.addWidget(self.randomizeCheckBox)
         mixLayout.addLayout(checkbox4Layout, 12, 1, Qt.AlignCenter)
-        mixLayout.addItem(QSpacerItem(0, 0, QSizePolicy.MinimumExpanding, QSizePolicy.MinimumExpanding), 13, 0)
-        mixLayout.addWidget(self.resetLabel, 14, 0, 1, 2)
+        mixLayout.addWidget(self.greedyLabel, 13, 0)
+        checkbox9Layout = QHBoxLayout()
+        checkbox9Layout.addWidget(self.greedyCheckBox)
+        mixLayout.addLayout(checkbox9Layout, 13, 1, Qt.AlignCenter)
+        mixLayout.addItem(QSpacerItem(0, 0, QSizePolicy.MinimumExpanding, QSizePolicy.MinimumExpanding), 14, 0)
+        mixLayout.addWidget(self.resetLabel, 15, 0, 1, 2)
         self.paramtab2.setLayout(mixLayout)
         self.paramTabs.addTab(self.paramtab2, "Optimizing")
 
@@ -525,6 +558,7 @@ class Window(QDialog):
         self.rangeSpinBox.valueChanged.connect(self.updateTable)
         self.scorescaleSpinBox.valueChanged.connect(self.updateTable)
         self.useintensityCheckBox.clicked.connect(self.updateTable)
+        self.scoringmodeComboBox.currentTextChanged.connect(self.updateTable)
         self.useautosaveCheckBox.clicked.connect(self.updateAutosave)
 
         self.startnumSpinBox.valueChanged.connect(self.updateMixing)
@@ -538,6 +572,7 @@ class Window(QDialog):
         self.usegroupCheckBox.clicked.connect(self.updateGroupMixing)
         self.iterationsSpinBox.valueChanged.connect(self.updateMixing)
         self.randomizeCheckBox.clicked.connect(self.updateMixing)
+        self.greedyCheckBox.clicked.connect(self.updateMixing)
 
         self.userefineCheckBox.clicked.connect(self.updateRefine)
         self.refinecoolingComboBox.currentTextChanged.connect(self.updateRefine)
@@ -622,7 +657,7 @@ class Window(QDialog):
                 self.mixtable.setCellWidget(row, i+5, self.compoundButtons[compound_id])
                 self.compoundButtons[compound_id].leftClicked.connect(self.handleCompoundButtonLeft)
                 self.compoundButtons[compound_id].rightClicked.connect(self.handleCompoundButtonRight)
-            mixture_score = "%0.1f" % self.mixtures.mixture_scores[tuple(self.mixtures.mixtures[mixture])]
+            mixture_score = "%0.1f" % self.mixtures.getMixtureScore(mixture)
             score = QTableWidgetItem()
             score.setTextAlignment(Qt.AlignCenter)
             score.setData(Qt.DisplayRole, float(mixture_score))
@@ -682,6 +717,10 @@ class Window(QDialog):
             self.params.useIntensity()
         else:
             self.params.noIntensity()
+        if self.scoringmodeComboBox.currentText() == 'Pairwise':
+            self.params.usePairwiseScoring()
+        else:
+            self.params.useGreedyScoring()
         self.mixtures.calculateTotalScore(self.mixtures.mixtures)
 
     def updateAutosave(self):
@@ -720,6 +759,8 @@ class Window(QDialog):
             self.params.useExponentialCooling()
         elif cooling == 'Linear':
             self.params.useLinearCooling()
+        elif cooling == 'Adaptive':
+            self.params.useAdaptiveCooling()
 
         iterations = self.iterationsSpinBox.value()
         if int(iterations) != self.params.iterations:
@@ -731,6 +772,10 @@ class Window(QDialog):
         else:
             self.params.randomize_initial = False
 
+        if self.greedyCheckBox.isChecked() != self.params.greedy_initial:
+            self.params.greedy_initial = self.greedyCheckBox.isChecked()
+            self.need_reset = True
+
         if self.need_reset:
             self.resetLabel.show()
 
@@ -768,6 +813,8 @@ class Window(QDialog):
             self.params.useRefineExponentialCooling()
         elif cooling == 'Linear':
             self.params.useRefineLinearCooling()
+        elif cooling == 'Adaptive':
+            self.params.useRefineAdaptiveCooling()
 
     def updateGroupMixing(self):
         if self.usegroupCheckBox.isChecked():
@@ -953,6 +1000,14 @@ class Window(QDialog):
 
     def optimizeMixtures(self):
         self.updateLockMixtures()
+        checkpoint_object = checkpoint.Checkpoint(self.params)
+        if checkpoint_object.exists():
+            resume_msg = ("An unfinished optimization was found in the working directory.\n"
+                          "Do you want to resume it? Its parameters and starting mixtures will be restored.")
+            reply = QMessageBox.question(self, 'Resume Optimization', resume_msg, QMessageBox.No, QMessageBox.Yes)
+            if reply == QMessageBox.Yes:
+                self.resumeOptimization(checkpoint_object)
+                return
         optimize_msg = "Are you sure you want to optimize mixtures?\nAny unlocked mixtures will be changed."
         reply = QMessageBox.question(self, 'Optimize Mixtures', optimize_msg, QMessageBox.No, QMessageBox.Yes)
         if reply == QMessageBox.Yes:
@@ -960,15 +1015,85 @@ class Window(QDialog):
                 self.mixtures.resetScores()
                 self.mixtures.generateGroupLists()
                 self.mixtures.generateInitialMixtures()
-            optimize_win = optimize.Window(self.params, self.library, self.mixtures)
-            if optimize_win.exec_():
-                self.updateScoring()
-                self.updateStats()
-                self.setTable()
-                if self.params.autosave:
-                    self.saveResults(optimize_time=self.mixtures.optimize_time)
+            self.runOptimization()
         # TODO: Check for value errors
 
+    def resumeOptimization(self, checkpoint_object):
+        """Restores the parameters and starting mixtures of an unfinished optimization from its checkpoint, and
+        continues it."""
+        success, message = checkpoint_object.restoreParams(self.params)
+        if success:
+            success, message = checkpoint_object.restoreMixtures(self.mixtures)
+        if not success:
+            QMessageBox.critical(self, 'Optimization NOT Resumed', message)
+            return
+        self.setParamWidgets()
+        self.mixtures.resetScores()
+        self.need_reset = False
+        self.resetLabel.hide()
+        self.setTable()
+        self.runOptimization(checkpoint_object)
+
+    def runOptimization(self, checkpoint_object=None):
+        optimize_win = optimize.Window(self.params, self.library, self.mixtures, checkpoint_object)
+        if optimize_win.exec_():
+            self.updateScoring()
+            self.updateStats()
+            self.setTable()
+            if self.params.autosave:
+                self.saveResults(optimize_time=self.mixtures.optimize_time)
+
+    def setParamWidgets(self):
+        """Shows the values of the scoring, mixing and refinement parameters, without updating them again."""
+        widgets = [self.rangeSpinBox, self.scorescaleSpinBox, self.useintensityCheckBox, self.scoringmodeComboBox,
+                   self.startnumSpinBox, self.mixsizeSpinBox, self.extramixSpinBox, self.coolingComboBox,
+                   self.starttempSpinBox, self.finaltempSpinbox, self.maxstepsSpinBox, self.mixrateSpinBox,
+                   self.usegroupCheckBox, self.iterationsSpinBox, self.randomizeCheckBox, self.greedyCheckBox,
+                   self.userefineCheckBox, self.refinecoolingComboBox, self.refinestarttempSpinBox,
+                   self.refinefinaltempSpinbox, self.refinemaxstepsSpinBox, self.refinemixrateSpinBox]
+        for widget in widgets:
+            widget.blockSignals(True)
+        self.rangeSpinBox.setValue(self.params.peak_range)
+        self.scorescaleSpinBox.setValue(self.params.score_scale)
+        self.useintensityCheckBox.setChecked(self.params.use_intensity)
+        if self.params.scoring_mode == "pairwise":
+            self.scoringmodeComboBox.setCurrentIndex(1)
+        else:
+            self.scoringmodeComboBox.setCurrentIndex(0)
+        self.startnumSpinBox.setValue(self.params.start_num)
+        self.mixsizeSpinBox.setValue(self.params.mix_size)
+        self.extramixSpinBox.setValue(self.params.extra_mixtures)
+        if self.params.cooling == "linear":
+            self.coolingComboBox.setCurrentIndex(1)
+        elif self.params.cooling == "adaptive":
+            self.coolingComboBox.setCurrentIndex(2)
+        else:
+            self.coolingComboBox.setCurrentIndex(0)
+        self.starttempSpinBox.setRange(self.params.final_temp+1, 100000)
+        self.finaltempSpinbox.setRange(1, self.params.start_temp-1)
+        self.starttempSpinBox.setValue(self.params.start_temp)
+        self.finaltempSpinbox.setValue(self.params.final_temp)
+        self.maxstepsSpinBox.setValue(self.params.max_steps)
+        self.mixrateSpinBox.setRange(2, len(self.mixtures.mixtures))
+        self.mixrateSpinBox.setValue(self.params.mix_rate)
+        self.usegroupCheckBox.setChecked(self.params.use_group)
+        self.iterationsSpinBox.setValue(self.params.iterations)
+        self.randomizeCheckBox.setChecked(self.params.randomize_initial)
+        self.greedyCheckBox.setChecked(self.params.greedy_initial)
+        self.userefineCheckBox.setChecked(self.params.use_refine)
+        if self.params.refine_cooling == "linear":
+            self.refinecoolingComboBox.setCurrentIndex(1)
+        elif self.params.refine_cooling == "adaptive":
+            self.refinecoolingComboBox.setCurrentIndex(2)
+        else:
+            self.refinecoolingComboBox.setCurrentIndex(0)
+        self.refinestarttempSpinBox.setValue(self.params.refine_start_temp)
+        self.refinefinaltempSpinbox.setValue(self.params.refine_final_temp)
+        self.refinemaxstepsSpinBox.setValue(self.params.refine_max_steps)
+        self.refinemixrateSpinBox.setValue(self.params.refine_mix_rate)
+        for widget in widgets:
+            widget.blockSignals(False)
+
     def openCompoundWindow(self, compound_id, mixture_id):
         compound_object = self.library.library[compound_id]
         compound_win = compound_info.Window(self.params, compound_object, self.library, editable=False)
@@ -11,21 +11,22 @@ from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 
-import math
-import random
 import time
 import datetime
 import copy
 
+from core import anneal
+from core import checkpoint
 from gui import optimize_view
 
 
 class Window(QDialog):
-    def __init__(self, params_object, library_object, mixture_object, parent=None):
+    def __init__(self, params_object, library_object, mixture_object, checkpoint_object=None, parent=None):
         QDialog.__init__(self, parent)
         self.params = params_object
         self.library = library_object
         self.mixtures = mixture_object
+        self.checkpoint = checkpoint_object
         self.mixtures.directory = []
         self.setWindowTitle("NMRmix: Optimizing Mixtures")
         self.createWidgets()
@@ -72,6 +73,9 @@ class Window(QDialog):
         self.durationLabel = QLabel()
         self.durationLabel.setAlignment(Qt.AlignCenter)
         vbox.addWidget(self.durationLabel)
+        self.cacheLabel = QLabel()
+        self.cacheLabel.setAlignment(Qt.AlignCenter)
+        vbox.addWidget(self.cacheLabel)
 
         vbox.addItem(QSpacerItem(0, 15, QSizePolicy.Maximum))
 
@@ -108,18 +112,41 @@ class Window(QDialog):
         self.group_count = len(groups)
         self.finished_threads = 0
         self.mixtures.calculateTotalScore(self.mixtures.mixtures)
+        self.mixtures.score_cache.resetStats()
         self.mixtures.anneal_results = {}
         self.mixtures.curr_mixtures = copy.deepcopy(self.mixtures.mixtures)
         for locked in self.mixtures.mixtures_lock:
             del self.mixtures.curr_mixtures[locked]
         self.thread_pool = {}
+        self.process_pool = None
+        self.stop_event = None
+        if self.checkpoint is not None and self.checkpoint.seeds is not None:
+            seeds = self.checkpoint.seeds
+        else:
+            seeds = anneal.groupSeeds(self.params, groups)
+            if self.params.use_checkpoints:
+                self.checkpoint = checkpoint.Checkpoint(self.params)
+                try:
+                    self.checkpoint.saveRun(self.params, self.mixtures, seeds)
+                except Exception as e:
+                    print(e)
+                    self.checkpoint = None
+        if self.params.anneal_backend == 'processes':
+            self.process_pool, queues, self.stop_event = anneal.createPool(self.params, self.library, self.mixtures,
+                                                                           groups)
         self.mixtures.anneal_scores = {}
         self.start_time = time.time()
         self.mixtures.optimize_time = datetime.datetime.fromtimestamp(self.start_time).strftime('%Y%m%d_%H%M%S')
         self.mixtures.optimize_folder =  self.mixtures.optimize_time + "_Optimize"
         for group in groups:
             mixnum_list = list(self.mixtures.group_mixnum[group])
-            self.thread_pool[group] = AnnealThread(self.params, self.library, self.mixtures, group, mixnum_list)
+            if self.process_pool is not None:
+                self.thread_pool[group] = ProcessAnnealThread(self.params, self.library, self.mixtures, group,
+                                                              mixnum_list, seeds[group], self.checkpoint,
+                                                              self.process_pool, queues[group], self.stop_event)
+            else:
+                self.thread_pool[group] = AnnealThread(self.params, self.library, self.mixtures, group, mixnum_list,
+                                                       seeds[group], self.checkpoint)
             self.thread_pool[group].newIteration.connect(self.updateLabels)
             self.thread_pool[group].newStep.connect(self.updateProgressBars)
             self.thread_pool[group].startRefining.connect(self.updateLabels)
@@ -140,6 +167,12 @@ class Window(QDialog):
         self.progressBars[group].setValue(value)
         self.progressBars[group].setMaximum(max_steps)
         self.progressBars[group].setFormat('%d / %d  (%0.1f)' % (value, max_steps, score))
+        self.updateCacheLabel()
+
+    def updateCacheLabel(self):
+        cache = self.mixtures.score_cache
+        self.cacheLabel.setText("Score Cache: %d hits, %d misses (%0.1f%% hit rate), %d evictions"
+                                % (cache.hits, cache.misses, cache.hitRate(), cache.evictions))
 
     def updateOkButton(self):
         self.finished_threads += 1
@@ -149,6 +182,11 @@ class Window(QDialog):
             h, m = divmod(m, 60)
             self.mixtures.optimize_duration = "%d hrs, %02d mins, %02d secs" % (h, m, s)
             self.durationLabel.setText("Optimization Time: %s" % self.mixtures.optimize_duration)
+            if self.process_pool is not None:
+                self.process_pool.close()
+            if self.checkpoint is not None:
+                self.checkpoint.remove()
+            self.updateCacheLabel()
             self.okButton.setDisabled(False)
             self.okButton.setStyleSheet("QPushButton{color: green; font-weight: bold;}")
             self.optimizeResults.setDisabled(False)
@@ -168,8 +206,12 @@ class Window(QDialog):
         widget.setPalette(palette)
 
     def stopOptimization(self):
+        # The threads of the process backend wait for the stopped tasks to be checkpointed, so the pool is only
+        # terminated once every thread has stopped.
         for group in self.mixtures.group_mixnum:
             self.thread_pool[group].stop()
+        if self.process_pool is not None:
+            self.process_pool.terminate()
         QDialog.reject(self)
 
     def acceptMixtures(self):
@@ -182,7 +224,8 @@ class AnnealThread(QThread):
     startRefining = pyqtSignal(str, str, int)
     doneThread = pyqtSignal()
 
-    def __init__(self, params_object, library_object, mixtures_object, group, mixnum_list, parent=None):
+    def __init__(self, params_object, library_object, mixtures_object, group, mixnum_list, seeds, checkpoint_object,
+                 parent=None):
         QThread.__init__(self, parent)
         self.params = params_object
         self.library = library_object
@@ -191,150 +234,154 @@ class AnnealThread(QThread):
         self.mixnum_list = list(mixnum_list)
         self.mixtures.anneal_scores[self.group] = {}
         self.mixtures.refine_scores[self.group] = {}
+        self.annealer = anneal.Annealer(self.params, self.mixtures, self.group, self.mixnum_list)
+        self.annealer.seeds = seeds
+        self.annealer.checkpoint = checkpoint_object
+        self.annealer.newIteration = self.newIteration.emit
+        self.annealer.startRefining = self.startRefining.emit
+        self.annealer.newStep = self.newStep.emit
         self.exiting = False
 
     def stop(self):
         self.exiting = True
+        self.annealer.stop()
         self.wait()
         self.exit()
 
     def run(self):
         time.sleep(0.5)
-        i = 0
-        while not self.exiting and i < self.params.iterations:
-            self.newIteration.emit("Optimizing", self.group, i)
-            if self.params.randomize_initial:
-                init_mixtures = self.randomizeMixtures()
-            else:
-                init_mixtures = {}
-                for mixnum in self.mixnum_list:
-                    init_mixtures[mixnum] = list(self.mixtures.mixtures[mixnum])
-            curr_score, mixtures, scores = self.annealMixtures(init_mixtures)
-            if self.params.use_refine:
-                self.startRefining.emit("Refining", self.group, i)
-                curr_score, mixtures, refine_scores = self.annealMixtures(mixtures, refining=True)
-                self.mixtures.refine_scores[self.group][i] = list(refine_scores)
-            self.mixtures.anneal_scores[self.group][i] = list(scores)
-            if i == 0:
-                self.mixtures.curr_mixtures.update(mixtures)
-                previous_score = curr_score
-            else:
-                if curr_score <= previous_score:
-                    self.mixtures.curr_mixtures.update(mixtures)
-            i += 1
+        self.annealer.run()
+        self.mixtures.anneal_scores[self.group].update(self.annealer.anneal_scores)
+        self.mixtures.refine_scores[self.group].update(self.annealer.refine_scores)
+        self.mixtures.curr_mixtures.update(self.annealer.best_mixtures)
         self.doneThread.emit()
 
-    def randomizeMixtures(self):
-        compound_list = []
-        mixtures = {}
-        for mixnum in self.mixnum_list:
-            compounds = list(self.mixtures.mixtures[mixnum])
-            for compound in compounds:
-                compound_list.append(compound)
-        random.shuffle(compound_list)
-        for mixnum in self.mixnum_list:
-            mixtures[mixnum] = []
-            for mix_size in range(self.params.mix_size):
-                if len(compound_list) != 0:
-                    compound = compound_list.pop()
-                    mixtures[mixnum].append(compound)
-            mixtures[mixnum].sort()
-        return(mixtures)
 
+class ProcessAnnealThread(QThread):
+    """Anneals the mixtures of a group in the worker processes of the process pool, with each iteration in its own
+    process and with its own random seed. The progress of the earliest unfinished iteration is relayed from the
+    queue of the group as the same signals as AnnealThread, and the best iteration is kept once they have all
+    finished. With parallel tempering, the iterations are run one after another, and the segments of the replicas
+    are run in parallel instead. Stopping the thread sets the stop event of the pool, and the thread finishes once
+    the iterations have been checkpointed."""
+    newIteration = pyqtSignal(str, str, int)
+    newStep = pyqtSignal(str, int, float, bool)
+    startRefining = pyqtSignal(str, str, int)
+    doneThread = pyqtSignal()
 
-    def annealMixtures(self, mixtures_dict, refining=False):
-        mixtures = copy.deepcopy(mixtures_dict)
-        if refining:
-            cooling = self.params.refine_cooling
-            max_steps = self.params.refine_max_steps
-            mix_rate = self.params.mix_rate
-        else:
-            cooling = self.params.cooling
-            max_steps = self.params.max_steps
-            mix_rate = self.params.refine_mix_rate
-        scores = []
-        max_score = mix_rate * self.params.score_scale
-        #delta_scores = []
-        curr_score, curr_overlap = self.mixtures.calculateTotalScore(mixtures)
-        unlocked_list = list(mixtures.keys())
-        for mixture in self.mixtures.mixtures_lock:
-            if mixture in unlocked_list:
-                unlocked_list.remove(mixture)
-        num_peaks = 0
-        for mixture in mixtures:
-            for compound in mixtures[mixture]:
-                num_peaks += self.mixtures.compound_scores[compound][2]
-        step = 1
-        if cooling == 'exponential':
-            cooling_schedule = self.mixtures.exponentialCooling(refining)
+    def __init__(self, params_object, library_object, mixtures_object, group, mixnum_list, seeds, checkpoint_object,
+                 process_pool, queue, stop_event, parent=None):
+        QThread.__init__(self, parent)
+        self.params = params_object
+        self.library = library_object
+        self.mixtures = mixtures_object
+        self.group = group
+        self.mixnum_list = list(mixnum_list)
+        self.process_pool = process_pool
+        self.queue = queue
+        self.stop_event = stop_event
+        self.mixtures.anneal_scores[self.group] = {}
+        self.mixtures.refine_scores[self.group] = {}
+        self.annealer = anneal.Annealer(self.params, self.mixtures, self.group, self.mixnum_list)
+        self.annealer.seeds = seeds
+        self.annealer.checkpoint = checkpoint_object
+        self.exiting = False
+
+    def stop(self):
+        self.exiting = True
+        self.stop_event.set()
+        self.annealer.stop()
+        self.wait()
+        self.exit()
+
+    def run(self):
+        if self.params.optimizer == 'tempering':
+            self.runTempering()
         else:
-            cooling_schedule = self.mixtures.linearCooling(refining)
-        for current_temp in cooling_schedule:
-            if (step % self.params.print_step_size) == 0:
-                self.newStep.emit(self.group, step, curr_score, refining)
-            if len(unlocked_list) >= 2:
-                new_mixtures, diff_score, diff_overlaps  = self.mixtures.mixMixtures(mixtures, unlocked_list, refining=refining)
-            else:
-                break
-                # new_mixtures = mixtures
-            # new_score, new_overlap = self.mixtures.calculateTotalScore(new_mixtures)
-
-            new_score = curr_score + diff_score
-            # print(new_score, curr_score, diff_score)
-            new_overlap = curr_overlap + diff_overlaps
-            # delta_max = score_diff
-            # delta_scores.append(score_diff)
-            # if step == 1:
-                # delta_median = score_diff
-                # delta_max = score_diff
-            # else:
-            #     delta_median = self.mixtures.medianDeltaScore(delta_scores)
-
-            if new_score <= 0.0001:
-                score_step = (step, current_temp, curr_score, new_score, curr_overlap, new_overlap,
-                              num_peaks, max_score, 1, 'PASSED')
-                scores.append(score_step)
-                mixtures.update(new_mixtures)
-                curr_score = new_score
-                curr_overlap = new_overlap
-                self.newStep.emit(self.group, step, abs(curr_score), refining)
-                break
-            elif new_score <= curr_score:
-                score_step = (step, current_temp, curr_score, new_score, curr_overlap, new_overlap,
-                              num_peaks, max_score, 1, 'PASSED')
-                scores.append(score_step)
-                mixtures.update(new_mixtures)
-                curr_score = new_score
-                curr_overlap = new_overlap
+            self.runIterations()
+
+    def runTempering(self):
+        self.annealer.newIteration = self.newIteration.emit
+        self.annealer.startRefining = self.startRefining.emit
+        self.annealer.newStep = self.newStep.emit
+        self.annealer.segment_runner = self.runSegments
+        self.annealer.run()
+        if self.stop_event.is_set():
+            return
+        self.mixtures.anneal_scores[self.group].update(self.annealer.anneal_scores)
+        self.mixtures.refine_scores[self.group].update(self.annealer.refine_scores)
+        self.mixtures.curr_mixtures.update(self.annealer.best_mixtures)
+        self.doneThread.emit()
+
+    def runSegments(self, segments):
+        """Runs the segments of the replicas of the parallel tempering in the worker processes. Returns None if the
+        optimization is stopped, in which case the annealer checkpoints the state before the segments."""
+        results = []
+        for segment in segments:
+            results.append(self.process_pool.apply_async(anneal.temperSegment,
+                                                         (self.group, self.mixnum_list) + tuple(segment)))
+        for result in results:
+            while not result.ready():
+                if self.stop_event.is_set():
+                    return(None)
+                result.wait(0.1)
+        if self.stop_event.is_set():
+            return(None)
+        segment_results = []
+        for result in results:
+            curr_score, mixtures_dict, scores, cache_stats = result.get()
+            self.mixtures.score_cache.addStats(cache_stats)
+            segment_results.append((curr_score, mixtures_dict, scores))
+        return(segment_results)
+
+    def runIterations(self):
+        group_mixtures = {}
+        for mixnum in self.mixnum_list:
+            group_mixtures[mixnum] = list(self.mixtures.mixtures[mixnum])
+        results = []
+        for i, seed in enumerate(self.annealer.seeds):
+            results.append(self.process_pool.apply_async(anneal.annealIteration, (self.group, self.mixnum_list,
+                                                                                 group_mixtures, i, seed,
+                                                                                 self.annealer.checkpoint)))
+        self.current_iteration = 0
+        self.iteration_status = {}
+        while not self.stop_event.is_set() and self.current_iteration < len(results):
+            self.relayProgress(timeout=0.1)
+            while self.current_iteration < len(results) and results[self.current_iteration].ready():
+                self.current_iteration += 1
+                if self.current_iteration in self.iteration_status:
+                    name, args = self.iteration_status[self.current_iteration]
+                    getattr(self, name).emit(*args)
+        if self.stop_event.is_set():
+            anneal.stopPool(self.stop_event, results)
+            return
+        while self.relayProgress():
+            pass
+        for i, result in enumerate(results):
+            curr_score, mixtures, scores, refine_scores, cache_stats = result.get()
+            self.mixtures.score_cache.addStats(cache_stats)
+            self.annealer.anneal_scores[i] = scores
+            if refine_scores is not None:
+                self.annealer.refine_scores[i] = refine_scores
+            self.annealer.addIteration(i, curr_score, mixtures)
+        self.mixtures.anneal_scores[self.group].update(self.annealer.anneal_scores)
+        self.mixtures.refine_scores[self.group].update(self.annealer.refine_scores)
+        self.mixtures.curr_mixtures.update(self.annealer.best_mixtures)
+        self.doneThread.emit()
+
+    def relayProgress(self, timeout=None):
+        """Takes the next progress message of the group from the queue, and emits its signal if it belongs to the
+        earliest unfinished iteration. Returns False if there was no message."""
+        try:
+            if timeout is None:
+                message = self.queue.get(False)
             else:
-                if current_temp > 0.0:
-                    score_diff = new_score - curr_score
-                    probability = math.exp(((-score_diff / max_score) / current_temp) * 25000)
-                    if random.random() < probability:
-                        score_step = (step, current_temp, curr_score, new_score, curr_overlap, new_overlap,
-                                      num_peaks, max_score, probability, 'PASSED')
-                        scores.append(score_step)
-                        mixtures.update(new_mixtures)
-                        curr_score = new_score
-                        curr_overlap = new_overlap
-                    else:
-                        score_step = (step, current_temp, curr_score, new_score, curr_overlap, new_overlap,
-                                      num_peaks, max_score, probability, 'FAILED')
-                        scores.append(score_step)
-                else:
-                    score_step = (step, current_temp, curr_score, new_score, curr_overlap, new_overlap,
-                                      num_peaks, max_score, 0, 'FAILED')
-                    scores.append(score_step)
-                # print(score_step)
-                # if score_diff > delta_max:
-                #     delta_max = score_diff
-                # test_score, test_overlap = self.mixtures.calculateTotalScore(mixtures)
-                # print(test_score, curr_score, test_overlap, curr_overlap)
-            step += 1
-            if step > max_steps:
-                self.newStep.emit(self.group, step-1, curr_score, refining)
-                break
-            if self.exiting:
-                self.newStep.emit(self.group, step, curr_score, refining)
-                break
-        return(curr_score, mixtures, scores)
\ No newline at end of file
+                message = self.queue.get(True, timeout)
+        except:
+            return(False)
+        name, i, args = message[0], message[1], message[2:]
+        if name != 'newStep':
+            self.iteration_status[i] = (name, args)
+        if i == self.current_iteration:
+            getattr(self, name).emit(*args)
+        return(True)
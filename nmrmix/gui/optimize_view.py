@@ -94,6 +94,7 @@ class Window(QDialog):
         self.deltascoresLabel = {}
         self.finalLabel = {}
         self.finaloverlapLabel = {}
+        self.stopLabel = {}
         self.groupTab = {}
 
         for i, group in enumerate(self.mixtures.group_mixnum):
@@ -129,6 +130,7 @@ class Window(QDialog):
             groupLayout.addWidget(self.deltascoresLabel[group])
             groupLayout.addWidget(self.startingoverlapLabel[group])
             groupLayout.addWidget(self.finaloverlapLabel[group])
+            groupLayout.addWidget(self.stopLabel[group])
             # TODO: Add best score and overlap
             self.groupTab[group].setLayout(groupLayout)
             if not group:
@@ -187,35 +189,18 @@ class Window(QDialog):
 
         for iteration in self.mixtures.anneal_scores[group]:
             scores[iteration] = {}
-            iteration_list = list(self.anneal_scores[group][iteration])
-            scores[iteration]['Steps'] = []
-            scores[iteration]['StepsProb'] = []
-            scores[iteration]['Temps'] = []
-            scores[iteration]['TempsProb'] = []
-            scores[iteration]['Scores'] = []
-            scores[iteration]['DeltaScores'] = []
-            scores[iteration]['PerScores'] = []
-            scores[iteration]['Probabilities'] = []
-            scores[iteration]['Overlaps'] = []
-            for i in iteration_list:
-                num_peaks = i[6]
-                scores[iteration]['Steps'].append(i[0])
-                scores[iteration]['Temps'].append(i[1])
-                scores[iteration]['DeltaScores'].append(abs(i[2]-i[3]))
-                delta_scores.append(abs(i[2]-i[3]))
-
-                if i[9] == 'FAILED':
-                    scores[iteration]['Scores'].append(i[2])
-                    scores[iteration]['PerScores'].append(i[2] / num_compounds)
-                    scores[iteration]['Overlaps'].append(i[4])
-                else:
-                    scores[iteration]['Scores'].append(i[3])
-                    scores[iteration]['PerScores'].append(i[3] / num_compounds)
-                    scores[iteration]['Overlaps'].append(i[5])
-                if i[8] < 1:
-                    scores[iteration]['StepsProb'].append(i[0])
-                    scores[iteration]['TempsProb'].append(i[1])
-                    scores[iteration]['Probabilities'].append(i[8])
+            trace = self.anneal_scores[group][iteration]
+            uncertain = trace['probability'] < 1
+            scores[iteration]['Steps'] = trace['step']
+            scores[iteration]['StepsProb'] = trace['step'][uncertain]
+            scores[iteration]['Temps'] = trace['temp']
+            scores[iteration]['TempsProb'] = trace['temp'][uncertain]
+            scores[iteration]['Scores'] = trace.scores()
+            scores[iteration]['DeltaScores'] = np.abs(trace['curr_score'] - trace['new_score'])
+            scores[iteration]['PerScores'] = scores[iteration]['Scores'] / num_compounds
+            scores[iteration]['Probabilities'] = trace['probability'][uncertain]
+            scores[iteration]['Overlaps'] = trace.overlaps()
+            delta_scores.append(scores[iteration]['DeltaScores'])
 
             final_energy.append(scores[iteration]['Scores'][-1])
             final_overlaps.append(scores[iteration]['Overlaps'][-1])
@@ -253,6 +238,7 @@ class Window(QDialog):
                 plt.ylabel("Total Mixtures Score Difference (Abs)", fontweight='bold')
             plt.plot(x, y, linewidth=2.0)
             self.canvas[group].draw()
+        delta_scores = np.concatenate(delta_scores)
         average_start = np.mean(starting_energy)
         average_final = np.mean(final_energy)
         min_start = np.min(starting_energy)
@@ -260,8 +246,8 @@ class Window(QDialog):
         min_final = np.min(final_energy)
         max_final = np.max(final_energy)
         average_difference = np.mean(delta_scores)
-        max_difference = max(delta_scores)
-        min_difference = min(delta_scores)
+        max_difference = np.max(delta_scores)
+        min_difference = np.min(delta_scores)
         average_start_overlap = np.mean(starting_overlaps)
         average_final_overlap = np.mean(final_overlaps)
         min_start_overlap = np.min(starting_overlaps)
@@ -323,6 +309,21 @@ class Window(QDialog):
                                                   max_final_overlap))
         self.finaloverlapLabel[group].setAlignment(Qt.AlignCenter)
         self.summary[group].append(self.finaloverlapLabel[group].text())
+        stop_reasons = []
+        for iteration in sorted(self.anneal_scores[group]):
+            stop_reasons.append(self.anneal_scores[group][iteration].stop_reason)
+        stop_counts = ["%s (%d)" % (reason, stop_reasons.count(reason)) for reason in sorted(set(stop_reasons))]
+        self.stopLabel[group] = QLabel("Stop Reasons: %s" % ", ".join(stop_counts))
+        self.stopLabel[group].setAlignment(Qt.AlignCenter)
+        self.summary[group].append(self.stopLabel[group].text())
+        for iteration in sorted(self.anneal_scores[group]):
+            trace = self.anneal_scores[group][iteration]
+            if len(trace):
+                last_step = trace['step'][-1]
+            else:
+                last_step = 0
+            self.summary[group].append("Iteration %d: Stopped at Step %d (%s)" %
+                                       (iteration+1, last_step, trace.stop_reason))
 
     def saveResults(self, figures_only=False):
         try:
@@ -402,7 +403,7 @@ class Window(QDialog):
                           'Current Overlap', 'New Overlap', 'Total Peaks', 'Max Score', 'Probability', 'Result']
                 writer.writerow(header)
                 for i in self.anneal_scores[group]:
-                    for step in self.anneal_scores[group][i]:
+                    for step in self.anneal_scores[group][i].rows():
                         scores = list(step)
                         scores.insert(0, i+1)
                         scores.insert(0, group)
@@ -419,29 +420,78 @@ class Window(QDialog):
             else:
                 params.write("Using Peak Intensity: False\n")
             params.write("Score Scale: %d\n" % self.params.score_scale)
+            params.write("Scoring Mode: %s\n" % self.params.scoring_mode.capitalize())
+            if self.params.use_seed:
+                params.write("Random Seed: %d\n" % self.params.seed)
+            else:
+                params.write("Random Seed: None\n")
 
             if self.refine:
                 params.write("Start Temperature: %0.2f\n" % self.params.refine_start_temp)
                 params.write("Final Temperature: %0.2f\n" % self.params.refine_final_temp)
                 if self.params.refine_cooling == 'exponential':
                     params.write("Cooling Rate: Exponential\n")
+                elif self.params.refine_cooling == 'adaptive':
+                    params.write("Cooling Rate: Adaptive\n")
+                    params.write("Start Acceptance: %g\n" % self.params.refine_start_acceptance)
+                    params.write("Final Acceptance: %g\n" % self.params.refine_final_acceptance)
+                    params.write("Acceptance Window: %d\n" % self.params.acceptance_window)
                 else:
                     params.write("Cooling Rate: Linear\n")
                 params.write("Max Temperature Steps: %d\n" % self.params.refine_max_steps)
                 params.write("Mix Rate: %d\n" % self.params.refine_mix_rate)
+                if self.params.use_guided_moves:
+                    params.write("Guided Moves: True\n")
+                    params.write("Guided Fraction: %0.2f\n" % self.params.guided_fraction)
+                else:
+                    params.write("Guided Moves: False\n")
             else:
                 if self.params.randomize_initial:
                     params.write("Random Initial Mixture: True\n")
                 else:
                     params.write("Random Initial Mixture: False\n")
+                if self.params.greedy_initial:
+                    params.write("Greedy Initial Mixture: True\n")
+                else:
+                    params.write("Greedy Initial Mixture: False\n")
                 params.write("Start Temperature: %0.2f\n" % self.params.start_temp)
                 params.write("Final Temperature: %0.2f\n" % self.params.final_temp)
                 if self.params.cooling == 'exponential':
                     params.write("Cooling Rate: Exponential\n")
+                elif self.params.cooling == 'adaptive':
+                    params.write("Cooling Rate: Adaptive\n")
+                    params.write("Start Acceptance: %g\n" % self.params.start_acceptance)
+                    params.write("Final Acceptance: %g\n" % self.params.final_acceptance)
+                    params.write("Acceptance Window: %d\n" % self.params.acceptance_window)
                 else:
                     params.write("Cooling Rate: Linear\n")
                 params.write("Max Temperature Steps: %d\n" % self.params.max_steps)
                 params.write("Mix Rate: %d\n" % self.params.mix_rate)
+                params.write("Optimizer: %s\n" % self.params.optimizer.capitalize())
+                if self.params.optimizer == 'tabu':
+                    params.write("Tabu Tenure: %d\n" % self.params.tabu_tenure)
+                    params.write("Tabu Candidates: %d\n" % self.params.tabu_candidates)
+                elif self.params.optimizer == 'neighbourhood':
+                    params.write("Neighbourhood Mixtures: %d\n" % self.params.neighbourhood_mixtures)
+                    params.write("Neighbourhood Nodes: %d\n" % self.params.neighbourhood_nodes)
+                else:
+                    params.write("Batch Size: %d\n" % self.params.batch_size)
+                    if self.params.batch_weights == 'heatbath':
+                        params.write("Batch Weights: Heat Bath\n")
+                    else:
+                        params.write("Batch Weights: Metropolis\n")
+                    if self.params.use_guided_moves:
+                        params.write("Guided Moves: True\n")
+                        params.write("Guided Fraction: %0.2f\n" % self.params.guided_fraction)
+                    else:
+                        params.write("Guided Moves: False\n")
+            if self.params.use_early_stop:
+                params.write("Early Stop: True\n")
+                params.write("Stall Steps: %d\n" % self.params.stall_steps)
+                params.write("Min Acceptance Rate: %0.3f\n" % self.params.min_acceptance)
+                params.write("Score Lower Bound: %0.1f\n" % self.params.score_lower_bound)
+            else:
+                params.write("Early Stop: False\n")
 
     def closeEvent(self, event=False):
         self.fig.clear()
@@ -156,6 +156,40 @@ class DefaultParameters(QDialog):
             self.useintensityCheckBox.setCheckState(Qt.Checked)
         else:
             self.useintensityCheckBox.setCheckState(Qt.Unchecked)
+        self.scoringmodeLabel = QLabel("Scoring Mode")
+        self.scoringmodeLabel.setAlignment(Qt.AlignCenter)
+        self.scoringmodeComboBox = QComboBox()
+        self.scoringmodeComboBox.setEditable(True)
+        self.scoringmodeComboBox.lineEdit().setReadOnly(True)
+        self.scoringmodeComboBox.lineEdit().setAlignment(Qt.AlignCenter)
+        self.scoringmodeComboBox.addItems(['Greedy', 'Pairwise'])
+        if self.params.scoring_mode == "pairwise":
+            self.scoringmodeComboBox.setCurrentIndex(1)
+        else:
+            self.scoringmodeComboBox.setCurrentIndex(0)
+        self.scoringbackendLabel = QLabel("Scoring Backend")
+        self.scoringbackendLabel.setAlignment(Qt.AlignCenter)
+        self.scoringbackendLabel.setToolTip("Compares the peaks one by one in Python or all at once with NumPy arrays.")
+        self.scoringbackendComboBox = QComboBox()
+        self.scoringbackendComboBox.setToolTip("Compares the peaks one by one in Python or all at once with NumPy arrays.")
+        self.scoringbackendComboBox.setEditable(True)
+        self.scoringbackendComboBox.lineEdit().setReadOnly(True)
+        self.scoringbackendComboBox.lineEdit().setAlignment(Qt.AlignCenter)
+        self.scoringbackendComboBox.addItems(['Python', 'NumPy'])
+        if self.params.scoring_backend == "numpy":
+            self.scoringbackendComboBox.setCurrentIndex(1)
+        else:
+            self.scoringbackendComboBox.setCurrentIndex(0)
+        self.cachesizeLabel = QLabel("Score Cache Size")
+        self.cachesizeLabel.setAlignment(Qt.AlignCenter)
+        self.cachesizeLabel.setToolTip("Max number of mixture scores kept in memory during the optimization.")
+        self.cachesizeSpinBox = QSpinBox()
+        self.cachesizeSpinBox.setToolTip("Max number of mixture scores kept in memory during the optimization.")
+        self.cachesizeSpinBox.setKeyboardTracking(False)
+        self.cachesizeSpinBox.setAlignment(Qt.AlignCenter)
+        self.cachesizeSpinBox.setRange(1000, 10000000)
+        self.cachesizeSpinBox.setSingleStep(10000)
+        self.cachesizeSpinBox.setValue(self.params.score_cache_size)
         self.useautosaveLabel = QLabel("Autosave Results")
         self.useautosaveLabel.setAlignment(Qt.AlignCenter)
         self.useautosaveLabel.setToolTip("Turns on/off the autosaving of results after optimizing mixtures.")
@@ -202,11 +236,13 @@ class DefaultParameters(QDialog):
         self.coolingComboBox.setEditable(True)
         self.coolingComboBox.lineEdit().setReadOnly(True)
         self.coolingComboBox.lineEdit().setAlignment(Qt.AlignCenter)
-        self.coolingComboBox.addItems(['Exponential', 'Linear'])
+        self.coolingComboBox.addItems(['Exponential', 'Linear', 'Adaptive'])
         if self.params.cooling == "exponential":
             self.coolingComboBox.setCurrentIndex(0)
         elif self.params.cooling == "linear":
             self.coolingComboBox.setCurrentIndex(1)
+        elif self.params.cooling == "adaptive":
+            self.coolingComboBox.setCurrentIndex(2)
         self.starttempLabel = QLabel("Start Temp")
         self.starttempLabel.setAlignment(Qt.AlignCenter)
         self.starttempSpinBox = QSpinBox()
@@ -261,6 +297,248 @@ class DefaultParameters(QDialog):
             self.randomizeCheckBox.setCheckState(Qt.Checked)
         else:
             self.randomizeCheckBox.setCheckState(Qt.Unchecked)
+        self.greedyLabel = QLabel("Greedy Initial Mixtures")
+        self.greedyLabel.setAlignment(Qt.AlignCenter)
+        self.greedyLabel.setToolTip("Places the most overlapped compounds first, where they add the least overlap.")
+        self.greedyCheckBox = QCheckBox()
+        self.greedyCheckBox.setToolTip("Places the most overlapped compounds first, where they add the least overlap.")
+        if self.params.greedy_initial:
+            self.greedyCheckBox.setCheckState(Qt.Checked)
+        else:
+            self.greedyCheckBox.setCheckState(Qt.Unchecked)
+        self.annealbackendLabel = QLabel("Anneal Backend")
+        self.annealbackendLabel.setAlignment(Qt.AlignCenter)
+        self.annealbackendLabel.setToolTip("Anneals each group in a thread, or in a pool of processes on separate CPU cores.")
+        self.annealbackendComboBox = QComboBox()
+        self.annealbackendComboBox.setToolTip("Anneals each group in a thread, or in a pool of processes on separate CPU cores.")
+        self.annealbackendComboBox.setEditable(True)
+        self.annealbackendComboBox.lineEdit().setReadOnly(True)
+        self.annealbackendComboBox.lineEdit().setAlignment(Qt.AlignCenter)
+        self.annealbackendComboBox.addItems(['Threads', 'Processes'])
+        if self.params.anneal_backend == "processes":
+            self.annealbackendComboBox.setCurrentIndex(1)
+        else:
+            self.annealbackendComboBox.setCurrentIndex(0)
+        self.workerprocessesLabel = QLabel("Worker Processes")
+        self.workerprocessesLabel.setAlignment(Qt.AlignCenter)
+        self.workerprocessesLabel.setToolTip("Number of processes used by the process backend (0 uses one per CPU core).")
+        self.workerprocessesSpinBox = QSpinBox()
+        self.workerprocessesSpinBox.setToolTip("Number of processes used by the process backend (0 uses one per CPU core).")
+        self.workerprocessesSpinBox.setKeyboardTracking(False)
+        self.workerprocessesSpinBox.setAlignment(Qt.AlignCenter)
+        self.workerprocessesSpinBox.setRange(0, 256)
+        self.workerprocessesSpinBox.setValue(self.params.worker_processes)
+        self.optimizerLabel = QLabel("Optimizer")
+        self.optimizerLabel.setAlignment(Qt.AlignCenter)
+        self.optimizerLabel.setToolTip("Simulated annealing, parallel tempering with replicas at fixed temperatures, "
+                                       "tabu search, or large neighbourhood search.")
+        self.optimizerComboBox = QComboBox()
+        self.optimizerComboBox.setToolTip("Simulated annealing, parallel tempering with replicas at fixed temperatures, "
+                                          "tabu search, or large neighbourhood search.")
+        self.optimizerComboBox.setEditable(True)
+        self.optimizerComboBox.lineEdit().setReadOnly(True)
+        self.optimizerComboBox.lineEdit().setAlignment(Qt.AlignCenter)
+        self.optimizerComboBox.addItems(['Annealing', 'Tempering', 'Tabu', 'Neighbourhood'])
+        if self.params.optimizer == "tempering":
+            self.optimizerComboBox.setCurrentIndex(1)
+        elif self.params.optimizer == "tabu":
+            self.optimizerComboBox.setCurrentIndex(2)
+        elif self.params.optimizer == "neighbourhood":
+            self.optimizerComboBox.setCurrentIndex(3)
+        else:
+            self.optimizerComboBox.setCurrentIndex(0)
+        self.replicasLabel = QLabel("Replicas")
+        self.replicasLabel.setAlignment(Qt.AlignCenter)
+        self.replicasSpinBox = QSpinBox()
+        self.replicasSpinBox.setKeyboardTracking(False)
+        self.replicasSpinBox.setAlignment(Qt.AlignCenter)
+        self.replicasSpinBox.setRange(1, 256)
+        self.replicasSpinBox.setValue(self.params.replicas)
+        self.exchangeLabel = QLabel("Exchange Interval")
+        self.exchangeLabel.setAlignment(Qt.AlignCenter)
+        self.exchangeSpinBox = QSpinBox()
+        self.exchangeSpinBox.setKeyboardTracking(False)
+        self.exchangeSpinBox.setAlignment(Qt.AlignCenter)
+        self.exchangeSpinBox.setRange(1, 100000)
+        self.exchangeSpinBox.setSingleStep(10)
+        self.exchangeSpinBox.setValue(self.params.exchange_interval)
+        self.tabutenureLabel = QLabel("Tabu Tenure")
+        self.tabutenureLabel.setAlignment(Qt.AlignCenter)
+        self.tabutenureLabel.setToolTip("Steps before a compound may go back to a mixture it has left.")
+        self.tabutenureSpinBox = QSpinBox()
+        self.tabutenureSpinBox.setKeyboardTracking(False)
+        self.tabutenureSpinBox.setAlignment(Qt.AlignCenter)
+        self.tabutenureSpinBox.setRange(0, 10000)
+        self.tabutenureSpinBox.setValue(self.params.tabu_tenure)
+        self.tabucandidatesLabel = QLabel("Tabu Candidates")
+        self.tabucandidatesLabel.setAlignment(Qt.AlignCenter)
+        self.tabucandidatesLabel.setToolTip("Moves with the best estimated scores that are scored exactly at each step.")
+        self.tabucandidatesSpinBox = QSpinBox()
+        self.tabucandidatesSpinBox.setKeyboardTracking(False)
+        self.tabucandidatesSpinBox.setAlignment(Qt.AlignCenter)
+        self.tabucandidatesSpinBox.setRange(1, 1000)
+        self.tabucandidatesSpinBox.setValue(self.params.tabu_candidates)
+        self.neighbourhoodmixturesLabel = QLabel("Neighbourhood Mixtures")
+        self.neighbourhoodmixturesLabel.setAlignment(Qt.AlignCenter)
+        self.neighbourhoodmixturesLabel.setToolTip("Mixtures whose compounds are repartitioned at each step.")
+        self.neighbourhoodmixturesSpinBox = QSpinBox()
+        self.neighbourhoodmixturesSpinBox.setKeyboardTracking(False)
+        self.neighbourhoodmixturesSpinBox.setAlignment(Qt.AlignCenter)
+        self.neighbourhoodmixturesSpinBox.setRange(2, 10)
+        self.neighbourhoodmixturesSpinBox.setValue(self.params.neighbourhood_mixtures)
+        self.neighbourhoodnodesLabel = QLabel("Neighbourhood Nodes")
+        self.neighbourhoodnodesLabel.setAlignment(Qt.AlignCenter)
+        self.neighbourhoodnodesLabel.setToolTip("Assignments the branch and bound may try for each neighbourhood.")
+        self.neighbourhoodnodesSpinBox = QSpinBox()
+        self.neighbourhoodnodesSpinBox.setKeyboardTracking(False)
+        self.neighbourhoodnodesSpinBox.setAlignment(Qt.AlignCenter)
+        self.neighbourhoodnodesSpinBox.setRange(1, 10000000)
+        self.neighbourhoodnodesSpinBox.setSingleStep(1000)
+        self.neighbourhoodnodesSpinBox.setValue(self.params.neighbourhood_nodes)
+        self.batchsizeLabel = QLabel("Batch Size")
+        self.batchsizeLabel.setAlignment(Qt.AlignCenter)
+        self.batchsizeLabel.setToolTip("Candidate moves scored at each step of the annealing. 1 proposes single moves.")
+        self.batchsizeSpinBox = QSpinBox()
+        self.batchsizeSpinBox.setKeyboardTracking(False)
+        self.batchsizeSpinBox.setAlignment(Qt.AlignCenter)
+        self.batchsizeSpinBox.setRange(1, 10000)
+        self.batchsizeSpinBox.setValue(self.params.batch_size)
+        self.batchweightsLabel = QLabel("Batch Weights")
+        self.batchweightsLabel.setAlignment(Qt.AlignCenter)
+        self.batchweightsLabel.setToolTip("Weights by which one of the candidate moves of a batch is chosen.")
+        self.batchweightsComboBox = QComboBox()
+        self.batchweightsComboBox.setToolTip("Weights by which one of the candidate moves of a batch is chosen.")
+        self.batchweightsComboBox.setEditable(True)
+        self.batchweightsComboBox.lineEdit().setReadOnly(True)
+        self.batchweightsComboBox.lineEdit().setAlignment(Qt.AlignCenter)
+        self.batchweightsComboBox.addItems(['Metropolis', 'Heat Bath'])
+        if self.params.batch_weights == "heatbath":
+            self.batchweightsComboBox.setCurrentIndex(1)
+        else:
+            self.batchweightsComboBox.setCurrentIndex(0)
+        self.startacceptanceLabel = QLabel("Start Acceptance")
+        self.startacceptanceLabel.setAlignment(Qt.AlignCenter)
+        self.startacceptanceLabel.setToolTip("Target acceptance rate of the first step with adaptive cooling.")
+        self.startacceptanceSpinBox = QDoubleSpinBox()
+        self.startacceptanceSpinBox.setKeyboardTracking(False)
+        self.startacceptanceSpinBox.setAlignment(Qt.AlignCenter)
+        self.startacceptanceSpinBox.setRange(0.0000000001, 0.99)
+        self.startacceptanceSpinBox.setDecimals(10)
+        self.startacceptanceSpinBox.setSingleStep(0.05)
+        self.startacceptanceSpinBox.setValue(self.params.start_acceptance)
+        self.finalacceptanceLabel = QLabel("Final Acceptance")
+        self.finalacceptanceLabel.setAlignment(Qt.AlignCenter)
+        self.finalacceptanceLabel.setToolTip("Target acceptance rate of the last step with adaptive cooling.")
+        self.finalacceptanceSpinBox = QDoubleSpinBox()
+        self.finalacceptanceSpinBox.setKeyboardTracking(False)
+        self.finalacceptanceSpinBox.setAlignment(Qt.AlignCenter)
+        self.finalacceptanceSpinBox.setRange(0.0000000001, 0.99)
+        self.finalacceptanceSpinBox.setDecimals(10)
+        self.finalacceptanceSpinBox.setSingleStep(0.00000001)
+        self.finalacceptanceSpinBox.setValue(self.params.final_acceptance)
+        self.acceptancewindowLabel = QLabel("Acceptance Window")
+        self.acceptancewindowLabel.setAlignment(Qt.AlignCenter)
+        self.acceptancewindowLabel.setToolTip("Moves over which the acceptance rate is measured with adaptive cooling.")
+        self.acceptancewindowSpinBox = QSpinBox()
+        self.acceptancewindowSpinBox.setKeyboardTracking(False)
+        self.acceptancewindowSpinBox.setAlignment(Qt.AlignCenter)
+        self.acceptancewindowSpinBox.setRange(1, 100000)
+        self.acceptancewindowSpinBox.setSingleStep(10)
+        self.acceptancewindowSpinBox.setValue(self.params.acceptance_window)
+        self.guidedmovesLabel = QLabel("Guided Moves")
+        self.guidedmovesLabel.setAlignment(Qt.AlignCenter)
+        self.guidedmovesLabel.setToolTip("Moves the compounds with the most overlaps more often.")
+        self.guidedmovesCheckBox = QCheckBox()
+        self.guidedmovesCheckBox.setToolTip("Moves the compounds with the most overlaps more often.")
+        if self.params.use_guided_moves:
+            self.guidedmovesCheckBox.setCheckState(Qt.Checked)
+        else:
+            self.guidedmovesCheckBox.setCheckState(Qt.Unchecked)
+        self.guidedfractionLabel = QLabel("Guided Fraction")
+        self.guidedfractionLabel.setAlignment(Qt.AlignCenter)
+        self.guidedfractionLabel.setToolTip("Share of the moves that are guided by the overlaps of the compounds.")
+        self.guidedfractionSpinBox = QDoubleSpinBox()
+        self.guidedfractionSpinBox.setToolTip("Share of the moves that are guided by the overlaps of the compounds.")
+        self.guidedfractionSpinBox.setKeyboardTracking(False)
+        self.guidedfractionSpinBox.setAlignment(Qt.AlignCenter)
+        self.guidedfractionSpinBox.setRange(0.0, 1.0)
+        self.guidedfractionSpinBox.setDecimals(2)
+        self.guidedfractionSpinBox.setSingleStep(0.05)
+        self.guidedfractionSpinBox.setValue(self.params.guided_fraction)
+        self.earlystopLabel = QLabel("Early Stop")
+        self.earlystopLabel.setAlignment(Qt.AlignCenter)
+        self.earlystopLabel.setToolTip("Stops each iteration once the annealing has converged.")
+        self.earlystopCheckBox = QCheckBox()
+        self.earlystopCheckBox.setToolTip("Stops each iteration once the annealing has converged.")
+        if self.params.use_early_stop:
+            self.earlystopCheckBox.setCheckState(Qt.Checked)
+        else:
+            self.earlystopCheckBox.setCheckState(Qt.Unchecked)
+        self.stallstepsLabel = QLabel("Stall Steps")
+        self.stallstepsLabel.setAlignment(Qt.AlignCenter)
+        self.stallstepsLabel.setToolTip("Stops after this many steps without a better score.")
+        self.stallstepsSpinBox = QSpinBox()
+        self.stallstepsSpinBox.setToolTip("Stops after this many steps without a better score.")
+        self.stallstepsSpinBox.setKeyboardTracking(False)
+        self.stallstepsSpinBox.setAlignment(Qt.AlignCenter)
+        self.stallstepsSpinBox.setRange(1, 1000000)
+        self.stallstepsSpinBox.setSingleStep(50)
+        self.stallstepsSpinBox.setValue(self.params.stall_steps)
+        self.minacceptanceLabel = QLabel("Min Acceptance Rate")
+        self.minacceptanceLabel.setAlignment(Qt.AlignCenter)
+        self.minacceptanceLabel.setToolTip("Stops when fewer of the last stall steps were accepted.")
+        self.minacceptanceSpinBox = QDoubleSpinBox()
+        self.minacceptanceSpinBox.setToolTip("Stops when fewer of the last stall steps were accepted.")
+        self.minacceptanceSpinBox.setKeyboardTracking(False)
+        self.minacceptanceSpinBox.setAlignment(Qt.AlignCenter)
+        self.minacceptanceSpinBox.setRange(0.0, 1.0)
+        self.minacceptanceSpinBox.setDecimals(3)
+        self.minacceptanceSpinBox.setSingleStep(0.005)
+        self.minacceptanceSpinBox.setValue(self.params.min_acceptance)
+        self.lowerboundLabel = QLabel("Score Lower Bound")
+        self.lowerboundLabel.setAlignment(Qt.AlignCenter)
+        self.lowerboundLabel.setToolTip("Stops when the score reaches this known lower bound.")
+        self.lowerboundSpinBox = QDoubleSpinBox()
+        self.lowerboundSpinBox.setToolTip("Stops when the score reaches this known lower bound.")
+        self.lowerboundSpinBox.setKeyboardTracking(False)
+        self.lowerboundSpinBox.setAlignment(Qt.AlignCenter)
+        self.lowerboundSpinBox.setRange(0.0, 100000000.0)
+        self.lowerboundSpinBox.setDecimals(1)
+        self.lowerboundSpinBox.setSingleStep(100)
+        self.lowerboundSpinBox.setValue(self.params.score_lower_bound)
+        self.checkpointsLabel = QLabel("Save Checkpoints")
+        self.checkpointsLabel.setAlignment(Qt.AlignCenter)
+        self.checkpointsLabel.setToolTip("Saves checkpoints to the working directory so that an optimization can be resumed.")
+        self.checkpointsCheckBox = QCheckBox()
+        self.checkpointsCheckBox.setToolTip("Saves checkpoints to the working directory so that an optimization can be resumed.")
+        if self.params.use_checkpoints:
+            self.checkpointsCheckBox.setCheckState(Qt.Checked)
+        else:
+            self.checkpointsCheckBox.setCheckState(Qt.Unchecked)
+        self.checkpointintervalLabel = QLabel("Checkpoint Interval")
+        self.checkpointintervalLabel.setAlignment(Qt.AlignCenter)
+        self.checkpointintervalSpinBox = QSpinBox()
+        self.checkpointintervalSpinBox.setKeyboardTracking(False)
+        self.checkpointintervalSpinBox.setAlignment(Qt.AlignCenter)
+        self.checkpointintervalSpinBox.setRange(1, 1000000)
+        self.checkpointintervalSpinBox.setSingleStep(100)
+        self.checkpointintervalSpinBox.setValue(self.params.checkpoint_interval)
+        self.useseedLabel = QLabel("Use Random Seed")
+        self.useseedLabel.setAlignment(Qt.AlignCenter)
+        self.useseedLabel.setToolTip("Makes the same initial mixtures and optimization each time.")
+        self.useseedCheckBox = QCheckBox()
+        self.useseedCheckBox.setToolTip("Makes the same initial mixtures and optimization each time.")
+        if self.params.use_seed:
+            self.useseedCheckBox.setCheckState(Qt.Checked)
+        else:
+            self.useseedCheckBox.setCheckState(Qt.Unchecked)
+        self.seedLabel = QLabel("Random Seed")
+        self.seedLabel.setAlignment(Qt.AlignCenter)
+        self.seedSpinBox = QSpinBox()
+        self.seedSpinBox.setKeyboardTracking(False)
+        self.seedSpinBox.setAlignment(Qt.AlignCenter)
+        self.seedSpinBox.setRange(0, 2147483647)
+        self.seedSpinBox.setValue(self.params.seed)
 
         # Refinement Parameters
         self.userefineLabel = QLabel("Use Refinement")
@@ -276,11 +554,13 @@ class DefaultParameters(QDialog):
         self.refinecoolingComboBox.setEditable(True)
         self.refinecoolingComboBox.lineEdit().setReadOnly(True)
         self.refinecoolingComboBox.lineEdit().setAlignment(Qt.AlignCenter)
-        self.refinecoolingComboBox.addItems(['Exponential', 'Linear'])
+        self.refinecoolingComboBox.addItems(['Exponential', 'Linear', 'Adaptive'])
         if self.params.refine_cooling == "exponential":
             self.refinecoolingComboBox.setCurrentIndex(0)
         elif self.params.refine_cooling == "linear":
             self.refinecoolingComboBox.setCurrentIndex(1)
+        elif self.params.refine_cooling == "adaptive":
+            self.refinecoolingComboBox.setCurrentIndex(2)
         self.refinestarttempLabel = QLabel("Start Temp")
         self.refinestarttempLabel.setAlignment(Qt.AlignCenter)
         self.refinestarttempSpinBox = QSpinBox()
@@ -312,6 +592,26 @@ class DefaultParameters(QDialog):
         self.refinemixrateSpinBox.setAlignment(Qt.AlignCenter)
         self.refinemixrateSpinBox.setRange(1, 100)
         self.refinemixrateSpinBox.setValue(self.params.refine_mix_rate)
+        self.refinestartacceptanceLabel = QLabel("Start Acceptance")
+        self.refinestartacceptanceLabel.setAlignment(Qt.AlignCenter)
+        self.refinestartacceptanceLabel.setToolTip("Target acceptance rate of the first step with adaptive cooling.")
+        self.refinestartacceptanceSpinBox = QDoubleSpinBox()
+        self.refinestartacceptanceSpinBox.setKeyboardTracking(False)
+        self.refinestartacceptanceSpinBox.setAlignment(Qt.AlignCenter)
+        self.refinestartacceptanceSpinBox.setRange(0.0000000001, 0.99)
+        self.refinestartacceptanceSpinBox.setDecimals(10)
+        self.refinestartacceptanceSpinBox.setSingleStep(0.01)
+        self.refinestartacceptanceSpinBox.setValue(self.params.refine_start_acceptance)
+        self.refinefinalacceptanceLabel = QLabel("Final Acceptance")
+        self.refinefinalacceptanceLabel.setAlignment(Qt.AlignCenter)
+        self.refinefinalacceptanceLabel.setToolTip("Target acceptance rate of the last step with adaptive cooling.")
+        self.refinefinalacceptanceSpinBox = QDoubleSpinBox()
+        self.refinefinalacceptanceSpinBox.setKeyboardTracking(False)
+        self.refinefinalacceptanceSpinBox.setAlignment(Qt.AlignCenter)
+        self.refinefinalacceptanceSpinBox.setRange(0.0000000001, 0.99)
+        self.refinefinalacceptanceSpinBox.setDecimals(10)
+        self.refinefinalacceptanceSpinBox.setSingleStep(0.00000001)
+        self.refinefinalacceptanceSpinBox.setValue(self.params.refine_final_acceptance)
 
         # Graphs and Stats
         self.displaystepsLabel = QLabel("Optimization Progress Bar Update (steps)")
@@ -370,12 +670,18 @@ class DefaultParameters(QDialog):
         checkbox1Layout = QHBoxLayout()
         checkbox1Layout.addWidget(self.useintensityCheckBox)
         scoreLayout.addLayout(checkbox1Layout, 7, 1, Qt.AlignCenter)
-        scoreLayout.addItem(QSpacerItem(0, 8), 8, 0)
-        scoreLayout.addWidget(self.useautosaveLabel, 11, 0)
+        scoreLayout.addWidget(self.scoringmodeLabel, 8, 0)
+        scoreLayout.addWidget(self.scoringmodeComboBox, 8, 1)
+        scoreLayout.addWidget(self.scoringbackendLabel, 9, 0)
+        scoreLayout.addWidget(self.scoringbackendComboBox, 9, 1)
+        scoreLayout.addWidget(self.cachesizeLabel, 10, 0)
+        scoreLayout.addWidget(self.cachesizeSpinBox, 10, 1)
+        scoreLayout.addItem(QSpacerItem(0, 8), 11, 0)
+        scoreLayout.addWidget(self.useautosaveLabel, 12, 0)
         checkbox2Layout = QHBoxLayout()
         checkbox2Layout.addWidget(self.useautosaveCheckBox)
-        scoreLayout.addLayout(checkbox2Layout, 11, 1, Qt.AlignCenter)
-        scoreLayout.addItem(QSpacerItem(0, 0, QSizePolicy.MinimumExpanding, QSizePolicy.MinimumExpanding), 12, 0)
+        scoreLayout.addLayout(checkbox2Layout, 12, 1, Qt.AlignCenter)
+        scoreLayout.addItem(QSpacerItem(0, 0, QSizePolicy.MinimumExpanding, QSizePolicy.MinimumExpanding), 13, 0)
         self.paramtab1.setLayout(scoreLayout)
         self.paramTabs.addTab(self.paramtab1, 'Directories/Scoring')
 
@@ -408,7 +714,67 @@ class DefaultParameters(QDialog):
         checkbox4Layout = QHBoxLayout()
         checkbox4Layout.addWidget(self.randomizeCheckBox)
         mixLayout.addLayout(checkbox4Layout, 13, 1, Qt.AlignCenter)
-        mixLayout.addItem(QSpacerItem(0, 0, QSizePolicy.MinimumExpanding, QSizePolicy.MinimumExpanding), 14, 0)
+        mixLayout.addWidget(self.greedyLabel, 14, 0)
+        checkbox9Layout = QHBoxLayout()
+        checkbox9Layout.addWidget(self.greedyCheckBox)
+        mixLayout.addLayout(checkbox9Layout, 14, 1, Qt.AlignCenter)
+        mixLayout.addWidget(self.annealbackendLabel, 15, 0)
+        mixLayout.addWidget(self.annealbackendComboBox, 15, 1)
+        mixLayout.addWidget(self.workerprocessesLabel, 16, 0)
+        mixLayout.addWidget(self.workerprocessesSpinBox, 16, 1)
+        mixLayout.addWidget(self.optimizerLabel, 17, 0)
+        mixLayout.addWidget(self.optimizerComboBox, 17, 1)
+        mixLayout.addWidget(self.replicasLabel, 18, 0)
+        mixLayout.addWidget(self.replicasSpinBox, 18, 1)
+        mixLayout.addWidget(self.exchangeLabel, 19, 0)
+        mixLayout.addWidget(self.exchangeSpinBox, 19, 1)
+        mixLayout.addWidget(self.tabutenureLabel, 20, 0)
+        mixLayout.addWidget(self.tabutenureSpinBox, 20, 1)
+        mixLayout.addWidget(self.tabucandidatesLabel, 21, 0)
+        mixLayout.addWidget(self.tabucandidatesSpinBox, 21, 1)
+        mixLayout.addWidget(self.neighbourhoodmixturesLabel, 22, 0)
+        mixLayout.addWidget(self.neighbourhoodmixturesSpinBox, 22, 1)
+        mixLayout.addWidget(self.neighbourhoodnodesLabel, 23, 0)
+        mixLayout.addWidget(self.neighbourhoodnodesSpinBox, 23, 1)
+        mixLayout.addWidget(self.earlystopLabel, 24, 0)
+        checkbox6Layout = QHBoxLayout()
+        checkbox6Layout.addWidget(self.earlystopCheckBox)
+        mixLayout.addLayout(checkbox6Layout, 24, 1, Qt.AlignCenter)
+        mixLayout.addWidget(self.stallstepsLabel, 25, 0)
+        mixLayout.addWidget(self.stallstepsSpinBox, 25, 1)
+        mixLayout.addWidget(self.minacceptanceLabel, 26, 0)
+        mixLayout.addWidget(self.minacceptanceSpinBox, 26, 1)
+        mixLayout.addWidget(self.lowerboundLabel, 27, 0)
+        mixLayout.addWidget(self.lowerboundSpinBox, 27, 1)
+        mixLayout.addWidget(self.checkpointsLabel, 28, 0)
+        checkbox7Layout = QHBoxLayout()
+        checkbox7Layout.addWidget(self.checkpointsCheckBox)
+        mixLayout.addLayout(checkbox7Layout, 28, 1, Qt.AlignCenter)
+        mixLayout.addWidget(self.checkpointintervalLabel, 29, 0)
+        mixLayout.addWidget(self.checkpointintervalSpinBox, 29, 1)
+        mixLayout.addWidget(self.useseedLabel, 30, 0)
+        checkbox8Layout = QHBoxLayout()
+        checkbox8Layout.addWidget(self.useseedCheckBox)
+        mixLayout.addLayout(checkbox8Layout, 30, 1, Qt.AlignCenter)
+        mixLayout.addWidget(self.seedLabel, 31, 0)
+        mixLayout.addWidget(self.seedSpinBox, 31, 1)
+        mixLayout.addWidget(self.batchsizeLabel, 32, 0)
+        mixLayout.addWidget(self.batchsizeSpinBox, 32, 1)
+        mixLayout.addWidget(self.batchweightsLabel, 33, 0)
+        mixLayout.addWidget(self.batchweightsComboBox, 33, 1)
+        mixLayout.addWidget(self.startacceptanceLabel, 34, 0)
+        mixLayout.addWidget(self.startacceptanceSpinBox, 34, 1)
+        mixLayout.addWidget(self.finalacceptanceLabel, 35, 0)
+        mixLayout.addWidget(self.finalacceptanceSpinBox, 35, 1)
+        mixLayout.addWidget(self.acceptancewindowLabel, 36, 0)
+        mixLayout.addWidget(self.acceptancewindowSpinBox, 36, 1)
+        mixLayout.addWidget(self.guidedmovesLabel, 37, 0)
+        checkbox10Layout = QHBoxLayout()
+        checkbox10Layout.addWidget(self.guidedmovesCheckBox)
+        mixLayout.addLayout(checkbox10Layout, 37, 1, Qt.AlignCenter)
+        mixLayout.addWidget(self.guidedfractionLabel, 38, 0)
+        mixLayout.addWidget(self.guidedfractionSpinBox, 38, 1)
+        mixLayout.addItem(QSpacerItem(0, 0, QSizePolicy.MinimumExpanding, QSizePolicy.MinimumExpanding), 39, 0)
         self.paramtab2.setLayout(mixLayout)
         self.paramTabs.addTab(self.paramtab2, "Optimizing")
 
@@ -427,7 +793,11 @@ class DefaultParameters(QDialog):
         refineLayout.addWidget(self.refinemaxstepsSpinBox, 5, 1)
         refineLayout.addWidget(self.refinemixrateLabel, 6, 0)
         refineLayout.addWidget(self.refinemixrateSpinBox, 6, 1)
-        refineLayout.addItem(QSpacerItem(0, 0, QSizePolicy.MinimumExpanding, QSizePolicy.MinimumExpanding), 7, 0)
+        refineLayout.addWidget(self.refinestartacceptanceLabel, 7, 0)
+        refineLayout.addWidget(self.refinestartacceptanceSpinBox, 7, 1)
+        refineLayout.addWidget(self.refinefinalacceptanceLabel, 8, 0)
+        refineLayout.addWidget(self.refinefinalacceptanceSpinBox, 8, 1)
+        refineLayout.addItem(QSpacerItem(0, 0, QSizePolicy.MinimumExpanding, QSizePolicy.MinimumExpanding), 9, 0)
         self.paramtab3.setLayout(refineLayout)
         self.paramTabs.addTab(self.paramtab3, "Refining")
 
@@ -456,6 +826,9 @@ class DefaultParameters(QDialog):
         self.rangeSpinBox.valueChanged.connect(self.updateParams)
         self.scorescaleSpinBox.valueChanged.connect(self.updateParams)
         self.useintensityCheckBox.clicked.connect(self.updateParams)
+        self.scoringmodeComboBox.currentTextChanged.connect(self.updateParams)
+        self.scoringbackendComboBox.currentTextChanged.connect(self.updateParams)
+        self.cachesizeSpinBox.valueChanged.connect(self.updateParams)
         self.useautosaveCheckBox.clicked.connect(self.updateParams)
         self.startnumSpinBox.valueChanged.connect(self.updateParams)
         self.mixsizeSpinBox.valueChanged.connect(self.updateParams)
@@ -469,6 +842,31 @@ class DefaultParameters(QDialog):
         self.usegroupCheckBox.clicked.connect(self.updateParams)
         self.iterationsSpinBox.valueChanged.connect(self.updateParams)
         self.randomizeCheckBox.clicked.connect(self.updateParams)
+        self.greedyCheckBox.clicked.connect(self.updateParams)
+        self.annealbackendComboBox.currentTextChanged.connect(self.updateParams)
+        self.workerprocessesSpinBox.valueChanged.connect(self.updateParams)
+        self.optimizerComboBox.currentTextChanged.connect(self.updateParams)
+        self.replicasSpinBox.valueChanged.connect(self.updateParams)
+        self.exchangeSpinBox.valueChanged.connect(self.updateParams)
+        self.tabutenureSpinBox.valueChanged.connect(self.updateParams)
+        self.tabucandidatesSpinBox.valueChanged.connect(self.updateParams)
+        self.neighbourhoodmixturesSpinBox.valueChanged.connect(self.updateParams)
+        self.neighbourhoodnodesSpinBox.valueChanged.connect(self.updateParams)
+        self.earlystopCheckBox.clicked.connect(self.updateParams)
+        self.stallstepsSpinBox.valueChanged.connect(self.updateParams)
+        self.minacceptanceSpinBox.valueChanged.connect(self.updateParams)
+        self.lowerboundSpinBox.valueChanged.connect(self.updateParams)
+        self.checkpointsCheckBox.clicked.connect(self.updateParams)
+        self.checkpointintervalSpinBox.valueChanged.connect(self.updateParams)
+        self.useseedCheckBox.clicked.connect(self.updateParams)
+        self.seedSpinBox.valueChanged.connect(self.updateParams)
+        self.batchsizeSpinBox.valueChanged.connect(self.updateParams)
+        self.batchweightsComboBox.currentTextChanged.connect(self.updateParams)
+        self.startacceptanceSpinBox.valueChanged.connect(self.updateParams)
+        self.finalacceptanceSpinBox.valueChanged.connect(self.updateParams)
+        self.acceptancewindowSpinBox.valueChanged.connect(self.updateParams)
+        self.guidedmovesCheckBox.clicked.connect(self.updateParams)
+        self.guidedfractionSpinBox.valueChanged.connect(self.updateParams)
 
         self.userefineCheckBox.clicked.connect(self.updateParams)
         self.refinecoolingComboBox.currentTextChanged.connect(self.updateParams)
@@ -476,6 +874,8 @@ class DefaultParameters(QDialog):
         self.refinefinaltempSpinbox.valueChanged.connect(self.updateParams)
         self.refinemaxstepsSpinBox.valueChanged.connect(self.updateParams)
         self.refinemixrateSpinBox.valueChanged.connect(self.updateParams)
+        self.refinestartacceptanceSpinBox.valueChanged.connect(self.updateParams)
+        self.refinefinalacceptanceSpinBox.valueChanged.connect(self.updateParams)
 
         self.displaystepsSpinBox.valueChanged.connect(self.updateParams)
         self.peakdrawwidthSpinBox.valueChanged.connect(self.updateParams)
@@ -494,6 +894,15 @@ class DefaultParameters(QDialog):
             self.params.useIntensity()
         else:
             self.params.noIntensity()
+        if self.scoringmodeComboBox.currentText() == 'Pairwise':
+            self.params.usePairwiseScoring()
+        elif self.scoringmodeComboBox.currentText() == 'Greedy':
+            self.params.useGreedyScoring()
+        if self.scoringbackendComboBox.currentText() == 'NumPy':
+            self.params.useNumpyBackend()
+        elif self.scoringbackendComboBox.currentText() == 'Python':
+            self.params.usePythonBackend()
+        self.params.setScoreCacheSize(self.cachesizeSpinBox.value())
         if self.useautosaveCheckBox.isChecked():
             self.params.useAutosave()
         else:
@@ -510,6 +919,8 @@ class DefaultParameters(QDialog):
             self.params.useLinearCooling()
         elif self.coolingComboBox.currentText() == 'Exponential':
             self.params.useExponentialCooling()
+        elif self.coolingComboBox.currentText() == 'Adaptive':
+            self.params.useAdaptiveCooling()
         self.params.setStartingTemp(self.starttempSpinBox.value())
         self.params.setFinalTemp(self.finaltempSpinbox.value())
         self.params.setMaxSteps(self.maxstepsSpinBox.value())
@@ -523,6 +934,59 @@ class DefaultParameters(QDialog):
             self.params.randomize_initial = True
         else:
             self.params.randomize_initial = False
+        if self.greedyCheckBox.isChecked():
+            self.params.greedy_initial = True
+        else:
+            self.params.greedy_initial = False
+        if self.annealbackendComboBox.currentText() == 'Processes':
+            self.params.useProcessBackend()
+        elif self.annealbackendComboBox.currentText() == 'Threads':
+            self.params.useThreadBackend()
+        self.params.setWorkerProcesses(self.workerprocessesSpinBox.value())
+        if self.optimizerComboBox.currentText() == 'Tempering':
+            self.params.useTemperingOptimizer()
+        elif self.optimizerComboBox.currentText() == 'Tabu':
+            self.params.useTabuOptimizer()
+        elif self.optimizerComboBox.currentText() == 'Neighbourhood':
+            self.params.useNeighbourhoodOptimizer()
+        elif self.optimizerComboBox.currentText() == 'Annealing':
+            self.params.useAnnealingOptimizer()
+        self.params.setReplicas(self.replicasSpinBox.value())
+        self.params.setExchangeInterval(self.exchangeSpinBox.value())
+        self.params.setTabuTenure(self.tabutenureSpinBox.value())
+        self.params.setTabuCandidates(self.tabucandidatesSpinBox.value())
+        self.params.setNeighbourhoodMixtures(self.neighbourhoodmixturesSpinBox.value())
+        self.params.setNeighbourhoodNodes(self.neighbourhoodnodesSpinBox.value())
+        self.params.setBatchSize(self.batchsizeSpinBox.value())
+        if self.batchweightsComboBox.currentText() == 'Heat Bath':
+            self.params.useHeatBathWeights()
+        elif self.batchweightsComboBox.currentText() == 'Metropolis':
+            self.params.useMetropolisWeights()
+        self.params.setStartAcceptance(self.startacceptanceSpinBox.value())
+        self.params.setFinalAcceptance(self.finalacceptanceSpinBox.value())
+        self.params.setAcceptanceWindow(self.acceptancewindowSpinBox.value())
+        if self.guidedmovesCheckBox.isChecked():
+            self.params.useGuidedMoves()
+        else:
+            self.params.noGuidedMoves()
+        self.params.setGuidedFraction(self.guidedfractionSpinBox.value())
+        if self.earlystopCheckBox.isChecked():
+            self.params.useEarlyStop()
+        else:
+            self.params.noEarlyStop()
+        self.params.setStallSteps(self.stallstepsSpinBox.value())
+        self.params.setMinAcceptance(self.minacceptanceSpinBox.value())
+        self.params.setScoreLowerBound(self.lowerboundSpinBox.value())
+        if self.checkpointsCheckBox.isChecked():
+            self.params.useCheckpoints()
+        else:
+            self.params.noCheckpoints()
+        self.params.setCheckpointInterval(self.checkpointintervalSpinBox.value())
+        if self.useseedCheckBox.isChecked():
+            self.params.useSeed()
+        else:
+            self.params.noSeed()
+        self.params.setSeed(self.seedSpinBox.value())
 
         ## Refine
         if self.userefineCheckBox.isChecked():
@@ -533,10 +997,14 @@ class DefaultParameters(QDialog):
             self.params.useRefineLinearCooling()
         elif self.refinecoolingComboBox.currentText() == 'Exponential':
             self.params.useRefineExponentialCooling()
+        elif self.refinecoolingComboBox.currentText() == 'Adaptive':
+            self.params.useRefineAdaptiveCooling()
         self.params.setRefineStartingTemp(self.refinestarttempSpinBox.value())
         self.params.setRefineFinalTemp(self.refinefinaltempSpinbox.value())
         self.params.setRefineMaxSteps(self.refinemaxstepsSpinBox.value())
         self.params.setRefineMixRate(self.refinemixrateSpinBox.value())
+        self.params.setRefineStartAcceptance(self.refinestartacceptanceSpinBox.value())
+        self.params.setRefineFinalAcceptance(self.refinefinalacceptanceSpinBox.value())
         self.params.setPrintStepSize(self.displaystepsSpinBox.value())
         self.params.setPeakDrawWidth(self.peakdrawwidthSpinBox.value())
 
@@ -553,6 +1021,15 @@ class DefaultParameters(QDialog):
             self.useintensityCheckBox.setCheckState(Qt.Checked)
         else:
             self.useintensityCheckBox.setCheckState(Qt.Unchecked)
+        if self.params.scoring_mode == "pairwise":
+            self.scoringmodeComboBox.setCurrentIndex(1)
+        else:
+            self.scoringmodeComboBox.setCurrentIndex(0)
+        if self.params.scoring_backend == "numpy":
+            self.scoringbackendComboBox.setCurrentIndex(1)
+        else:
+            self.scoringbackendComboBox.setCurrentIndex(0)
+        self.cachesizeSpinBox.setValue(self.params.score_cache_size)
 
         self.startnumSpinBox.setValue(self.params.start_num)
         self.mixsizeSpinBox.setValue(self.params.mix_size)
@@ -562,6 +1039,8 @@ class DefaultParameters(QDialog):
             self.coolingComboBox.setCurrentIndex(0)
         elif self.params.cooling == "linear":
             self.coolingComboBox.setCurrentIndex(1)
+        elif self.params.cooling == "adaptive":
+            self.coolingComboBox.setCurrentIndex(2)
         self.starttempSpinBox.setValue(self.params.start_temp)
         self.finaltempSpinbox.setValue(self.params.final_temp)
         self.maxstepsSpinBox.setValue(self.params.max_steps)
@@ -577,6 +1056,59 @@ class DefaultParameters(QDialog):
             self.randomizeCheckBox.setCheckState(Qt.Checked)
         else:
             self.randomizeCheckBox.setCheckState(Qt.Unchecked)
+        if self.params.greedy_initial:
+            self.greedyCheckBox.setCheckState(Qt.Checked)
+        else:
+            self.greedyCheckBox.setCheckState(Qt.Unchecked)
+        if self.params.anneal_backend == "processes":
+            self.annealbackendComboBox.setCurrentIndex(1)
+        else:
+            self.annealbackendComboBox.setCurrentIndex(0)
+        self.workerprocessesSpinBox.setValue(self.params.worker_processes)
+        if self.params.optimizer == "tempering":
+            self.optimizerComboBox.setCurrentIndex(1)
+        elif self.params.optimizer == "tabu":
+            self.optimizerComboBox.setCurrentIndex(2)
+        elif self.params.optimizer == "neighbourhood":
+            self.optimizerComboBox.setCurrentIndex(3)
+        else:
+            self.optimizerComboBox.setCurrentIndex(0)
+        self.replicasSpinBox.setValue(self.params.replicas)
+        self.exchangeSpinBox.setValue(self.params.exchange_interval)
+        self.tabutenureSpinBox.setValue(self.params.tabu_tenure)
+        self.tabucandidatesSpinBox.setValue(self.params.tabu_candidates)
+        self.neighbourhoodmixturesSpinBox.setValue(self.params.neighbourhood_mixtures)
+        self.neighbourhoodnodesSpinBox.setValue(self.params.neighbourhood_nodes)
+        self.batchsizeSpinBox.setValue(self.params.batch_size)
+        if self.params.batch_weights == "heatbath":
+            self.batchweightsComboBox.setCurrentIndex(1)
+        else:
+            self.batchweightsComboBox.setCurrentIndex(0)
+        self.startacceptanceSpinBox.setValue(self.params.start_acceptance)
+        self.finalacceptanceSpinBox.setValue(self.params.final_acceptance)
+        self.acceptancewindowSpinBox.setValue(self.params.acceptance_window)
+        if self.params.use_guided_moves:
+            self.guidedmovesCheckBox.setCheckState(Qt.Checked)
+        else:
+            self.guidedmovesCheckBox.setCheckState(Qt.Unchecked)
+        self.guidedfractionSpinBox.setValue(self.params.guided_fraction)
+        if self.params.use_early_stop:
+            self.earlystopCheckBox.setCheckState(Qt.Checked)
+        else:
+            self.earlystopCheckBox.setCheckState(Qt.Unchecked)
+        self.stallstepsSpinBox.setValue(self.params.stall_steps)
+        self.minacceptanceSpinBox.setValue(self.params.min_acceptance)
+        self.lowerboundSpinBox.setValue(self.params.score_lower_bound)
+        if self.params.use_checkpoints:
+            self.checkpointsCheckBox.setCheckState(Qt.Checked)
+        else:
+            self.checkpointsCheckBox.setCheckState(Qt.Unchecked)
+        self.checkpointintervalSpinBox.setValue(self.params.checkpoint_interval)
+        if self.params.use_seed:
+            self.useseedCheckBox.setCheckState(Qt.Checked)
+        else:
+            self.useseedCheckBox.setCheckState(Qt.Unchecked)
+        self.seedSpinBox.setValue(self.params.seed)
 
         if self.params.use_refine:
             self.userefineCheckBox.setChecked(True)
@@ -586,10 +1118,14 @@ class DefaultParameters(QDialog):
             self.refinecoolingComboBox.setCurrentIndex(0)
         elif self.params.refine_cooling == "linear":
             self.refinecoolingComboBox.setCurrentIndex(1)
+        elif self.params.refine_cooling == "adaptive":
+            self.refinecoolingComboBox.setCurrentIndex(2)
         self.refinestarttempSpinBox.setValue(self.params.refine_start_temp)
         self.refinefinaltempSpinbox.setValue(self.params.refine_final_temp)
         self.refinemaxstepsSpinBox.setValue(self.params.refine_max_steps)
         self.refinemixrateSpinBox.setValue(self.params.refine_mix_rate)
+        self.refinestartacceptanceSpinBox.setValue(self.params.refine_start_acceptance)
+        self.refinefinalacceptanceSpinBox.setValue(self.params.refine_final_acceptance)
 
 
     def setWorkingDir(self):
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_checkpoint.py
+
+Stops optimizations run with the process backend, resumes them from
+their checkpoints and checks that they finish with the same mixtures as
+optimizations that were never stopped.
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import os
+import sys
+import csv
+import random
+import shutil
+import tempfile
+import unittest
+
+NMRMIX_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if NMRMIX_DIR not in sys.path:
+    sys.path.insert(0, NMRMIX_DIR)
+
+try:
+    import NMRmix_cli
+    from core import parameters, library, mixtures, anneal, checkpoint
+except ImportError:
+    NMRmix_cli = None
+
+
+@unittest.skipIf(NMRmix_cli is None, "the NMRmix dependencies are not installed")
+class ProcessStopTest(unittest.TestCase):
+    num_compounds = 30
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        self.peaklist_dir = os.path.join(self.directory, 'peaks')
+        os.mkdir(self.peaklist_dir)
+        rng = random.Random(7)
+        self.library_path = os.path.join(self.directory, 'library.csv')
+        with open(self.library_path, 'w') as library_csv:
+            writer = csv.writer(library_csv)
+            writer.writerow(['Use', 'ID', 'Name', 'BMRB', 'HMDB', 'File', 'Format', 'Group', 'PubChem', 'KEGG',
+                             'SMILES'])
+            for i in range(self.num_compounds):
+                filename = "c%d.csv" % i
+                writer.writerow(['YES', 'C%03d' % i, 'compound%d' % i, '', '', filename, 'USER', '', '', '', ''])
+                with open(os.path.join(self.peaklist_dir, filename), 'w') as peaklist_csv:
+                    peak_writer = csv.writer(peaklist_csv)
+                    peak_writer.writerow(['ppm', 'intensity', 'width'])
+                    for k in range(rng.randint(3, 15)):
+                        peak_writer.writerow(["%0.3f" % rng.uniform(0.5, 9.5), "%0.2f" % rng.uniform(0.05, 1.0), ''])
+        os.chdir(NMRMIX_DIR)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def setupOptimization(self, optimizer, work_dir):
+        params = parameters.Parameters(NMRMIX_DIR)
+        params.setLibraryPath(self.library_path)
+        params.setPeakListDirectory(self.peaklist_dir)
+        if not os.path.isdir(work_dir):
+            os.mkdir(work_dir)
+        params.setWorkingDirectory(work_dir)
+        params.useSeed()
+        params.setSeed(5)
+        params.useProcessBackend()
+        params.setWorkerProcesses(2)
+        params.useCheckpoints()
+        params.setCheckpointInterval(100)
+        if optimizer == 'tempering':
+            params.useTemperingOptimizer()
+            params.setReplicas(3)
+            params.setExchangeInterval(50)
+            params.setNumIterations(1)
+            params.setMaxSteps(1000)
+        else:
+            params.setNumIterations(2)
+            params.setMaxSteps(5000)
+        library_object = library.Library(params)
+        library_object.readLibraryFile()
+        NMRmix_cli.importPeakLists(params, library_object)
+        library_object.calcStats({})
+        mixtures_object = mixtures.Mixtures(params, library_object)
+        mixtures_object.generateGroupLists()
+        mixtures_object.generateInitialMixtures()
+        mixtures_object.resetScores()
+        return(params, library_object, mixtures_object)
+
+    def optimize(self, optimizer):
+        """Returns the score and mixtures of an optimization that is not stopped."""
+        params, library_object, mixtures_object = self.setupOptimization(optimizer,
+                                                                         os.path.join(self.directory, 'full'))
+        score = anneal.optimizeMixtures(params, library_object, mixtures_object)
+        return(score, mixtures_object.mixtures)
+
+    def resume(self, work_dir):
+        """Resumes the optimization checkpointed in work_dir, and returns its score and mixtures."""
+        params, library_object, mixtures_object = self.setupOptimization('annealing', work_dir)
+        checkpoint_object = checkpoint.Checkpoint(params)
+        self.assertTrue(checkpoint_object.exists())
+        self.assertTrue(checkpoint_object.restoreParams(params)[0])
+        self.assertTrue(checkpoint_object.restoreMixtures(mixtures_object)[0])
+        mixtures_object.resetScores()
+        score = anneal.optimizeMixtures(params, library_object, mixtures_object, checkpoint=checkpoint_object)
+        self.assertFalse(checkpoint_object.exists())
+        return(score, mixtures_object.mixtures)
+
+    def startRun(self, params, mixtures_object, groups):
+        checkpoint_object = checkpoint.Checkpoint(params)
+        seeds = anneal.groupSeeds(params, groups)
+        checkpoint_object.saveRun(params, mixtures_object, seeds)
+        return(checkpoint_object, seeds)
+
+    def test_stop_iterations(self):
+        expected = self.optimize('annealing')
+        work_dir = os.path.join(self.directory, 'stopped')
+        params, library_object, mixtures_object = self.setupOptimization('annealing', work_dir)
+        groups = list(mixtures_object.group_mixnum.keys())
+        checkpoint_object, seeds = self.startRun(params, mixtures_object, groups)
+        pool, queues, stop_event = anneal.createPool(params, library_object, mixtures_object, groups)
+        try:
+            results = []
+            for group in groups:
+                group_mixtures = {}
+                for mixnum in mixtures_object.group_mixnum[group]:
+                    group_mixtures[mixnum] = list(mixtures_object.mixtures[mixnum])
+                for i, seed in enumerate(seeds[group]):
+                    results.append(pool.apply_async(anneal.annealIteration,
+                                                    (group, mixtures_object.group_mixnum[group], group_mixtures, i,
+                                                     seed, checkpoint_object)))
+            # The iterations are stopped once one of them has made a few hundred steps.
+            message = ('newIteration',)
+            while message[0] != 'newStep' or message[3] < 200:
+                message = queues[groups[0]].get(True, 60)
+            anneal.stopPool(stop_event, results)
+            self.assertEqual([result.get() for result in results], [None] * len(results))
+        finally:
+            pool.terminate()
+        states = [checkpoint_object.loadIteration(group, i) for group in groups for i in range(len(seeds[group]))]
+        self.assertIn('optimize', [state['phase'] for state in states if state is not None])
+        self.assertEqual(self.resume(work_dir), expected)
+
+    def test_stop_tempering(self):
+        expected = self.optimize('tempering')
+        work_dir = os.path.join(self.directory, 'stopped')
+        params, library_object, mixtures_object = self.setupOptimization('tempering', work_dir)
+        groups = list(mixtures_object.group_mixnum.keys())
+        checkpoint_object, seeds = self.startRun(params, mixtures_object, groups)
+        pool, queues, stop_event = anneal.createPool(params, library_object, mixtures_object, groups)
+        try:
+            for group in groups:
+                annealer = anneal.Annealer(params, mixtures_object, group, mixtures_object.group_mixnum[group])
+                annealer.seeds = seeds[group]
+                annealer.checkpoint = checkpoint_object
+                annealer.segment_runner = anneal.poolSegmentRunner(pool, queues, group, annealer.mixnum_list,
+                                                                   mixtures_object.score_cache)
+                # The segments after the exchange at step 200 are stopped in the workers.
+                annealer.newStep = lambda group, step, score, refining: step >= 200 and stop_event.set()
+                annealer.run()
+                self.assertTrue(annealer.exiting)
+        finally:
+            pool.terminate()
+        state = checkpoint_object.loadIteration(groups[0], 0)
+        self.assertEqual((state['phase'], state['step']), ('temper', 200))
+        self.assertEqual(self.resume(work_dir), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
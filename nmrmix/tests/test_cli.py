@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_cli.py
+
+Runs the command line version on a small made up library and checks
+that the results it writes match the final mixtures scored from
+scratch.
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+
+import os
+import sys
+import csv
+import random
+import shutil
+import tempfile
+import unittest
+
+NMRMIX_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if NMRMIX_DIR not in sys.path:
+    sys.path.insert(0, NMRMIX_DIR)
+
+try:
+    import NMRmix_cli
+    from core import parameters, library, mixtures
+except ImportError:
+    NMRmix_cli = None
+
+
+@unittest.skipIf(NMRmix_cli is None, "the NMRmix dependencies are not installed")
+class CommandLineScoresTest(unittest.TestCase):
+    num_compounds = 30
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        self.peaklist_dir = os.path.join(self.directory, 'peaks')
+        self.work_dir = os.path.join(self.directory, 'results')
+        os.mkdir(self.peaklist_dir)
+        os.mkdir(self.work_dir)
+        rng = random.Random(3)
+        self.library_path = os.path.join(self.directory, 'library.csv')
+        with open(self.library_path, 'w') as library_csv:
+            writer = csv.writer(library_csv)
+            writer.writerow(['Use', 'ID', 'Name', 'BMRB', 'HMDB', 'File', 'Format', 'Group', 'PubChem', 'KEGG',
+                             'SMILES'])
+            for i in range(self.num_compounds):
+                filename = "c%d.csv" % i
+                writer.writerow(['YES', 'C%03d' % i, 'compound%d' % i, '', '', filename, 'USER', '', '', '', ''])
+                with open(os.path.join(self.peaklist_dir, filename), 'w') as peaklist_csv:
+                    peak_writer = csv.writer(peaklist_csv)
+                    peak_writer.writerow(['ppm', 'intensity', 'width'])
+                    for k in range(rng.randint(3, 15)):
+                        peak_writer.writerow(["%0.3f" % rng.uniform(0.5, 9.5), "%0.2f" % rng.uniform(0.05, 1.0), ''])
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def runOptimizer(self, optimizer):
+        params_path = os.path.join(self.directory, 'parameters.txt')
+        with open(params_path, 'w') as params_file:
+            params_file.write("Optimizer = %s\n" % optimizer)
+            params_file.write("Max Optimizing Steps = 200\n")
+            params_file.write("Iterations = 1\n")
+            params_file.write("Use Refinement = False\n")
+            params_file.write("Use Seed = True\n")
+            params_file.write("Seed = 5\n")
+        status = NMRmix_cli.main([self.library_path, '-p', params_path, '-w', self.work_dir, '-l', self.peaklist_dir])
+        self.assertEqual(status, 0)
+        results = [name for name in os.listdir(self.work_dir) if name.endswith('_Results')]
+        self.assertEqual(len(results), 1)
+        with open(os.path.join(self.work_dir, results[0], 'scores.csv')) as scores_csv:
+            rows = list(csv.reader(scores_csv))[1:]
+        return(params_path, rows)
+
+    def rescore(self, params_path, rows):
+        """Scores the exported mixtures from scratch with a new library and mixtures object."""
+        params = parameters.Parameters(NMRMIX_DIR)
+        params.readPreferences(params_path)
+        params.setLibraryPath(self.library_path)
+        params.setPeakListDirectory(self.peaklist_dir)
+        library_object = library.Library(params)
+        library_object.readLibraryFile()
+        NMRmix_cli.importPeakLists(params, library_object)
+        library_object.calcStats({})
+        mixtures_object = mixtures.Mixtures(params, library_object)
+        for row in rows:
+            mixtures_object.mixtures.setdefault(int(row[4]), []).append(row[0])
+        mixtures_object.resetScores()
+        mixtures_object.calculateTotalScore(mixtures_object.mixtures)
+        return(mixtures_object)
+
+    def checkScores(self, optimizer):
+        params_path, rows = self.runOptimizer(optimizer)
+        self.assertEqual(len(rows), self.num_compounds)
+        mixtures_object = self.rescore(params_path, rows)
+        for row in rows:
+            compound_score = mixtures_object.compound_scores[row[0]]
+            self.assertEqual([int(row[1]), int(row[2]), row[3]],
+                             [compound_score[2], compound_score[1], "%.1f" % compound_score[0]])
+            self.assertEqual(row[5], "%.1f" % mixtures_object.getMixtureScore(int(row[4])))
+
+    def test_annealing_scores(self):
+        self.checkScores('annealing')
+
+    def test_tabu_scores(self):
+        self.checkScores('tabu')
+
+    def test_neighbourhood_scores(self):
+        self.checkScores('neighbourhood')
+
+
+if __name__ == '__main__':
+    unittest.main()